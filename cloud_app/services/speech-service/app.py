@@ -1,18 +1,19 @@
 import os
 import json
+import time
 import logging
 from datetime import datetime
 from flask import Flask, request, jsonify
 from flask_cors import CORS
 import pymongo
 from bson import ObjectId
-from pydub import AudioSegment
 import requests
 from dotenv import load_dotenv
 from celery import Celery
 from google.cloud import speech
 from google.cloud import storage
-import io
+from audio_pipeline import PreprocessedAudio
+from voice_activity import VoiceActivityDetector
 
 load_dotenv()
 
@@ -60,6 +61,19 @@ except Exception as e:
 UPLOAD_SERVICE_URL = os.getenv('UPLOAD_SERVICE_URL', 'http://localhost:5003')
 PATIENT_SERVICE_URL = os.getenv('PATIENT_SERVICE_URL', 'http://localhost:5002')
 
+# Silence trimming before recognition; word timestamps are mapped back to the original audio
+if os.getenv('VAD_ENABLED', 'true').lower() == 'true':
+    vad = VoiceActivityDetector(
+        min_silence_ms=int(os.getenv('VAD_MIN_SILENCE_MS', 700)),
+        keep_silence_ms=int(os.getenv('VAD_KEEP_SILENCE_MS', 200)),
+        threshold_db=float(os.getenv('VAD_THRESHOLD_DB', 12))
+    )
+else:
+    vad = None
+
+# FLAC is lossless and roughly halves the upload compared to LINEAR16
+RECOGNITION_AUDIO_ENCODING = os.getenv('RECOGNITION_AUDIO_ENCODING', 'FLAC').upper()
+
 @app.route('/health', methods=['GET'])
 def health_check():
     speech_status = "connected" if speech_client else "failed"
@@ -134,14 +148,14 @@ def transcribe_medical_audio_task(transcription_id, file_path, audio_file_id, do
         )
         
         # Preprocess audio for Google Speech API
-        processed_audio_data = preprocess_audio_for_google(file_path)
+        processed_audio_data, offset_map = preprocess_audio_for_google(file_path)
         
         if not processed_audio_data:
             raise Exception("Failed to preprocess audio file")
         
         # Configure Google Speech recognition for medical content
         config = speech.RecognitionConfig(
-            encoding=speech.RecognitionConfig.AudioEncoding.LINEAR16,
+            encoding=speech.RecognitionConfig.AudioEncoding[RECOGNITION_AUDIO_ENCODING],
             sample_rate_hertz=16000,
             language_code="en-US",
             
@@ -214,11 +228,16 @@ def transcribe_medical_audio_task(transcription_id, file_path, audio_file_id, do
             # Extract word-level details
             if hasattr(alternative, 'words'):
                 for word_info in alternative.words:
+                    start_time = word_info.start_time.total_seconds()
+                    end_time = word_info.end_time.total_seconds()
+                    if offset_map is not None:
+                        start_time = offset_map.to_original(start_time)
+                        end_time = offset_map.to_original(end_time, end=True)
                     word_details.append({
                         "word": word_info.word,
                         "confidence": getattr(word_info, 'confidence', 0.0),
-                        "start_time": word_info.start_time.total_seconds(),
-                        "end_time": word_info.end_time.total_seconds()
+                        "start_time": start_time,
+                        "end_time": end_time
                     })
         
         # Calculate average confidence
@@ -240,7 +259,8 @@ def transcribe_medical_audio_task(transcription_id, file_path, audio_file_id, do
                     "word_details": word_details,
                     "processing_status": "completed",
                     "processed_at": datetime.utcnow(),
-                    "model_used": "google_medical_dictation"
+                    "model_used": "google_medical_dictation",
+                    "vad_removed_percent": round(offset_map.removed_percent, 1) if offset_map else 0.0
                 }
             }
         )
@@ -272,28 +292,24 @@ def transcribe_medical_audio_task(transcription_id, file_path, audio_file_id, do
         )
 
 def preprocess_audio_for_google(file_path):
-    """Convert audio to format suitable for Google Speech API"""
+    """Convert audio to format suitable for Google Speech API.
+
+    Returns (audio bytes, OffsetMap or None when VAD is disabled).
+    """
     try:
-        # Load audio with pydub
-        audio = AudioSegment.from_file(file_path)
-        
-        # Convert to format required by Google Speech API
-        # - 16kHz sample rate
-        # - 16-bit PCM
-        # - Mono channel
-        audio = audio.set_frame_rate(16000)
-        audio = audio.set_channels(1)
-        audio = audio.set_sample_width(2)  # 16-bit
-        
-        # Export to bytes
-        audio_data = io.BytesIO()
-        audio.export(audio_data, format="wav")
-        
-        return audio_data.getvalue()
+        # 16kHz, 16-bit, mono WAV or FLAC, decoded and resampled block by block
+        with PreprocessedAudio(file_path, vad=vad) as audio:
+            started = time.perf_counter()
+            data = b"".join(audio.encode(RECOGNITION_AUDIO_ENCODING))
+            logger.info(
+                f"Encoded {audio.output_samples / audio.sample_rate:.1f}s as {RECOGNITION_AUDIO_ENCODING}: "
+                f"{len(data)} bytes in {time.perf_counter() - started:.2f}s"
+            )
+            return data, audio.offset_map
         
     except Exception as e:
         logger.error(f"Audio preprocessing failed: {str(e)}")
-        return None
+        return None, None
 
 def post_process_medical_transcription(text, patient_context):
     """Enhanced post-processing for medical transcriptions"""
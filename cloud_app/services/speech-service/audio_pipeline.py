@@ -0,0 +1,289 @@
+"""Block-wise audio preprocessing for the Google Speech API.
+
+The recording is decoded once into int16 blocks, then each block is
+downmixed, resampled to 16kHz with a polyphase filter and written to a
+float32 scratch file while the peak is tracked. A second pass over the
+scratch file applies peak normalization and encodes LINEAR16 WAV or FLAC,
+yielding the encoded bytes block by block. Memory use depends on the block
+size, not on the length of the recording.
+
+With a VoiceActivityDetector, frame features are collected during the
+first pass and the second pass only encodes the ranges that are kept.
+"""
+import json
+import math
+import struct
+import logging
+import subprocess
+import tempfile
+import numpy as np
+from scipy.signal import resample_poly
+from flac_stream import FlacStreamWriter
+from voice_activity import OffsetMap
+
+logger = logging.getLogger(__name__)
+
+TARGET_SAMPLE_RATE = 16000
+BLOCK_SECONDS = 10
+PEAK_DBFS = -1.0
+
+# Formats libsndfile decodes directly; everything else goes through ffmpeg
+SOUNDFILE_EXTENSIONS = ('.wav', '.flac', '.ogg', '.aiff', '.aif')
+
+
+def probe_audio(file_path):
+    """Return (sample_rate, channels) of the first audio stream"""
+    if file_path.lower().endswith(SOUNDFILE_EXTENSIONS):
+        import soundfile as sf
+        info = sf.info(file_path)
+        return info.samplerate, info.channels
+
+    output = subprocess.run(
+        ['ffprobe', '-v', 'error', '-select_streams', 'a:0',
+         '-show_entries', 'stream=sample_rate,channels', '-of', 'json', file_path],
+        capture_output=True, check=True
+    ).stdout
+    stream = json.loads(output)['streams'][0]
+    return int(stream['sample_rate']), int(stream['channels'])
+
+
+def decode_blocks(file_path, sample_rate, channels, block_seconds=BLOCK_SECONDS):
+    """Yield (frames, channels) int16 arrays covering the whole recording"""
+    block_frames = int(sample_rate * block_seconds)
+
+    if file_path.lower().endswith(SOUNDFILE_EXTENSIONS):
+        import soundfile as sf
+        for block in sf.blocks(file_path, blocksize=block_frames, dtype='int16', always_2d=True):
+            yield block
+        return
+
+    process = subprocess.Popen(
+        ['ffmpeg', '-v', 'error', '-i', file_path, '-vn', '-f', 's16le', '-acodec', 'pcm_s16le', '-'],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE
+    )
+    block_bytes = block_frames * channels * 2
+    try:
+        while True:
+            data = process.stdout.read(block_bytes)
+            if not data:
+                break
+            usable = len(data) - len(data) % (channels * 2)
+            yield np.frombuffer(data[:usable], dtype='<i2').reshape(-1, channels)
+    finally:
+        process.stdout.close()
+        stderr = process.stderr.read()
+        if process.wait() != 0:
+            raise Exception(f"ffmpeg failed to decode {file_path}: {stderr.decode(errors='replace').strip()}")
+
+
+def downmix(block):
+    """Average interleaved channels into a mono float32 signal in [-1, 1)"""
+    if block.shape[1] == 1:
+        mono = block[:, 0].astype(np.float32)
+    else:
+        mono = block.mean(axis=1, dtype=np.float32)
+    mono *= 1.0 / 32768.0
+    return mono
+
+
+class PolyphaseResampler:
+    """Streaming wrapper around scipy's resample_poly.
+
+    Input is filtered in blocks with enough context on either side to cover
+    the filter's support, so the concatenated output matches resampling the
+    whole signal at once.
+    """
+
+    def __init__(self, rate_in, rate_out, block_size=65536):
+        divisor = math.gcd(rate_in, rate_out)
+        self.up = rate_out // divisor
+        self.down = rate_in // divisor
+        # resample_poly's default filter spans 10 * max(up, down) taps per side
+        # at the upsampled rate; the margin covers that many input samples
+        half_width = 10 * max(self.up, self.down) / self.up
+        self.margin = self.down * math.ceil((half_width + 1) / self.down)
+        self.block = self.down * max(1, block_size // self.down)
+        self.pending = np.empty(0, dtype=np.float32)
+        self.context = 0
+
+    @property
+    def passthrough(self):
+        return self.up == self.down
+
+    def process(self, samples):
+        if self.passthrough:
+            return samples
+
+        self.pending = np.concatenate((self.pending, samples))
+        outputs = []
+        while len(self.pending) - self.context >= self.block + self.margin:
+            segment = self.pending[:self.context + self.block + self.margin]
+            outputs.append(self._filter(segment, self.block * self.up // self.down))
+            self.pending = self.pending[self.context + self.block - self.margin:]
+            self.context = self.margin
+        return np.concatenate(outputs) if outputs else np.empty(0, dtype=np.float32)
+
+    def flush(self):
+        if self.passthrough or len(self.pending) <= self.context:
+            return np.empty(0, dtype=np.float32)
+        output = self._filter(self.pending, None)
+        self.pending = np.empty(0, dtype=np.float32)
+        self.context = 0
+        return output
+
+    def _filter(self, segment, length):
+        resampled = resample_poly(segment, self.up, self.down).astype(np.float32, copy=False)
+        start = self.context * self.up // self.down
+        return resampled[start:] if length is None else resampled[start:start + length]
+
+
+def wav_header(num_samples, sample_rate=TARGET_SAMPLE_RATE):
+    data_size = num_samples * 2
+    return struct.pack(
+        '<4sI4s4sIHHIIHH4sI',
+        b'RIFF', 36 + data_size, b'WAVE',
+        b'fmt ', 16, 1, 1, sample_rate, sample_rate * 2, 2, 16,
+        b'data', data_size
+    )
+
+
+class PreprocessedAudio:
+    """A recording decoded, downmixed and resampled into a scratch file.
+
+    Construction runs the first pass and records the peak and, when a
+    VoiceActivityDetector is given, the ranges worth sending. encode()
+    makes the second pass, normalizing and encoding only those ranges.
+    Use as a context manager so the scratch file is removed.
+    """
+
+    def __init__(self, file_path, sample_rate=TARGET_SAMPLE_RATE, peak_dbfs=PEAK_DBFS,
+                 block_seconds=BLOCK_SECONDS, vad=None):
+        self.file_path = file_path
+        self.sample_rate = sample_rate
+        self.peak_dbfs = peak_dbfs
+        self.block_seconds = block_seconds
+        self.scratch = tempfile.TemporaryFile()
+        self.total_samples = 0
+        self.peak = 0.0
+        self.offset_map = None
+        try:
+            self._first_pass(vad)
+        except Exception:
+            self.scratch.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def close(self):
+        self.scratch.close()
+
+    @property
+    def ranges(self):
+        if self.offset_map is None:
+            return [(0, self.total_samples)]
+        return self.offset_map.ranges
+
+    @property
+    def output_samples(self):
+        return sum(end - start for start, end in self.ranges)
+
+    def _first_pass(self, vad):
+        source_rate, channels = probe_audio(self.file_path)
+        resampler = PolyphaseResampler(
+            source_rate, self.sample_rate, block_size=int(source_rate * self.block_seconds)
+        )
+        energies, crossings = [], []
+        carry = np.empty(0, dtype=np.float32)
+
+        def store(samples):
+            nonlocal carry
+            if not len(samples):
+                return
+            self.peak = max(self.peak, float(np.abs(samples).max()))
+            samples.tofile(self.scratch)
+            self.total_samples += len(samples)
+            if vad is not None:
+                # Frames straddling block boundaries are completed from the carry
+                framed = np.concatenate((carry, samples))
+                usable = len(framed) - len(framed) % vad.frame_length(self.sample_rate)
+                energy_db, zcr = vad.frame_features(framed[:usable], self.sample_rate)
+                energies.append(energy_db)
+                crossings.append(zcr)
+                carry = framed[usable:]
+
+        for block in decode_blocks(self.file_path, source_rate, channels, self.block_seconds):
+            store(resampler.process(downmix(block)))
+        store(resampler.flush())
+
+        logger.info(
+            f"Decoded {self.file_path}: {source_rate}Hz x{channels} -> {self.sample_rate}Hz mono, "
+            f"{self.total_samples / self.sample_rate:.1f}s, peak {self.peak:.3f}"
+        )
+
+        if vad is not None:
+            mask = vad.speech_mask(
+                np.concatenate(energies) if energies else np.empty(0, dtype=np.float32),
+                np.concatenate(crossings) if crossings else np.empty(0, dtype=np.float32),
+            )
+            ranges = vad.keep_ranges(mask, self.total_samples, self.sample_rate)
+            self.offset_map = OffsetMap(ranges, self.total_samples, self.sample_rate)
+            logger.info(
+                f"VAD removed {self.offset_map.removed_percent:.1f}% of {self.file_path} "
+                f"({self.offset_map.removed_samples / self.sample_rate:.1f}s)"
+            )
+
+    def _scaled_blocks(self):
+        gain = 1.0
+        if self.peak_dbfs is not None and self.peak > 0:
+            gain = 10 ** (self.peak_dbfs / 20.0) / self.peak
+        block_samples = int(self.sample_rate * self.block_seconds)
+
+        for start, end in self.ranges:
+            self.scratch.seek(start * 4)
+            remaining = end - start
+            while remaining > 0:
+                block = np.fromfile(self.scratch, dtype=np.float32, count=min(block_samples, remaining))
+                if not len(block):
+                    break
+                remaining -= len(block)
+                block *= gain
+                np.clip(block, -1.0, 32767.0 / 32768.0, out=block)
+                yield (block * 32768.0).astype('<i2')
+
+    def encode(self, encoding='LINEAR16'):
+        """Yield the kept audio as 16-bit mono LINEAR16 (WAV) or FLAC byte blocks"""
+        if encoding not in ('LINEAR16', 'FLAC'):
+            raise Exception(f"Unsupported output encoding {encoding}")
+
+        if encoding == 'LINEAR16':
+            yield wav_header(self.output_samples, self.sample_rate)
+            for block in self._scaled_blocks():
+                yield block.tobytes()
+            return
+
+        import soundfile as sf
+        sink = FlacStreamWriter(self.output_samples)
+        with sf.SoundFile(sink, 'w', self.sample_rate, 1, format='FLAC', subtype='PCM_16') as flac:
+            for block in self._scaled_blocks():
+                flac.write(block)
+                data = sink.drain()
+                if data:
+                    yield data
+        data = sink.drain()
+        if data:
+            yield data
+
+
+def preprocess_blocks(file_path, encoding='LINEAR16', sample_rate=TARGET_SAMPLE_RATE,
+                      peak_dbfs=PEAK_DBFS, block_seconds=BLOCK_SECONDS, vad=None):
+    """Yield the recording as 16-bit mono audio encoded as LINEAR16 (WAV) or FLAC.
+
+    peak_dbfs=None skips normalization.
+    """
+    with PreprocessedAudio(file_path, sample_rate, peak_dbfs, block_seconds, vad) as audio:
+        yield from audio.encode(encoding)
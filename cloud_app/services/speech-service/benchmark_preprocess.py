@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Benchmark audio preprocessing: pydub (previous implementation) vs audio_pipeline
+
+Generates stereo 44.1kHz dictation-like recordings of several lengths and
+reports wall time and peak Python heap for converting each to 16kHz mono
+LINEAR16. Pass a file path to benchmark a real recording instead.
+
+    python benchmark_preprocess.py [audio_file ...]
+"""
+
+import io
+import os
+import sys
+import time
+import tempfile
+import tracemalloc
+import numpy as np
+import soundfile as sf
+from audio_pipeline import preprocess_blocks
+
+DURATIONS_SECONDS = [30, 300, 1800]
+
+def create_test_audio(duration_seconds, sample_rate=44100):
+    """Write a stereo tone with speech-like amplitude bursts to a temp WAV"""
+    path = tempfile.NamedTemporaryFile(delete=False, suffix='.wav').name
+    block = sample_rate * 10
+    with sf.SoundFile(path, 'w', sample_rate, 2, subtype='PCM_16') as f:
+        for start in range(0, duration_seconds * sample_rate, block):
+            t = np.arange(start, min(start + block, duration_seconds * sample_rate)) / sample_rate
+            envelope = 0.5 + 0.5 * np.sin(2 * np.pi * 0.7 * t)
+            left = 0.3 * envelope * np.sin(2 * np.pi * 180 * t)
+            right = 0.2 * envelope * np.sin(2 * np.pi * 240 * t)
+            f.write(np.stack([left, right], axis=1))
+    return path
+
+def pydub_preprocess(file_path):
+    """The pydub path preprocess_audio_for_google used before"""
+    from pydub import AudioSegment
+
+    audio = AudioSegment.from_file(file_path)
+    audio = audio.set_frame_rate(16000)
+    audio = audio.set_channels(1)
+    audio = audio.set_sample_width(2)
+    audio_data = io.BytesIO()
+    audio.export(audio_data, format="wav")
+    return audio_data.getvalue()
+
+def pipeline_preprocess(file_path):
+    """Stream the blocks without joining them, as an uploader would"""
+    size = 0
+    for block in preprocess_blocks(file_path, encoding="LINEAR16"):
+        size += len(block)
+    return size
+
+def measure(function, file_path):
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = function(file_path)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    size = result if isinstance(result, int) else len(result)
+    return elapsed, peak, size
+
+def benchmark(file_path, label):
+    print(f"\n{label} ({os.path.getsize(file_path) / 1e6:.1f} MB input)")
+    print(f"  {'implementation':<16}{'time (s)':>10}{'peak heap (MB)':>16}{'output (MB)':>13}")
+    for name, function in (('pydub', pydub_preprocess), ('audio_pipeline', pipeline_preprocess)):
+        try:
+            elapsed, peak, size = measure(function, file_path)
+            print(f"  {name:<16}{elapsed:>10.2f}{peak / 1e6:>16.1f}{size / 1e6:>13.1f}")
+        except Exception as e:
+            print(f"  {name:<16} failed: {e}")
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        for path in sys.argv[1:]:
+            benchmark(path, path)
+    else:
+        for duration in DURATIONS_SECONDS:
+            path = create_test_audio(duration)
+            try:
+                benchmark(path, f"{duration}s stereo 44.1kHz WAV")
+            finally:
+                os.unlink(path)
@@ -0,0 +1,144 @@
+# Vendored from shared/audio/voice_activity.py by shared/sync_shared.py; edit it there.
+import bisect
+import numpy as np
+
+class VoiceActivityDetector:
+    """Energy / zero-crossing voice activity detection for dictation audio.
+
+    A 20ms frame counts as speech when its energy clears a threshold set
+    relative to the recording's noise floor, or when it is moderately loud
+    with a high zero-crossing rate (unvoiced consonants such as "s" and
+    "f"). Silences of at least min_silence_ms are compressed to
+    keep_silence_ms, and leading/trailing silence is cut to half of that.
+    """
+
+    FRAME_SECONDS = 0.02
+
+    def __init__(self, min_silence_ms=700, keep_silence_ms=200, threshold_db=12.0,
+                 zcr_threshold=0.25, floor_percentile=10):
+        self.min_silence_ms = min_silence_ms
+        self.keep_silence_ms = keep_silence_ms
+        self.threshold_db = threshold_db
+        self.zcr_threshold = zcr_threshold
+        self.floor_percentile = floor_percentile
+
+    def frame_length(self, sample_rate):
+        return max(1, int(self.FRAME_SECONDS * sample_rate))
+
+    def frame_features(self, samples, sample_rate):
+        """Per-frame (energy in dBFS, zero crossings per sample) for every full frame"""
+        frame = self.frame_length(sample_rate)
+        n_frames = len(samples) // frame
+        if n_frames == 0:
+            return np.empty(0, dtype=np.float32), np.empty(0, dtype=np.float32)
+
+        framed = samples[:n_frames * frame].reshape(n_frames, frame).astype(np.float32)
+        if np.issubdtype(samples.dtype, np.integer):
+            framed *= 1.0 / 32768.0
+
+        energy = np.mean(framed * framed, axis=1)
+        energy_db = 10.0 * np.log10(np.maximum(energy, 1e-10))
+        signs = np.signbit(framed)
+        zcr = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / float(frame)
+        return energy_db.astype(np.float32), zcr.astype(np.float32)
+
+    def speech_mask(self, energy_db, zcr):
+        """Boolean speech flag per frame"""
+        if len(energy_db) == 0:
+            return np.zeros(0, dtype=bool)
+
+        floor = float(np.percentile(energy_db, self.floor_percentile))
+        # Keep the threshold in a sane absolute range so near-silent files
+        # and recordings that are speech throughout are both handled
+        threshold = min(max(floor + self.threshold_db, -55.0), -35.0)
+        voiced = energy_db > threshold
+        unvoiced = (energy_db > threshold - self.threshold_db / 2) & (zcr > self.zcr_threshold)
+        return voiced | unvoiced
+
+    def keep_ranges(self, mask, n_samples, sample_rate):
+        """Sample ranges (start, end) to keep, in order and non-overlapping"""
+        frame = self.frame_length(sample_rate)
+        n_frames = len(mask)
+        if n_frames == 0 or not mask.any():
+            # Nothing recognizably speech; let the recognizer judge the audio
+            return [(0, n_samples)]
+
+        pad = int(self.keep_silence_ms / 1000.0 / self.FRAME_SECONDS) // 2
+        min_silence = max(1, int(self.min_silence_ms / 1000.0 / self.FRAME_SECONDS))
+
+        # Silence runs as [start, end) frame pairs
+        edges = np.flatnonzero(np.diff(np.concatenate(([1], mask.astype(np.int8), [1]))))
+        removed = []
+        for start, end in zip(edges[0::2].tolist(), edges[1::2].tolist()):
+            if start == 0:
+                cut = (0, max(0, end - pad))
+            elif end == n_frames:
+                cut = (min(n_frames, start + pad), n_frames)
+            elif end - start >= min_silence:
+                cut = (start + pad, end - pad)
+            else:
+                continue
+            if cut[1] > cut[0]:
+                removed.append(cut)
+
+        ranges = []
+        position = 0
+        for start, end in removed:
+            if start > position:
+                ranges.append((position * frame, start * frame))
+            position = end
+        # The partial frame at the end belongs to the last kept range
+        if position < n_frames:
+            ranges.append((position * frame, n_samples))
+        return ranges
+
+    def trim(self, samples, sample_rate):
+        """Return (trimmed samples, OffsetMap) for a whole mono recording"""
+        energy_db, zcr = self.frame_features(samples, sample_rate)
+        ranges = self.keep_ranges(self.speech_mask(energy_db, zcr), len(samples), sample_rate)
+        offsets = OffsetMap(ranges, len(samples), sample_rate)
+        if offsets.removed_samples == 0:
+            return samples, offsets
+        return np.concatenate([samples[start:end] for start, end in ranges]), offsets
+
+
+class OffsetMap:
+    """Maps times in trimmed audio back to times in the original recording"""
+
+    def __init__(self, ranges, original_samples, sample_rate):
+        self.ranges = ranges
+        self.original_samples = original_samples
+        self.sample_rate = sample_rate
+        self.trimmed_starts = []
+        kept = 0
+        for start, end in ranges:
+            self.trimmed_starts.append(kept)
+            kept += end - start
+        self.kept_samples = kept
+
+    @property
+    def removed_samples(self):
+        return self.original_samples - self.kept_samples
+
+    @property
+    def removed_percent(self):
+        if self.original_samples == 0:
+            return 0.0
+        return 100.0 * self.removed_samples / self.original_samples
+
+    def to_original(self, seconds, end=False):
+        """Original time for a trimmed time.
+
+        A time on the seam between two kept ranges maps to the start of the
+        later range, or to the end of the earlier one when end=True.
+        """
+        if not self.ranges:
+            return seconds
+        position = int(round(seconds * self.sample_rate))
+        if end:
+            index = bisect.bisect_left(self.trimmed_starts, position) - 1
+        else:
+            index = bisect.bisect_right(self.trimmed_starts, position) - 1
+        index = max(0, index)
+        start, _ = self.ranges[index]
+        return (start + position - self.trimmed_starts[index]) / self.sample_rate
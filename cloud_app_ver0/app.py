@@ -1,19 +1,32 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, Response, render_template, request, jsonify, g, stream_with_context
 from flask_cors import CORS
-import os
+import math
 import logging
 import traceback
 from dotenv import load_dotenv
 from services.transcription_service import TranscriptionService
 from services.nlp_service import NLPService
 from services.report_generator import ReportGenerator
+from services.report_pipeline import ReportPipeline, parse_flag
+from services.batch_reports import BatchReportService
+from services.client_registry import clients
+from services.medication_lexicon import medication_lexicon
+from services.resilience import (
+    CircuitOpenError,
+    DeadlineExceededError,
+    reset_deadline,
+    set_deadline,
+)
+from config.config import Config
+from utils.metrics import metrics
 from config.logging_config import setup_logging, log_request_info
-import tempfile
+from utils.audio_buffer import SpooledUploadRequest
 import json
 
 load_dotenv()
 
 app = Flask(__name__)
+app.request_class = SpooledUploadRequest
 CORS(app)
 
 # Set up logging
@@ -23,6 +36,28 @@ log_request_info(app)
 transcription_service = TranscriptionService()
 nlp_service = NLPService()
 report_generator = ReportGenerator()
+report_pipeline = ReportPipeline(nlp_service, report_generator)
+batch_reports = BatchReportService()
+
+
+@app.before_request
+def start_request_deadline():
+    # Callers may pass their own remaining budget; upstream calls never outlive it
+    seconds = Config.REQUEST_DEADLINE_SECONDS
+    header = request.headers.get(Config.REQUEST_DEADLINE_HEADER)
+    if header:
+        try:
+            seconds = min(seconds, float(header))
+        except ValueError:
+            logger.warning(f"Ignoring invalid {Config.REQUEST_DEADLINE_HEADER} header: {header}")
+    g.deadline_token = set_deadline(seconds)
+
+
+@app.teardown_request
+def end_request_deadline(error=None):
+    token = g.pop("deadline_token", None)
+    if token is not None:
+        reset_deadline(token)
 
 
 @app.route("/")
@@ -32,7 +67,6 @@ def index():
 
 @app.route("/api/transcribe", methods=["POST"])
 def transcribe_audio():
-    temp_file_path = None
     try:
         logger.info("Transcription request received")
 
@@ -45,32 +79,38 @@ def transcribe_audio():
             f"Audio file received: {audio_file.filename}, size: {audio_file.content_length}"
         )
 
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as temp_file:
-            temp_file_path = temp_file.name
-            audio_file.save(temp_file_path)
-            logger.debug(f"Audio saved to temporary file: {temp_file_path}")
-
-            logger.info("Starting transcription process")
-            transcription = transcription_service.transcribe_audio(temp_file_path)
-            logger.info(f"Transcription completed: {len(transcription)} characters")
-
-            return jsonify({"transcription": transcription})
-
+        # The service reads the upload in place: in memory when small,
+        # memory-mapped from werkzeug's spool file when large - no temp file copy
+        logger.info("Starting transcription process")
+        transcription, job = transcription_service.start_transcription(audio_file.stream)
+
+        # Dictations still long once trimmed and re-encoded are recognized in
+        # the background; the client polls the job status endpoint instead of
+        # holding the request open
+        if job is not None:
+            logger.info(f"Long running transcription job submitted: {job.id}")
+            return (
+                jsonify(
+                    {
+                        "job_id": job.id,
+                        "status": job.status,
+                        "status_url": f"/api/transcribe/jobs/{job.id}",
+                    }
+                ),
+                202,
+            )
+
+        logger.info(f"Transcription completed: {len(transcription)} characters")
+        return jsonify({"transcription": transcription})
+
+    except (CircuitOpenError, DeadlineExceededError):
+        raise
     except Exception as e:
         error_msg = f"Transcription failed: {str(e)}"
         logger.error(error_msg)
         logger.error(f"Full traceback: {traceback.format_exc()}")
         return jsonify({"error": error_msg}), 500
 
-    finally:
-        # Clean up temp file
-        if temp_file_path and os.path.exists(temp_file_path):
-            try:
-                os.unlink(temp_file_path)
-                logger.debug(f"Cleaned up temp file: {temp_file_path}")
-            except Exception as cleanup_error:
-                logger.warning(f"Failed to cleanup temp file: {cleanup_error}")
-
 
 @app.route("/api/generate-report", methods=["POST"])
 def generate_report():
@@ -89,19 +129,24 @@ def generate_report():
             logger.warning("Empty transcription provided")
             return jsonify({"error": "No transcription provided"}), 400
 
-        logger.info("Starting NLP entity extraction")
-        entities = nlp_service.extract_entities(transcription)
-        logger.info(f"Extracted {len(entities)} entities")
-
-        logger.info("Structuring extracted data")
-        structured_data = nlp_service.structure_data(entities, transcription)
-
-        logger.info("Generating final report")
-        report = report_generator.generate_report(structured_data)
+        try:
+            options = {
+                "extract_entities": parse_flag(data, "extract_entities"),
+                "include_entities": parse_flag(data, "include_entities", False),
+                "escalate": parse_flag(data, "escalate", True),
+            }
+        except Exception as e:
+            logger.warning(f"Invalid report options: {str(e)}")
+            return jsonify({"error": str(e)}), 400
+
+        # Entities are fetched concurrently and only awaited when included
+        result = report_pipeline.run(transcription, **options)
         logger.info("Report generation completed successfully")
 
-        return jsonify({"structured_data": structured_data, "report": report})
+        return jsonify(result)
 
+    except (CircuitOpenError, DeadlineExceededError):
+        raise
     except Exception as e:
         error_msg = f"Report generation failed: {str(e)}"
         logger.error(error_msg)
@@ -109,9 +154,89 @@ def generate_report():
         return jsonify({"error": error_msg}), 500
 
 
+@app.route("/api/generate-report/batch", methods=["POST"])
+def generate_report_batch():
+    data = request.get_json(silent=True) or {}
+    transcriptions = data.get("transcriptions")
+    try:
+        batch_reports.validate(transcriptions)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+    logger.info(f"Batch report generation request received: {len(transcriptions)} transcriptions")
+
+    def generate():
+        # One JSON line per transcript as soon as it is done; a failed item doesn't stop the rest
+        failed = 0
+        for item in batch_reports.run(transcriptions):
+            failed += "error" in item
+            yield json.dumps(item) + "\n"
+        yield json.dumps({"done": True, "count": len(transcriptions), "failed": failed}) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+
+@app.route("/api/entities/stream", methods=["POST"])
+def stream_entities():
+    data = request.get_json(silent=True) or {}
+    transcription = data.get("transcription", "")
+    if not transcription:
+        return jsonify({"error": "No transcription provided"}), 400
+
+    try:
+        from services.gemini_nlp_service import get_gemini_service
+
+        gemini = get_gemini_service()
+    except Exception as e:
+        logger.error(f"Gemini entity streaming unavailable: {str(e)}")
+        return jsonify({"error": f"Gemini is not available: {str(e)}"}), 503
+
+    def generate():
+        # One JSON line per section, as soon as the model has finished it
+        for section, value in gemini.stream_entities(transcription):
+            yield json.dumps({"section": section, "value": value}) + "\n"
+        yield json.dumps({"done": True}) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+
+@app.route("/api/medications/reload", methods=["POST"])
+def reload_medication_lexicon():
+    try:
+        medication_lexicon.reload()
+    except Exception as e:
+        logger.error(f"Medication lexicon reload failed: {str(e)}")
+        return jsonify({"error": f"Medication lexicon reload failed: {str(e)}",
+                        "version": medication_lexicon.version}), 400
+    return jsonify(medication_lexicon.get_stats())
+
+
+@app.route("/api/transcribe/jobs/<job_id>", methods=["GET"])
+def transcription_job_status(job_id):
+    job = transcription_service.get_job(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job.to_dict())
+
+
+@app.route("/api/transcription/stats", methods=["GET"])
+def transcription_stats():
+    return jsonify(transcription_service.get_stats())
+
+
+@app.route("/metrics", methods=["GET"])
+def prometheus_metrics():
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+
 @app.route("/api/health", methods=["GET"])
 def health_check():
-    return jsonify({"status": "healthy"})
+    return jsonify({
+        "status": "healthy",
+        "google_clients": clients.get_stats(),
+        "medication_lexicon": medication_lexicon.get_stats(),
+        "report_pipeline": report_pipeline.get_stats(),
+    })
 
 
 @app.route("/api/log-error", methods=["POST"])
@@ -154,6 +279,21 @@ def method_not_allowed(error):
     return jsonify({"error": "Method not allowed"}), 405
 
 
+@app.errorhandler(CircuitOpenError)
+def upstream_unavailable(error):
+    logger.warning(f"503 fast-fail: {str(error)}")
+    response = jsonify({"error": str(error), "upstream": error.upstream})
+    response.status_code = 503
+    response.headers["Retry-After"] = str(max(1, math.ceil(error.retry_after)))
+    return response
+
+
+@app.errorhandler(DeadlineExceededError)
+def deadline_exceeded(error):
+    logger.warning(f"504 deadline exceeded: {str(error)}")
+    return jsonify({"error": str(error)}), 504
+
+
 @app.errorhandler(500)
 def internal_server_error(error):
     logger.error(f"500 error: {str(error)}")
@@ -163,4 +303,5 @@ def internal_server_error(error):
 if __name__ == "__main__":
     logger.info("Starting Pediatric EMR Speech-to-Report Application")
     logger.info("Server starting on http://localhost:8080")
+    clients.warm_up_in_background()
     app.run(debug=True, host="0.0.0.0", port=8080)
@@ -1,22 +1,46 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, render_template, request, jsonify, g
 from flask_cors import CORS
-import os
 from dotenv import load_dotenv
 from services.transcription_service import TranscriptionService
 from services.nlp_service import NLPService
 from services.report_generator import ReportGenerator
-import tempfile
+from services.report_pipeline import ReportPipeline, parse_flag
+from services.client_registry import clients
+from services.resilience import CircuitOpenError, DeadlineExceededError, reset_deadline, set_deadline
+from config.config import Config
+from utils.audio_buffer import SpooledUploadRequest
 import json
+import math
 import ssl
 
 load_dotenv()
 
 app = Flask(__name__)
+app.request_class = SpooledUploadRequest
 CORS(app)
 
 transcription_service = TranscriptionService()
 nlp_service = NLPService()
 report_generator = ReportGenerator()
+report_pipeline = ReportPipeline(nlp_service, report_generator)
+
+@app.before_request
+def start_request_deadline():
+    # Callers may pass their own remaining budget; upstream calls never outlive it
+    seconds = Config.REQUEST_DEADLINE_SECONDS
+    header = request.headers.get(Config.REQUEST_DEADLINE_HEADER)
+    if header:
+        try:
+            seconds = min(seconds, float(header))
+        except ValueError:
+            app.logger.warning(f'Ignoring invalid {Config.REQUEST_DEADLINE_HEADER} header: {header}')
+    g.deadline_token = set_deadline(seconds)
+
+@app.teardown_request
+def end_request_deadline(error=None):
+    token = g.pop('deadline_token', None)
+    if token is not None:
+        reset_deadline(token)
 
 @app.route('/')
 def index():
@@ -30,18 +54,29 @@ def transcribe_audio():
         
         audio_file = request.files['audio']
         
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.wav') as temp_file:
-            audio_file.save(temp_file.name)
-            
-            transcription = transcription_service.transcribe_audio(temp_file.name)
-            
-            os.unlink(temp_file.name)
-            
-            return jsonify({'transcription': transcription})
+        # Long dictations are recognized in the background and polled for
+        transcription, job = transcription_service.start_transcription(audio_file.stream)
+        if job is not None:
+            return jsonify({
+                'job_id': job.id,
+                'status': job.status,
+                'status_url': f'/api/transcribe/jobs/{job.id}'
+            }), 202
+        
+        return jsonify({'transcription': transcription})
     
+    except (CircuitOpenError, DeadlineExceededError):
+        raise
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/transcribe/jobs/<job_id>', methods=['GET'])
+def transcription_job_status(job_id):
+    job = transcription_service.get_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job.to_dict())
+
 @app.route('/api/generate-report', methods=['POST'])
 def generate_report():
     try:
@@ -51,17 +86,21 @@ def generate_report():
         if not transcription:
             return jsonify({'error': 'No transcription provided'}), 400
         
-        entities = nlp_service.extract_entities(transcription)
+        try:
+            options = {
+                'extract_entities': parse_flag(data, 'extract_entities'),
+                'include_entities': parse_flag(data, 'include_entities', False),
+                'escalate': parse_flag(data, 'escalate', True)
+            }
+        except Exception as e:
+            return jsonify({'error': str(e)}), 400
         
-        structured_data = nlp_service.structure_data(entities, transcription)
+        result = report_pipeline.run(transcription, **options)
         
-        report = report_generator.generate_report(structured_data)
-        
-        return jsonify({
-            'structured_data': structured_data,
-            'report': report
-        })
+        return jsonify(result)
     
+    except (CircuitOpenError, DeadlineExceededError):
+        raise
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -69,7 +108,19 @@ def generate_report():
 def health_check():
     return jsonify({'status': 'healthy'})
 
+@app.errorhandler(CircuitOpenError)
+def upstream_unavailable(error):
+    response = jsonify({'error': str(error), 'upstream': error.upstream})
+    response.status_code = 503
+    response.headers['Retry-After'] = str(max(1, math.ceil(error.retry_after)))
+    return response
+
+@app.errorhandler(DeadlineExceededError)
+def deadline_exceeded(error):
+    return jsonify({'error': str(error)}), 504
+
 if __name__ == '__main__':
+    clients.warm_up_in_background()
     # Create a self-signed SSL context for development
     context = ssl.SSLContext(ssl.PROTOCOL_TLSv1_2)
     context.load_cert_chain('cert.pem', 'key.pem')
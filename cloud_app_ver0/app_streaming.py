@@ -2,7 +2,12 @@ from flask import Flask, render_template, request, jsonify
 from flask_socketio import SocketIO, emit
 import base64
 import io
+import time
 from services.transcription_service import TranscriptionService
+from services.streaming_sessions import StreamingSessionManager
+from services.client_registry import clients
+from services.incremental_extractor import IncrementalExtractor
+from services.report_pipeline import extracted_fields
 import logging
 
 app = Flask(__name__)
@@ -10,6 +15,8 @@ app.config['SECRET_KEY'] = 'your-secret-key'
 socketio = SocketIO(app, cors_allowed_origins="*")
 
 transcription_service = TranscriptionService()
+session_manager = StreamingSessionManager(transcription_service)
+live_records = {}  # sid -> (IncrementalExtractor, finalized transcript parts)
 logger = logging.getLogger(__name__)
 
 @app.route('/')
@@ -18,36 +25,97 @@ def index():
 
 @socketio.on('start_recording')
 def handle_start_recording():
-    logger.info("Starting streaming transcription session")
+    sid = request.sid
+    logger.info(f"Starting streaming transcription session {sid}")
+    
+    extractor, final_parts = live_records[sid] = (IncrementalExtractor(), [])
+    last_record = {}
+    
+    def on_result(result):
+        # The whole transcript so far goes with each result; the structured
+        # preview below carries only the extracted fields
+        text = ' '.join(final_parts + [result['transcript']]).strip()
+        if result['is_final']:
+            final_parts.append(result['transcript'].strip())
+        socketio.emit('transcription_update', {
+            'text': result['transcript'],
+            'full_text': text,
+            'is_final': result['is_final'],
+            'stability': result['stability'],
+            'result_end_time': result['result_end_time']
+        }, to=sid)
+        
+        # Live structured preview; only new or edited sentences are re-extracted
+        try:
+            record = extractor.update(text)
+        except Exception as e:
+            logger.error(f"Live structuring failed: {e}")
+            return
+        preview = extracted_fields(record)
+        del preview['original_transcript']
+        del preview['history']['presenting_history']
+        del preview['metadata']['generated_at']
+        if preview != last_record.get('preview'):
+            last_record['preview'] = preview
+            socketio.emit('structured_update', preview, to=sid)
+    
+    def on_error(error):
+        socketio.emit('error', {'message': str(error)}, to=sid)
+    
+    if session_manager.start(sid, on_result, on_error) is None:
+        live_records.pop(sid, None)
+        emit('error', {'message': 'Too many active dictation sessions, please retry shortly'})
+        return
+    
     emit('recording_started', {'status': 'Recording started'})
 
 @socketio.on('audio_data')
 def handle_audio_data(data):
     try:
-        # Get audio data from client
-        audio_data = data['audio']
-        
-        # Decode base64 audio data
-        audio_bytes = base64.b64decode(audio_data.split(',')[1])
+        started = time.perf_counter()
+        audio_frame = unpack_audio_frame(data)
+        decode_seconds = time.perf_counter() - started
         
-        # Process with streaming recognition (simplified)
-        # In production, this would maintain a streaming connection
-        logger.info(f"Received audio chunk: {len(audio_bytes)} bytes")
-        
-        # For now, emit back a placeholder transcription
-        emit('transcription_update', {
-            'text': 'Real-time transcription would appear here...',
-            'is_final': False
-        })
+        if not session_manager.feed(request.sid, audio_frame, decode_seconds):
+            emit('error', {'message': 'Audio chunk dropped: no active session or buffer full'})
         
     except Exception as e:
         logger.error(f"Streaming error: {e}")
         emit('error', {'message': str(e)})
 
+def unpack_audio_frame(data):
+    """Return the audio bytes of an audio_data event.
+
+    Clients should send the frame as a binary attachment, either bare or as
+    {'audio': <bytes>}. The older base64 data URL form is still accepted.
+    """
+    audio_data = data.get('audio') if isinstance(data, dict) else data
+    
+    if isinstance(audio_data, (bytes, bytearray, memoryview)):
+        return audio_data
+    
+    if isinstance(audio_data, str):
+        # Fallback: 'data:audio/webm;base64,....'
+        return base64.b64decode(audio_data[audio_data.index(',') + 1:])
+    
+    raise ValueError("audio_data must be a binary frame or a base64 data URL")
+
 @socketio.on('stop_recording')
 def handle_stop_recording():
-    logger.info("Stopping streaming transcription session")
+    logger.info(f"Stopping streaming transcription session {request.sid}")
+    session_manager.stop(request.sid)
+    live_records.pop(request.sid, None)
     emit('recording_stopped', {'status': 'Recording stopped'})
 
+@app.route('/api/streaming/stats')
+def streaming_stats():
+    return jsonify(session_manager.get_stats())
+
+@socketio.on('disconnect')
+def handle_disconnect():
+    session_manager.stop(request.sid)
+    live_records.pop(request.sid, None)
+
 if __name__ == '__main__':
-    socketio.run(app, debug=True, host='0.0.0.0', port=5001)
\ No newline at end of file
+    clients.warm_up_in_background()
+    socketio.run(app, debug=True, host='0.0.0.0', port=5001)
@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+"""
+Benchmark rule-based structured-data extraction
+
+Compares the compiled ExtractionEngine used by NLPService.structure_data
+with the previous implementation (one regex scan per field, patterns
+compiled on every call, medications from a catch-all regex), checks that
+both produce the same record apart from medications and
+reports the time per transcript from 1KB to 100KB. Pass text files to use
+real transcripts.
+
+    python benchmark_extraction.py [transcript.txt ...]
+"""
+
+import re
+import sys
+import time
+import random
+import logging
+from datetime import datetime
+from services.nlp_service import NLPService
+
+SIZES_KB = [1, 5, 20, 50, 100]
+REPEAT_SECONDS = 1.0
+
+SENTENCES = [
+    "Patient is a 7 year old child, age 7, sex male, admitted with fever and cough for 3 days.",
+    "Known case of B-ALL on maintenance chemotherapy, diagnosed with B-cell acute lymphoblastic leukemia in 2022.",
+    "On examination temperature 101.2 F, heart rate 128/min, blood pressure 100/60, respiratory rate 30.",
+    "Bilateral crepitations heard, no retractions.",
+    "Hb 9.2, WBC 2.1, platelet count 85000.",
+    "Started on Inj Cefoperazone 1g IV twice daily, Syp Paracetamol 250mg as needed, Tab Oseltamivir 45mg.",
+    "Reviewed by Dr. Manjusha Nair in the morning rounds.",
+    "The child was comfortable through the night and tolerated oral feeds.",
+    "Mother reports reduced appetite and mild lethargy since yesterday.",
+    "Chest X-ray showed right lower zone haziness, blood culture has been sent.",
+    "Plan to continue current antibiotics and review the counts tomorrow.",
+]
+
+def legacy_structure_data(original_text):
+    """NLPService.structure_data as it was before the compiled extraction engine"""
+    # Initialize with default department information
+    structured_data = {
+        'department': 'Department of Paediatric Oncology',
+        'division_head': 'Dr. Priyakumari T (Professor)',
+        'service_head': 'Dr. Priyakumari T (Professor)',
+        'doctors': [
+            'Dr. Manjusha Nair (Assoc. Professor)',
+            'Dr. Prasanth VR (Asst. Professor)',
+            'Dr. Binitha R (Assoc. Professor)',
+            'Dr. Guruprasad CS (Assoc. Professor)',
+            'Dr. Kalasekhar VS (Asst. Professor)'
+        ],
+        'patient_details': {
+            'cr_no': '',
+            'name': '',
+            'age': '',
+            'sex': '',
+            'unit': '',
+            'attending_oncologist': ''
+        },
+        'admission_details': {
+            'diagnosis': '',
+            'histology': 'NIL',
+            'stage': '',
+            'doa': '',
+            'dod': '',
+            'reason_for_admission': ''
+        },
+        'history': {
+            'chief_complaints': '',
+            'presenting_history': ''
+        },
+        'clinical_examination': {
+            'general_condition': '',
+            'vitals': {
+                'hr': '',
+                'bp': '',
+                'temp': '',
+                'rr': ''
+            },
+            'systems': {
+                'respiratory_system': '',
+                'cardiovascular_system': 'WNL',
+                'gastrointestinal_system': 'WNL',
+                'neurological_system': 'WNL',
+                'other_systems': 'WNL'
+            }
+        },
+        'investigations': {
+            'lab_results': [],
+            'other_investigations': {
+                'blood_culture': '',
+                'procalcitonin': '',
+                'cxr': '',
+                'urine_culture': '',
+                'other': ''
+            }
+        },
+        'treatment': {
+            'drugs_regime_and_dose': {},
+            'medications': []
+        },
+        'course_in_hospital': '',
+        'emergency_contacts': {
+            'casualty': '04712522458 (24 Hrs)',
+            'a_clinic': '04712522317/2522392/2522391',
+            'b_clinic': '04712522379/2522398',
+            'c_clinic': '04712522202/2522371',
+            'd_clinic': '04712522372/2522374',
+            'e_clinic': '04712522334/2522397',
+            'f_clinic': '04712522368/8289897454'
+        },
+        'original_transcript': original_text,
+        'metadata': {
+            'generated_at': datetime.now().isoformat(),
+            'processing_model': 'google_cloud_nlp',
+            'confidence_score': 0.0
+        }
+    }
+
+
+    # Extract patient demographics
+    age_pattern = r'(?:age|aged?)\s*:?\s*(\d+)'
+    age_match = re.search(age_pattern, original_text, re.IGNORECASE)
+    if age_match:
+        structured_data['patient_details']['age'] = age_match.group(1)
+
+    sex_pattern = r'(?:sex|gender)\s*:?\s*(male|female|m|f)'
+    sex_match = re.search(sex_pattern, original_text, re.IGNORECASE)
+    if sex_match:
+        structured_data['patient_details']['sex'] = sex_match.group(1).upper()
+
+    # Extract diagnosis information
+    diagnosis_patterns = [
+        r'(B[\s-]?ALL[^\.]*)',
+        r'(leukemia[^\.]*)',
+        r'(diagnosed with ([^\.]+))',
+        r'(condition[:\s]+([^\.]+))'
+    ]
+    for pattern in diagnosis_patterns:
+        matches = re.findall(pattern, original_text, re.IGNORECASE)
+        for match in matches:
+            diagnosis = match[0] if isinstance(match, tuple) else match
+            if diagnosis and diagnosis not in structured_data['admission_details']['diagnosis']:
+                structured_data['admission_details']['diagnosis'] = diagnosis.strip()
+                break
+
+    # Extract vitals and clinical findings
+    temp_pattern = r'(?:temperature|temp|fever)[:\s]*(\d+\.?\d*)\s*(F|C|fahrenheit|celsius)?'
+    temp_match = re.search(temp_pattern, original_text, re.IGNORECASE)
+    if temp_match:
+        temp_unit = temp_match.group(2) if temp_match.group(2) else 'F'
+        structured_data['clinical_examination']['vitals']['temp'] = f"{temp_match.group(1)}°{temp_unit.upper()}"
+        structured_data['clinical_examination']['general_condition'] = f"Febrile ({temp_match.group(1)}°{temp_unit.upper()})"
+
+    hr_pattern = r'(?:heart rate|HR|pulse)[:\s]*(\d+)(?:/min)?'
+    hr_match = re.search(hr_pattern, original_text, re.IGNORECASE)
+    if hr_match:
+        structured_data['clinical_examination']['vitals']['hr'] = f"{hr_match.group(1)}/min"
+
+    bp_pattern = r'(?:blood pressure|BP)[:\s]*(\d+/\d+)'
+    bp_match = re.search(bp_pattern, original_text, re.IGNORECASE)
+    if bp_match:
+        structured_data['clinical_examination']['vitals']['bp'] = f"{bp_match.group(1)}mmhg"
+
+    # Extract respiratory system findings
+    resp_findings = []
+    if re.search(r'crepitations?', original_text, re.IGNORECASE):
+        resp_findings.append('Crepitations present')
+    if re.search(r'no retractions?', original_text, re.IGNORECASE):
+        resp_findings.append('No retractions')
+    if resp_findings:
+        structured_data['clinical_examination']['systems']['respiratory_system'] = '. '.join(resp_findings)
+
+    # Extract lab results
+    lab_result = {}
+    lab_patterns = {
+        'hb': r'(?:Hb|hemoglobin)[:\s]*(\d+\.?\d*)',
+        'wbc': r'(?:WBC|white blood cell count?)[:\s]*(\d+\.?\d*)',
+        'platelet': r'(?:platelet count?)[:\s]*(\d+\.?\d*)'
+    }
+
+    for lab_name, pattern in lab_patterns.items():
+        match = re.search(pattern, original_text, re.IGNORECASE)
+        if match:
+            lab_result[lab_name] = match.group(1)
+
+    if lab_result:
+        lab_result['date'] = datetime.now().strftime('%d/%m/%Y')
+        structured_data['investigations']['lab_results'].append(lab_result)
+
+    # Extract medications
+    medication_patterns = [
+        r'((?:Inj\.?\s+|Syp\.?\s+|Tab\.?\s+)?(?:Cefoperazone[^,\.]*|Oseltamivir[^,\.]*|Clarithromycin[^,\.]*|Paracetamol[^,\.]*|[A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)[^,\.]*)',
+    ]
+
+    medications_found = set()
+    for pattern in medication_patterns:
+        matches = re.findall(pattern, original_text, re.IGNORECASE)
+        for match in matches:
+            med_name = match.strip()
+            if len(med_name) > 3 and med_name not in medications_found:
+                medications_found.add(med_name)
+                structured_data['treatment']['medications'].append({
+                    'name': med_name,
+                    'dose': '',
+                    'frequency': '',
+                    'duration': ''
+                })
+
+    # Extract attending oncologist
+    dr_pattern = r'(?:Dr\.?\s+|Doctor\s+)([A-Z][a-z]+(?:\s+[A-Z][a-z]*\.?)*)'
+    dr_matches = re.findall(dr_pattern, original_text, re.IGNORECASE)
+    for dr_name in dr_matches:
+        full_name = f"Dr. {dr_name.strip()}"
+        if not structured_data['patient_details']['attending_oncologist']:
+            structured_data['patient_details']['attending_oncologist'] = full_name
+        break
+
+    # Extract chief complaints and history
+    complaint_patterns = [
+        r'(?:chief complaint|complaints?|CC)[:\s]+([^\.]+)',
+        r'(?:presenting with|presents with|admitted with)[:\s]+([^\.]+)',
+        r'(?:fever[^\.]*cough[^\.]*|cough[^\.]*fever[^\.]*)'
+    ]
+
+    for pattern in complaint_patterns:
+        match = re.search(pattern, original_text, re.IGNORECASE)
+        if match:
+            complaint = match.group(1) if len(match.groups()) > 0 else match.group(0)
+            structured_data['history']['chief_complaints'] = complaint.strip()
+            break
+
+    # Use original text for presenting history if specific history not found
+    if not structured_data['history']['presenting_history']:
+        structured_data['history']['presenting_history'] = original_text[:200] + "..." if len(original_text) > 200 else original_text
+
+    # Calculate confidence score based on extracted information
+    confidence_factors = 0
+    total_factors = 6
+
+    if structured_data['patient_details']['age']: confidence_factors += 1
+    if structured_data['patient_details']['sex']: confidence_factors += 1
+    if structured_data['admission_details']['diagnosis']: confidence_factors += 1
+    if structured_data['clinical_examination']['vitals']['temp']: confidence_factors += 1
+    if structured_data['investigations']['lab_results']: confidence_factors += 1
+    if structured_data['treatment']['medications']: confidence_factors += 1
+
+    structured_data['metadata']['confidence_score'] = confidence_factors / total_factors
+
+
+    return structured_data
+
+
+def comparable(record):
+    """Drop the fields that depend on the time of the call, and medications,
+    which now come from the lexicon instead of the catch-all regex"""
+    record = dict(record)
+    record['metadata'] = {k: v for k, v in record['metadata'].items() if k not in ('generated_at', 'confidence_score')}
+    record['treatment'] = {k: v for k, v in record['treatment'].items() if k != 'medications'}
+    record['investigations'] = dict(record['investigations'])
+    record['investigations']['lab_results'] = [
+        {k: v for k, v in lab.items() if k != 'date'} for lab in record['investigations']['lab_results']
+    ]
+    return record
+
+def build_transcript(size_kb, seed=0):
+    rng = random.Random(seed)
+    parts, length = [], 0
+    while length < size_kb * 1024:
+        sentence = rng.choice(SENTENCES)
+        parts.append(sentence)
+        length += len(sentence) + 1
+    return " ".join(parts)[:size_kb * 1024]
+
+def time_per_call(fn, text):
+    calls = 0
+    started = time.perf_counter()
+    while time.perf_counter() - started < REPEAT_SECONDS:
+        fn(text)
+        calls += 1
+    return (time.perf_counter() - started) / calls
+
+def measure(service, text, label):
+    legacy = legacy_structure_data(text)
+    current = service.structure_data([], text)
+    if comparable(legacy) != comparable(current):
+        raise Exception(f"{label}: single-pass extraction differs from the legacy implementation")
+
+    legacy_seconds = time_per_call(legacy_structure_data, text)
+    current_seconds = time_per_call(lambda t: service.structure_data([], t), text)
+    print(f"{label:>24}{legacy_seconds * 1000:>12.2f}{current_seconds * 1000:>12.2f}"
+          f"{legacy_seconds / current_seconds:>9.1f}x"
+          f"{len(legacy['treatment']['medications']):>10}{len(current['treatment']['medications']):>10}")
+
+if __name__ == "__main__":
+    logging.disable(logging.INFO)
+    service = NLPService()
+    print(f"{'transcript':>24}{'legacy ms':>12}{'engine ms':>12}{'speedup':>10}{'meds old':>10}{'meds new':>10}")
+    if len(sys.argv) > 1:
+        for path in sys.argv[1:]:
+            with open(path, encoding='utf-8') as f:
+                measure(service, f.read(), path)
+    else:
+        for size_kb in SIZES_KB:
+            measure(service, build_transcript(size_kb), f"synthetic {size_kb}KB")
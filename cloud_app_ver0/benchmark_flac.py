@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Benchmark FLAC re-encoding: CPU time spent vs upload time saved
+
+Encodes 16kHz mono recordings with the streaming FLAC encoder used before
+recognition and compares the encode time with the time the smaller payload
+saves on uplinks of several speeds. Pass WAV/FLAC paths to use real
+dictations; otherwise speech-like synthetic audio is generated.
+
+    python benchmark_flac.py [audio_file ...]
+"""
+
+import sys
+import time
+import numpy as np
+from services.audio_segmenter import AudioSegmenter, encode_wav, iter_flac
+
+DURATIONS_SECONDS = [10, 60, 300, 1800]
+UPLINK_MBPS = [2, 10, 50]
+
+def create_test_audio(duration_seconds, sample_rate=16000, seed=0):
+    """Band-limited noise with syllable-rate amplitude modulation and a noise floor"""
+    rng = np.random.default_rng(seed)
+    n = int(duration_seconds * sample_rate)
+    t = np.arange(n) / sample_rate
+    voice = np.convolve(rng.normal(0, 1, n), np.ones(6) / 6, mode='same')
+    envelope = np.clip(np.sin(2 * np.pi * 2.5 * t) + 0.3 * np.sin(2 * np.pi * 0.4 * t), 0, None)
+    floor = rng.normal(0, 0.01, n)
+    return (np.clip(0.4 * voice * envelope + floor, -1, 1) * 32767).astype(np.int16), sample_rate
+
+def load_audio(path):
+    with open(path, 'rb') as f:
+        decoded = AudioSegmenter(flac=True).decode(f.read())
+    if decoded is None:
+        raise Exception(f"Could not decode {path}")
+    return decoded
+
+def measure(samples, sample_rate, label):
+    wav_bytes = len(encode_wav(samples, sample_rate))
+
+    started = time.process_time()
+    flac_bytes = sum(len(block) for block in iter_flac(samples, sample_rate))
+    encode_seconds = time.process_time() - started
+
+    saved_bytes = wav_bytes - flac_bytes
+    print(f"\n{label}: {len(samples) / sample_rate:.0f}s, WAV {wav_bytes / 1e6:.2f} MB -> "
+          f"FLAC {flac_bytes / 1e6:.2f} MB ({100.0 * flac_bytes / wav_bytes:.0f}%), "
+          f"encode CPU {encode_seconds * 1000:.1f} ms")
+    print(f"  {'uplink':>10}{'upload saved (s)':>18}{'net gain (s)':>14}")
+    for mbps in UPLINK_MBPS:
+        saved_seconds = saved_bytes * 8 / (mbps * 1e6)
+        print(f"  {str(mbps) + ' Mbps':>10}{saved_seconds:>18.2f}{saved_seconds - encode_seconds:>14.2f}")
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        for path in sys.argv[1:]:
+            samples, sample_rate = load_audio(path)
+            measure(samples, sample_rate, path)
+    else:
+        for duration in DURATIONS_SECONDS:
+            samples, sample_rate = create_test_audio(duration)
+            measure(samples, sample_rate, f"synthetic speech {duration}s")
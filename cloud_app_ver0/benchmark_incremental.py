@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Benchmark incremental structuring of a growing transcript
+
+Checks that IncrementalExtractor, fed a dictation a word at a time, ends
+with the same record as NLPService.structure_data on the whole text, over
+randomly ordered dictations that state each field once except the chief
+complaint, which is stated several ways to exercise pattern priority.
+Attending names are compared up to their first period (the whole-text
+pattern runs on past it). Then reports the time per update against
+re-structuring the whole transcript, for transcripts from 1KB to 100KB.
+
+    python benchmark_incremental.py
+"""
+
+import copy
+import time
+import random
+import logging
+from services.nlp_service import NLPService
+from services.incremental_extractor import IncrementalExtractor
+
+SIZES_KB = [1, 5, 20, 50, 100]
+PARITY_DICTATIONS = 300
+UPDATES_TIMED = 50
+
+FIELD_SENTENCES = [
+    "Age: 7 years.",
+    "Sex: male.",
+    "Known case of B-ALL on maintenance chemotherapy.",
+    "On examination temperature 101.2 F, heart rate 128/min, blood pressure 100/60.",
+    "Hb 9.2, WBC 3400 and platelet count 150000.",
+    "Bilateral crepitations heard, no retractions.",
+    "Seen by Dr. Priya Menon.",
+    "Started Inj. Vincristine 1.5mg weekly for 4 weeks.",
+    "Tab. Ondansetron 4mg twice daily.",
+]
+COMPLAINT_SENTENCES = [
+    "She has fever and cough since 2 days.",
+    "Chief complaint: vomiting.",
+    "Presents with abdominal pain.",
+]
+
+def build_dictation(rng):
+    sentences = rng.sample(FIELD_SENTENCES, rng.randint(1, len(FIELD_SENTENCES)))
+    sentences += rng.sample(COMPLAINT_SENTENCES, rng.randint(0, len(COMPLAINT_SENTENCES)))
+    rng.shuffle(sentences)
+    return " ".join(sentences)
+
+def comparable(record):
+    record = copy.deepcopy(record)
+    record.pop('metadata')
+    attending = record['patient_details']['attending_oncologist']
+    record['patient_details']['attending_oncologist'] = attending.split('.')[1:2]
+    return record
+
+def feed_word_by_word(text):
+    extractor = IncrementalExtractor()
+    words = text.split(" ")
+    for count in range(1, len(words) + 1):
+        record = extractor.update(" ".join(words[:count]))
+    return record
+
+def check_parity(service):
+    rng = random.Random(0)
+    mismatches = {}
+    for _ in range(PARITY_DICTATIONS):
+        text = build_dictation(rng)
+        expected = comparable(service.structure_data([], text))
+        actual = comparable(feed_word_by_word(text))
+        for key in expected:
+            if expected[key] != actual[key]:
+                mismatches.setdefault(key, text)
+    for key, text in mismatches.items():
+        print(f"MISMATCH in {key}: {text}")
+    print(f"parity: {PARITY_DICTATIONS} dictations, {len(mismatches)} mismatched fields")
+    return not mismatches
+
+def build_transcript(size_kb, seed=0):
+    rng = random.Random(seed)
+    parts, length = [], 0
+    while length < size_kb * 1024:
+        sentence = rng.choice(FIELD_SENTENCES + COMPLAINT_SENTENCES)
+        parts.append(sentence)
+        length += len(sentence) + 1
+    return " ".join(parts)
+
+def measure(service, size_kb):
+    words = build_transcript(size_kb).split(" ")
+    texts = [" ".join(words[:count]) for count in range(len(words) - UPDATES_TIMED, len(words) + 1)]
+
+    extractor = IncrementalExtractor()
+    extractor.update(texts[0])
+    started = time.perf_counter()
+    for text in texts[1:]:
+        extractor.update(text)
+    incremental_seconds = (time.perf_counter() - started) / UPDATES_TIMED
+
+    started = time.perf_counter()
+    for text in texts[1:]:
+        service.structure_data([], text)
+    full_seconds = (time.perf_counter() - started) / UPDATES_TIMED
+
+    print(f"{f'synthetic {size_kb}KB':>24}{full_seconds * 1000:>12.2f}{incremental_seconds * 1000:>16.3f}"
+          f"{full_seconds / incremental_seconds:>9.1f}x")
+
+if __name__ == "__main__":
+    logging.disable(logging.INFO)
+    service = NLPService()
+    if not check_parity(service):
+        raise SystemExit(1)
+    print(f"{'transcript':>24}{'full ms':>12}{'incremental ms':>16}{'speedup':>10}")
+    for size_kb in SIZES_KB:
+        measure(service, size_kb)
@@ -15,6 +15,91 @@ class Config:
     HEALTHCARE_DATASET_ID = os.environ.get('HEALTHCARE_DATASET_ID')
     HEALTHCARE_FHIR_STORE_ID = os.environ.get('HEALTHCARE_FHIR_STORE_ID')
     
+    # Transcription Configuration
+    ASR_BACKEND = os.environ.get('ASR_BACKEND', 'google')  # 'google' or 'local'
+    LOCAL_ASR_TRANSCRIPT = os.environ.get('LOCAL_ASR_TRANSCRIPT')
+    LOCAL_ASR_LATENCY_MS = int(os.environ.get('LOCAL_ASR_LATENCY_MS', 0))
+    LOCAL_ASR_JITTER_MS = int(os.environ.get('LOCAL_ASR_JITTER_MS', 0))
+    GOOGLE_CLIENT_POOL_SIZE = int(os.environ.get('GOOGLE_CLIENT_POOL_SIZE', 2))  # clients (channels) per API per worker
+    GOOGLE_CLIENT_WARMUP_TIMEOUT = float(os.environ.get('GOOGLE_CLIENT_WARMUP_TIMEOUT', 10))
+    
+    # Upstream API resilience: per-API circuit breakers, a shared retry budget
+    # and a per-request deadline (header value in seconds overrides the default)
+    CIRCUIT_FAILURE_THRESHOLD = int(os.environ.get('CIRCUIT_FAILURE_THRESHOLD', 5))
+    CIRCUIT_RESET_SECONDS = float(os.environ.get('CIRCUIT_RESET_SECONDS', 30))
+    RETRY_MAX_ATTEMPTS = int(os.environ.get('RETRY_MAX_ATTEMPTS', 3))
+    RETRY_BACKOFF_BASE_MS = int(os.environ.get('RETRY_BACKOFF_BASE_MS', 200))
+    RETRY_BACKOFF_CAP_MS = int(os.environ.get('RETRY_BACKOFF_CAP_MS', 5000))
+    RETRY_BUDGET_RATIO = float(os.environ.get('RETRY_BUDGET_RATIO', 0.1))
+    RETRY_BUDGET_MIN_PER_SECOND = float(os.environ.get('RETRY_BUDGET_MIN_PER_SECOND', 0.5))
+    REQUEST_DEADLINE_HEADER = os.environ.get('REQUEST_DEADLINE_HEADER', 'X-Request-Timeout')
+    REQUEST_DEADLINE_SECONDS = float(os.environ.get('REQUEST_DEADLINE_SECONDS', 120))
+    NLP_TIMEOUT = float(os.environ.get('NLP_TIMEOUT', 30))
+    
+    # Medication names, brand aliases and prefixes; re-read when the file changes
+    MEDICATION_LEXICON_PATH = os.environ.get('MEDICATION_LEXICON_PATH') or os.path.join(
+        os.path.dirname(__file__), 'medications.json'
+    )
+    MEDICATION_LEXICON_CHECK_SECONDS = float(os.environ.get('MEDICATION_LEXICON_CHECK_SECONDS', 5))
+    
+    # Remote entity extraction for /api/generate-report runs alongside local
+    # structuring; reports only wait for it when entities are requested
+    REPORT_EXTRACT_ENTITIES = os.environ.get('REPORT_EXTRACT_ENTITIES', 'true').lower() == 'true'
+    REPORT_ENTITY_WORKERS = int(os.environ.get('REPORT_ENTITY_WORKERS', 4))
+    REPORT_ENTITY_MAX_PENDING = int(os.environ.get('REPORT_ENTITY_MAX_PENDING', 16))
+    
+    # Generated reports are memoized per normalized transcript; 0 entries disables it
+    REPORT_CACHE_MAX_ENTRIES = int(os.environ.get('REPORT_CACHE_MAX_ENTRIES', 256))
+    REPORT_CACHE_MAX_BYTES = int(os.environ.get('REPORT_CACHE_MAX_BYTES', 32 * 1024 * 1024))
+    REPORT_CACHE_TTL = int(os.environ.get('REPORT_CACHE_TTL', 900))
+    
+    # /api/generate-report/batch structures transcripts on a pool of worker processes
+    REPORT_BATCH_WORKERS = int(os.environ.get('REPORT_BATCH_WORKERS') or os.cpu_count() or 2)
+    REPORT_BATCH_MAX_ITEMS = int(os.environ.get('REPORT_BATCH_MAX_ITEMS', 100))
+    
+    # Records scoring below the threshold have their empty fields re-extracted
+    # by 'gemini' or 'nl' (Google NL entities); 'none' keeps the local result
+    EXTRACTION_ESCALATION_BACKEND = os.environ.get(
+        'EXTRACTION_ESCALATION_BACKEND', 'gemini' if os.environ.get('GEMINI_API_KEY') else 'none'
+    )
+    EXTRACTION_ESCALATION_THRESHOLD = float(os.environ.get('EXTRACTION_ESCALATION_THRESHOLD', 0.5))
+    EXTRACTION_ESCALATION_TIMEOUT = float(os.environ.get('EXTRACTION_ESCALATION_TIMEOUT', 20))
+    GEMINI_MODEL = os.environ.get('GEMINI_MODEL', 'gemini-1.5-flash')  # needs system instruction support
+    GEMINI_CACHE_MAX_ENTRIES = int(os.environ.get('GEMINI_CACHE_MAX_ENTRIES', 512))
+    GEMINI_CACHE_TTL = int(os.environ.get('GEMINI_CACHE_TTL', 3600))
+    GEMINI_MAX_IN_FLIGHT = int(os.environ.get('GEMINI_MAX_IN_FLIGHT', 4))
+    GEMINI_SLOT_TIMEOUT = float(os.environ.get('GEMINI_SLOT_TIMEOUT', 10))  # longest wait for a free in-flight slot
+    GEMINI_STREAM_TIMEOUT = float(os.environ.get('GEMINI_STREAM_TIMEOUT', 60))  # whole streamed response, capped by the request deadline
+    TRANSCRIPTION_MAX_WORKERS = int(os.environ.get('TRANSCRIPTION_MAX_WORKERS', 4))
+    TRANSCRIPTION_HEDGE_ENABLED = os.environ.get('TRANSCRIPTION_HEDGE_ENABLED', 'false').lower() == 'true'
+    TRANSCRIPTION_HEDGE_DELAY_MS = int(os.environ.get('TRANSCRIPTION_HEDGE_DELAY_MS', 1500))
+    TRANSCRIPTION_RECOGNIZE_TIMEOUT = float(os.environ.get('TRANSCRIPTION_RECOGNIZE_TIMEOUT', 60))
+    TRANSCRIPTION_CACHE_MAX_ENTRIES = int(os.environ.get('TRANSCRIPTION_CACHE_MAX_ENTRIES', 256))
+    TRANSCRIPTION_CACHE_DIR = os.environ.get('TRANSCRIPTION_CACHE_DIR')  # disk tier disabled when unset
+    TRANSCRIPTION_CACHE_DISK_MAX_BYTES = int(os.environ.get('TRANSCRIPTION_CACHE_DISK_MAX_BYTES', 100 * 1024 * 1024))
+    TRANSCRIPTION_CACHE_DISK_MAX_AGE = int(os.environ.get('TRANSCRIPTION_CACHE_DISK_MAX_AGE', 7 * 24 * 3600))
+    STREAMING_LIMIT_SECONDS = int(os.environ.get('STREAMING_LIMIT_SECONDS', 290))  # API caps streams at ~305s
+    STREAMING_QUEUE_MAX_BYTES = int(os.environ.get('STREAMING_QUEUE_MAX_BYTES', 4 * 1024 * 1024))
+    STREAMING_MAX_SESSIONS = int(os.environ.get('STREAMING_MAX_SESSIONS', 32))
+    STREAMING_SESSION_MAX_BYTES = int(os.environ.get('STREAMING_SESSION_MAX_BYTES', 2 * 1024 * 1024))
+    STREAMING_FEED_TIMEOUT = float(os.environ.get('STREAMING_FEED_TIMEOUT', 0.5))
+    UPLOAD_SPOOL_MAX_BYTES = int(os.environ.get('UPLOAD_SPOOL_MAX_BYTES', 1024 * 1024))
+    LONG_RUNNING_POLL_SECONDS = float(os.environ.get('LONG_RUNNING_POLL_SECONDS', 5))
+    LONG_RUNNING_TIMEOUT = int(os.environ.get('LONG_RUNNING_TIMEOUT', 3600))
+    SEGMENT_TARGET_SECONDS = float(os.environ.get('SEGMENT_TARGET_SECONDS', 30))
+    SEGMENT_SEARCH_SECONDS = float(os.environ.get('SEGMENT_SEARCH_SECONDS', 5))
+    SEGMENT_OVERLAP_SECONDS = float(os.environ.get('SEGMENT_OVERLAP_SECONDS', 0.5))
+    VAD_ENABLED = os.environ.get('VAD_ENABLED', 'true').lower() == 'true'
+    VAD_MIN_SILENCE_MS = int(os.environ.get('VAD_MIN_SILENCE_MS', 700))  # shorter pauses are kept as-is
+    VAD_KEEP_SILENCE_MS = int(os.environ.get('VAD_KEEP_SILENCE_MS', 200))
+    VAD_THRESHOLD_DB = float(os.environ.get('VAD_THRESHOLD_DB', 12))
+    TRANSCRIPTION_FLAC_ENABLED = os.environ.get('TRANSCRIPTION_FLAC_ENABLED', 'true').lower() == 'true'  # needs soundfile
+    
+    # Blob store for long-running recognition: 'gcs' in production, 'local' for tests
+    BLOB_STORE = os.environ.get('BLOB_STORE', 'gcs')
+    GCS_BUCKET_NAME = os.environ.get('GCS_BUCKET_NAME')
+    LOCAL_BLOB_DIR = os.environ.get('LOCAL_BLOB_DIR', 'blobs')
+    
     # Server Configuration
     HOST = os.environ.get('HOST', '0.0.0.0')
     PORT = int(os.environ.get('PORT', 5000))
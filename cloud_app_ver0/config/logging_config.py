@@ -57,6 +57,7 @@ def setup_logging(app):
     gcp_loggers = [
         'google.cloud.speech',
         'google.cloud.language',
+        'google.cloud.storage',
         'google.auth',
         'google.api_core'
     ]
@@ -69,8 +70,22 @@ def setup_logging(app):
     # Configure service loggers
     service_loggers = [
         'services.transcription_service',
+        'services.audio_segmenter',
+        'services.transcription_cache',
+        'services.streaming_sessions',
+        'services.transcription_jobs',
+        'services.blob_store',
+        'services.asr_backends',
+        'services.client_registry',
+        'services.resilience',
+        'services.medication_lexicon',
         'services.nlp_service', 
-        'services.report_generator'
+        'services.gemini_nlp_service',
+        'services.report_generator',
+        'services.report_pipeline',
+        'services.batch_reports',
+        'services.incremental_extractor',
+        'services.tiered_extractor'
     ]
     
     for logger_name in service_loggers:
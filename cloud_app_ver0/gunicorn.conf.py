@@ -0,0 +1,24 @@
+"""
+Gunicorn settings for production: gunicorn -c gunicorn.conf.py app:app
+
+The app is imported once in the master and forked into workers. Google API
+clients are never created in the master; each worker builds and warms its
+own after fork so the first request does not pay for the token fetch and
+TLS handshake.
+"""
+
+import os
+
+bind = f"{os.environ.get('HOST', '0.0.0.0')}:{os.environ.get('PORT', 5000)}"
+workers = int(os.environ.get('GUNICORN_WORKERS', 4))
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+worker_class = 'gthread'
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+preload_app = True
+
+
+def post_fork(server, worker):
+    from services.client_registry import clients
+
+    clients.warm_up_in_background()
+    server.log.info(f"Worker {worker.pid} warming Google clients: {sorted(clients.required)}")
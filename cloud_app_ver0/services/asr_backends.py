@@ -0,0 +1,203 @@
+import hashlib
+import time
+import logging
+from config.config import Config
+from services.client_registry import clients
+
+class ASRBackend:
+    """Speech recognition operations TranscriptionService relies on.
+
+    Configs are plain parameter dicts (see RECOGNITION_CONFIGS) so callers
+    never touch client library types. recognize returns the transcript,
+    streaming_recognize yields one result dict per interim/final result of a
+    single stream, and long_running_recognize returns an operation with
+    done(), progress_percent() and result().
+    """
+
+    name = 'base'
+
+    def recognize(self, params, content, timeout=None):
+        raise NotImplementedError
+
+    def streaming_recognize(self, params, audio_chunks):
+        raise NotImplementedError
+
+    def long_running_recognize(self, params, uri, timeout=None):
+        raise NotImplementedError
+
+
+class GoogleSpeechBackend(ASRBackend):
+    """Google Cloud Speech-to-Text v1"""
+
+    name = 'google'
+
+    def __init__(self):
+        from google.cloud import speech
+
+        self.speech = speech
+        clients.require('speech')
+
+    @property
+    def client(self):
+        return clients.get('speech')
+
+    def _config(self, params):
+        params = dict(params)
+        if 'encoding' in params:
+            params['encoding'] = self.speech.RecognitionConfig.AudioEncoding[params['encoding']]
+        return self.speech.RecognitionConfig(**params)
+
+    def recognize(self, params, content, timeout=None):
+        response = self.client.recognize(
+            config=self._config(params),
+            audio=self.speech.RecognitionAudio(content=bytes(content)),
+            timeout=timeout,
+            retry=None,  # retries are governed by the upstream's retry budget
+        )
+        return " ".join(
+            result.alternatives[0].transcript.strip()
+            for result in response.results if result.alternatives
+        ).strip()
+
+    def streaming_recognize(self, params, audio_chunks):
+        streaming_config = self.speech.StreamingRecognitionConfig(
+            config=self._config(params),
+            interim_results=True,
+        )
+        requests = (self.speech.StreamingRecognizeRequest(audio_content=chunk) for chunk in audio_chunks)
+
+        for response in self.client.streaming_recognize(streaming_config, requests):
+            for result in response.results:
+                if not result.alternatives:
+                    continue
+                yield {
+                    'transcript': result.alternatives[0].transcript,
+                    'is_final': result.is_final,
+                    'stability': result.stability,
+                    'result_end_time': result.result_end_time.total_seconds(),
+                }
+
+    def long_running_recognize(self, params, uri, timeout=None):
+        operation = self.client.long_running_recognize(
+            config=self._config(params),
+            audio=self.speech.RecognitionAudio(uri=uri),
+            timeout=timeout,  # for starting the operation, not for its result
+            retry=None,
+        )
+        return GoogleOperation(operation)
+
+
+class GoogleOperation:
+    def __init__(self, operation):
+        self.operation = operation
+
+    def done(self):
+        return self.operation.done()
+
+    def progress_percent(self):
+        metadata = self.operation.metadata
+        return metadata.progress_percent if metadata is not None else 0
+
+    def result(self):
+        response = self.operation.result()
+        return " ".join(
+            result.alternatives[0].transcript.strip()
+            for result in response.results if result.alternatives
+        ).strip()
+
+
+class LocalASRBackend(ASRBackend):
+    """Offline backend returning a canned transcript after a simulated delay.
+
+    Latency is latency_ms plus up to jitter_ms derived from the audio hash,
+    so the same recording always takes the same time. Used for load testing
+    the request pipeline without credentials or network access.
+    """
+
+    name = 'local'
+
+    DEFAULT_TRANSCRIPT = (
+        "Patient is a 7-year-old female with B-ALL high risk induction. "
+        "Temperature 100.3 Fahrenheit. Hemoglobin 9, white blood cell count 1000, "
+        "platelet count 147000. Started on Cefoperazone sulbactam and Oseltamivir. "
+        "Attending physician Dr. Prasanth V.R."
+    )
+
+    def __init__(self, transcript=None, latency_ms=None, jitter_ms=None):
+        self.transcript = transcript or Config.LOCAL_ASR_TRANSCRIPT or self.DEFAULT_TRANSCRIPT
+        self.latency_ms = Config.LOCAL_ASR_LATENCY_MS if latency_ms is None else latency_ms
+        self.jitter_ms = Config.LOCAL_ASR_JITTER_MS if jitter_ms is None else jitter_ms
+        self.logger = logging.getLogger('services.asr_backends')
+
+    def _latency(self, content):
+        if not self.jitter_ms:
+            return self.latency_ms / 1000.0
+        digest = hashlib.sha256(bytes(content[:4096])).digest()
+        jitter = int.from_bytes(digest[:4], 'big') % (self.jitter_ms + 1)
+        return (self.latency_ms + jitter) / 1000.0
+
+    def recognize(self, params, content, timeout=None):
+        delay = self._latency(content)
+        if timeout is not None and delay > timeout:
+            time.sleep(timeout)
+            raise TimeoutError(f"Local recognize exceeded timeout of {timeout}s")
+        time.sleep(delay)
+        return self.transcript
+
+    def streaming_recognize(self, params, audio_chunks):
+        words = self.transcript.split()
+        emitted = 0
+        chunks = 0
+        for chunk in audio_chunks:
+            chunks += 1
+            if emitted < len(words):
+                emitted += 1
+                yield {
+                    'transcript': " ".join(words[:emitted]),
+                    'is_final': False,
+                    'stability': 0.5,
+                    'result_end_time': float(chunks),
+                }
+        yield {
+            'transcript': self.transcript,
+            'is_final': True,
+            'stability': 0.0,
+            'result_end_time': float(chunks),
+        }
+
+    def long_running_recognize(self, params, uri, timeout=None):
+        return LocalOperation(self.transcript, self.latency_ms / 1000.0)
+
+
+class LocalOperation:
+    def __init__(self, transcript, duration):
+        self.transcript = transcript
+        self.duration = duration
+        self.started = time.monotonic()
+
+    def done(self):
+        return time.monotonic() - self.started >= self.duration
+
+    def progress_percent(self):
+        if self.duration <= 0:
+            return 100
+        return min(100, int(100 * (time.monotonic() - self.started) / self.duration))
+
+    def result(self):
+        remaining = self.duration - (time.monotonic() - self.started)
+        if remaining > 0:
+            time.sleep(remaining)
+        return self.transcript
+
+
+ASR_BACKENDS = {
+    'google': GoogleSpeechBackend,
+    'local': LocalASRBackend,
+}
+
+
+def create_asr_backend(kind=None):
+    kind = kind or Config.ASR_BACKEND
+    if kind not in ASR_BACKENDS:
+        raise Exception(f"Unknown ASR backend '{kind}', expected one of {sorted(ASR_BACKENDS)}")
+    return ASR_BACKENDS[kind]()
@@ -0,0 +1,221 @@
+import io
+import re
+import shutil
+import struct
+import subprocess
+import wave
+import logging
+import numpy as np
+from config.config import Config
+from services.flac_stream import FlacStreamWriter
+
+try:
+    import soundfile
+except (ImportError, OSError):  # OSError when libsndfile itself is missing
+    soundfile = None
+
+class AudioSegmenter:
+    """Split recordings into standalone segments at quiet points.
+
+    The container is decoded to 16-bit mono PCM once, cut near the target
+    duration at the lowest-energy frame, padded with a small overlap and
+    re-encoded so every segment is a valid stream on its own. Segments are
+    FLAC when flac is enabled and soundfile is installed, WAV otherwise.
+    """
+
+    FRAME_SECONDS = 0.02  # 20ms energy frames
+
+    def __init__(self, target_seconds=None, search_seconds=None, overlap_seconds=None,
+                 sample_rate=16000, flac=None):
+        self.target_seconds = target_seconds or Config.SEGMENT_TARGET_SECONDS
+        self.search_seconds = search_seconds or Config.SEGMENT_SEARCH_SECONDS
+        self.overlap_seconds = (overlap_seconds if overlap_seconds is not None
+                                else Config.SEGMENT_OVERLAP_SECONDS)
+        self.sample_rate = sample_rate
+        self.flac = (Config.TRANSCRIPTION_FLAC_ENABLED if flac is None else flac) and soundfile is not None
+        self.logger = logging.getLogger('services.audio_segmenter')
+
+    def segment(self, content, decoded=None):
+        """Return a list of FLAC or WAV byte strings (see encode), or None if
+        the audio cannot be decoded. Pass decoded (samples, sample_rate) when
+        the caller has already decoded content."""
+        if decoded is None:
+            decoded = self.decode(content)
+        if decoded is None:
+            return None
+
+        samples, sample_rate = decoded
+        cuts = self.find_cut_points(samples, sample_rate)
+        overlap = int(self.overlap_seconds * sample_rate)
+
+        segments = []
+        for start, end in zip(cuts[:-1], cuts[1:]):
+            start = max(0, start - overlap)
+            end = min(len(samples), end + overlap)
+            segments.append(self.encode(samples[start:end], sample_rate))
+
+        self.logger.info(
+            f"Segmented {len(samples) / sample_rate:.1f}s of audio into {len(segments)} segments"
+        )
+        return segments
+
+    def encode(self, samples, sample_rate):
+        """Encode int16 mono samples as FLAC or WAV according to self.flac"""
+        if self.flac:
+            return encode_flac(samples, sample_rate)
+        return encode_wav(samples, sample_rate)
+
+    def decode(self, content):
+        """Decode audio to (int16 mono samples, sample_rate)"""
+        if content[:4] == b'RIFF' and content[8:12] == b'WAVE':
+            try:
+                return decode_wav(content)
+            except Exception as e:
+                self.logger.warning(f"WAV decode failed, trying ffmpeg: {str(e)}")
+
+        if content[:4] == b'fLaC' and soundfile is not None:
+            try:
+                samples, sample_rate = soundfile.read(io.BytesIO(content), dtype='int16', always_2d=True)
+                if samples.shape[1] > 1:
+                    return samples.mean(axis=1).astype(np.int16), sample_rate
+                return samples[:, 0], sample_rate
+            except Exception as e:
+                self.logger.warning(f"FLAC decode failed, trying ffmpeg: {str(e)}")
+
+        if shutil.which('ffmpeg') is None:
+            self.logger.warning("ffmpeg not available, cannot decode compressed audio")
+            return None
+
+        try:
+            result = subprocess.run(
+                ['ffmpeg', '-hide_banner', '-loglevel', 'error', '-i', 'pipe:0',
+                 '-f', 's16le', '-ac', '1', '-ar', str(self.sample_rate), 'pipe:1'],
+                input=content, capture_output=True, check=True, timeout=120
+            )
+        except Exception as e:
+            self.logger.warning(f"ffmpeg decode failed: {str(e)}")
+            return None
+
+        samples = np.frombuffer(result.stdout, dtype='<i2')
+        if samples.size == 0:
+            return None
+        return samples, self.sample_rate
+
+    def find_cut_points(self, samples, sample_rate):
+        """Sample offsets of segment boundaries, including 0 and len(samples)"""
+        frame = max(1, int(self.FRAME_SECONDS * sample_rate))
+        n_frames = len(samples) // frame
+        if n_frames == 0:
+            return [0, len(samples)]
+
+        framed = samples[:n_frames * frame].astype(np.float32).reshape(n_frames, frame)
+        energy = np.sqrt(np.mean(framed * framed, axis=1))
+
+        target = int(self.target_seconds / self.FRAME_SECONDS)
+        search = int(self.search_seconds / self.FRAME_SECONDS)
+
+        cuts = [0]
+        position = 0
+        while n_frames - position > target + search:
+            low = max(position + 1, position + target - search)
+            high = position + target + search
+            quietest = low + int(np.argmin(energy[low:high]))
+            cuts.append(quietest * frame)
+            position = quietest
+        cuts.append(len(samples))
+        return cuts
+
+
+def decode_wav(content):
+    """Decode a PCM WAV buffer to (int16 mono samples, sample_rate).
+
+    Mono samples are a view into content rather than a copy.
+    """
+    view = memoryview(content).cast('B')
+    if bytes(view[:4]) != b'RIFF' or bytes(view[8:12]) != b'WAVE':
+        raise Exception("Not a RIFF/WAVE file")
+
+    channels = sample_rate = sample_width = None
+    position = 12
+    while position + 8 <= len(view):
+        chunk_id = bytes(view[position:position + 4])
+        chunk_size = struct.unpack_from('<I', view, position + 4)[0]
+        body = position + 8
+
+        if chunk_id == b'fmt ':
+            audio_format, channels, sample_rate = struct.unpack_from('<HHI', view, body)
+            sample_width = struct.unpack_from('<H', view, body + 14)[0] // 8
+            if audio_format not in (1, 0xFFFE):
+                raise Exception(f"Unsupported WAV encoding: {audio_format}")
+        elif chunk_id == b'data':
+            if channels is None:
+                raise Exception("WAV data chunk before fmt chunk")
+            if sample_width != 2:
+                raise Exception(f"Unsupported WAV sample width: {sample_width * 8} bits")
+
+            # Streaming writers leave the size unset; take the rest of the file
+            end = min(body + chunk_size, len(view))
+            end -= (end - body) % (2 * channels)
+            samples = np.frombuffer(view[body:end], dtype='<i2')
+            if channels > 1:
+                samples = samples.reshape(-1, channels).mean(axis=1).astype(np.int16)
+            return samples, sample_rate
+
+        position = body + chunk_size + (chunk_size & 1)
+
+    raise Exception("WAV file has no data chunk")
+
+
+def encode_wav(samples, sample_rate):
+    """Encode int16 mono samples as a standalone WAV byte string"""
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(sample_rate)
+        wav_file.writeframes(samples.astype('<i2').tobytes())
+    return buffer.getvalue()
+
+
+def iter_flac(samples, sample_rate, block_samples=65536):
+    """Encode int16 mono samples as FLAC, yielding bytes as each block is compressed"""
+    if soundfile is None:
+        raise Exception("soundfile is not installed, cannot encode FLAC")
+
+    sink = FlacStreamWriter(len(samples))
+    with soundfile.SoundFile(sink, 'w', sample_rate, 1, format='FLAC', subtype='PCM_16') as flac:
+        for start in range(0, len(samples), block_samples):
+            flac.write(np.ascontiguousarray(samples[start:start + block_samples], dtype='<i2'))
+            data = sink.drain()
+            if data:
+                yield data
+    data = sink.drain()
+    if data:
+        yield data
+
+
+def encode_flac(samples, sample_rate):
+    """Encode int16 mono samples as a standalone FLAC byte string"""
+    return b''.join(iter_flac(samples, sample_rate))
+
+
+def _normalize_word(word):
+    return re.sub(r'[^\w]', '', word.lower())
+
+
+def merge_transcripts(parts, max_overlap_words=8):
+    """Join segment transcripts, dropping words repeated across segment overlaps"""
+    words = []
+    for part in parts:
+        if not part:
+            continue
+        new_words = part.split()
+        limit = min(max_overlap_words, len(words), len(new_words))
+        for k in range(limit, 0, -1):
+            tail = [_normalize_word(w) for w in words[-k:]]
+            head = [_normalize_word(w) for w in new_words[:k]]
+            if tail == head:
+                new_words = new_words[k:]
+                break
+        words.extend(new_words)
+    return " ".join(words)
@@ -0,0 +1,171 @@
+from collections import deque
+import threading
+import time
+
+class AudioChunkQueue:
+    """Bounded FIFO of audio chunks between a producer and a recognition stream.
+
+    put() blocks while the queue holds max_bytes of audio, which pushes back
+    on the producer instead of buffering the whole recording in memory.
+    """
+
+    def __init__(self, max_bytes=None):
+        self.max_bytes = max_bytes or 4 * 1024 * 1024
+        self.chunks = deque()
+        self.buffered_bytes = 0
+        self.closed = False
+        self.condition = threading.Condition()
+
+    def put(self, chunk, timeout=None):
+        """Append a chunk, waiting for space. Returns False on timeout or close."""
+        if not chunk:
+            return True
+
+        with self.condition:
+            # A single oversized chunk is still accepted into an empty queue
+            has_space = lambda: self.closed or not self.chunks or \
+                self.buffered_bytes + len(chunk) <= self.max_bytes
+            if not self.condition.wait_for(has_space, timeout=timeout) or self.closed:
+                return False
+
+            self.chunks.append(chunk)
+            self.buffered_bytes += len(chunk)
+            self.condition.notify_all()
+            return True
+
+    def close(self):
+        """Mark the end of the audio; consumers drain what is left and stop"""
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+    @property
+    def exhausted(self):
+        with self.condition:
+            return self.closed and not self.chunks
+
+    def iter_chunks(self, deadline=None):
+        """Yield chunks as they arrive until closed and drained, or until deadline"""
+        while True:
+            with self.condition:
+                while not self.chunks and not self.closed:
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        return
+                    self.condition.wait(timeout=remaining)
+
+                if not self.chunks:
+                    return
+
+                chunk = self.chunks.popleft()
+                self.buffered_bytes -= len(chunk)
+                self.condition.notify_all()
+
+            yield chunk
+
+            if deadline is not None and time.monotonic() >= deadline:
+                return
+
+    @classmethod
+    def from_iterable(cls, audio_generator, max_bytes=None):
+        """Pump an iterable into a new queue from a background thread"""
+        queue = cls(max_bytes=max_bytes)
+
+        def pump():
+            try:
+                for chunk in audio_generator:
+                    if not queue.put(chunk):
+                        break
+            finally:
+                queue.close()
+
+        threading.Thread(target=pump, name='audio-stream-pump', daemon=True).start()
+        return queue
+
+
+class AudioRingBuffer:
+    """Fixed-size byte ring for socket audio frames.
+
+    Frames are copied straight into one preallocated bytearray through a
+    memoryview, so accepting a frame costs a single copy and no allocation.
+    Exposes the same put/close/iter_chunks interface as AudioChunkQueue.
+    """
+
+    def __init__(self, capacity=None, read_size=32 * 1024):
+        self.capacity = capacity or 2 * 1024 * 1024
+        self.read_size = read_size
+        self.buffer = bytearray(self.capacity)
+        self.view = memoryview(self.buffer)
+        self.read_pos = 0
+        self.size = 0
+        self.closed = False
+        self.condition = threading.Condition()
+
+    def put(self, frame, timeout=None):
+        """Copy a frame into the ring, waiting for space. Returns False on timeout or close."""
+        frame = memoryview(frame).cast('B')
+        length = len(frame)
+        if length == 0:
+            return True
+        if length > self.capacity:
+            return False
+
+        with self.condition:
+            has_space = lambda: self.closed or self.size + length <= self.capacity
+            if not self.condition.wait_for(has_space, timeout=timeout) or self.closed:
+                return False
+
+            write_pos = (self.read_pos + self.size) % self.capacity
+            first = min(length, self.capacity - write_pos)
+            self.view[write_pos:write_pos + first] = frame[:first]
+            if first < length:
+                self.view[:length - first] = frame[first:]
+            self.size += length
+            self.condition.notify_all()
+            return True
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+    @property
+    def exhausted(self):
+        with self.condition:
+            return self.closed and self.size == 0
+
+    @property
+    def buffered_bytes(self):
+        return self.size
+
+    def _read(self):
+        length = min(self.size, self.read_size)
+        end = self.read_pos + length
+        if end <= self.capacity:
+            chunk = bytes(self.view[self.read_pos:end])
+        else:
+            chunk = bytes(self.view[self.read_pos:]) + bytes(self.view[:end - self.capacity])
+        self.read_pos = end % self.capacity
+        self.size -= length
+        return chunk
+
+    def iter_chunks(self, deadline=None):
+        """Yield up to read_size bytes at a time until closed and drained, or until deadline"""
+        while True:
+            with self.condition:
+                while self.size == 0 and not self.closed:
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        return
+                    self.condition.wait(timeout=remaining)
+
+                if self.size == 0:
+                    return
+
+                chunk = self._read()
+                self.condition.notify_all()
+
+            yield chunk
+
+            if deadline is not None and time.monotonic() >= deadline:
+                return
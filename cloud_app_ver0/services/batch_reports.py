@@ -0,0 +1,128 @@
+import multiprocessing
+import threading
+import time
+import logging
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from config.config import Config
+from utils.metrics import metrics
+
+batch_items = metrics.counter('report_batch_items_total', 'Batch report items by outcome', ['outcome'])
+
+# Set in each worker process by _init_worker
+_worker_nlp = None
+_worker_reports = None
+
+
+def _init_worker():
+    global _worker_nlp, _worker_reports
+    from services.nlp_service import NLPService
+    from services.report_generator import ReportGenerator
+    _worker_nlp = NLPService()
+    _worker_reports = ReportGenerator()
+
+
+def _structure_and_report(transcription):
+    """Runs in a worker process: local structuring and the report for one transcript"""
+    from services.report_pipeline import LazyEntities
+    structured_data = _worker_nlp.structure_data(LazyEntities(), transcription)
+    structured_data['metadata']['extraction_tier'] = 'local'
+    report = _worker_reports.generate_report(structured_data)
+    return {'structured_data': structured_data, 'report': report}
+
+
+class BatchReportService:
+    """Generates many reports at once on a process pool.
+
+    Structuring is regex-heavy and holds the GIL, so a batch run on request
+    threads would use one core; worker processes use as many as max_workers.
+    Workers are started with 'spawn' (forking a threaded server is unsafe)
+    on first use and kept for later batches. Only the local extraction tier
+    runs here: no remote entities and no escalation.
+    """
+
+    def __init__(self, max_workers=None, max_items=None):
+        self.max_workers = max_workers or Config.REPORT_BATCH_WORKERS
+        self.max_items = max_items or Config.REPORT_BATCH_MAX_ITEMS
+        self.logger = logging.getLogger('services.batch_reports')
+        self.lock = threading.Lock()
+        self.executor = None
+
+    def _pool(self):
+        with self.lock:
+            if self.executor is None:
+                self.executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_init_worker,
+                )
+                self.logger.info(f"Started batch report pool with {self.max_workers} workers")
+            return self.executor
+
+    def _discard_pool(self, executor):
+        with self.lock:
+            if self.executor is executor:
+                self.executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def validate(self, transcriptions):
+        """Raises if the batch itself is unusable; bad items are reported per item"""
+        if not isinstance(transcriptions, list) or not transcriptions:
+            raise Exception("transcriptions must be a non-empty array")
+        if len(transcriptions) > self.max_items:
+            raise Exception(f"Batch of {len(transcriptions)} exceeds the limit of {self.max_items} transcriptions")
+
+    def run(self, transcriptions):
+        """Yield {'index', 'structured_data', 'report'} or {'index', 'error'} per
+        transcript, in completion order."""
+        self.validate(transcriptions)
+        started = time.perf_counter()
+        executor = self._pool()
+        futures = {}
+
+        for index, transcription in enumerate(transcriptions):
+            if not isinstance(transcription, str) or not transcription.strip():
+                batch_items.inc(outcome='invalid')
+                yield {'index': index, 'error': "No transcription provided"}
+                continue
+            try:
+                futures[executor.submit(_structure_and_report, transcription)] = index
+            except BrokenProcessPool as e:
+                self._discard_pool(executor)
+                batch_items.inc(outcome='failed')
+                yield {'index': index, 'error': f"Report generation failed: {str(e)}"}
+
+        failed = 0
+        try:
+            for future in as_completed(futures):
+                index = futures[future]
+                try:
+                    result = future.result()
+                except BrokenProcessPool as e:
+                    # A worker died; the pool is unusable for the rest of this and later batches
+                    self._discard_pool(executor)
+                    failed += 1
+                    batch_items.inc(outcome='failed')
+                    yield {'index': index, 'error': f"Report generation failed: {str(e)}"}
+                    continue
+                except Exception as e:
+                    failed += 1
+                    batch_items.inc(outcome='failed')
+                    self.logger.warning(f"Batch item {index} failed: {str(e)}")
+                    yield {'index': index, 'error': f"Report generation failed: {str(e)}"}
+                    continue
+
+                batch_items.inc(outcome='completed')
+                yield {'index': index, **result}
+        finally:
+            # The client went away: don't keep the workers busy for nobody
+            for future in futures:
+                future.cancel()
+
+        self.logger.info(
+            f"Batch of {len(transcriptions)} reports done in {(time.perf_counter() - started) * 1000:.0f}ms, "
+            f"{failed} failed"
+        )
+
+    def get_stats(self):
+        return {'max_workers': self.max_workers, 'max_items': self.max_items, 'started': self.executor is not None}
@@ -0,0 +1,81 @@
+import os
+import logging
+from config.config import Config
+
+class BlobStore:
+    """Where audio too large for inline recognition is staged.
+
+    Long-running recognition reads audio by URI, so uploads go through a
+    store that hands back a URI the recognizer can fetch.
+    """
+
+    def upload(self, name, content):
+        raise NotImplementedError
+
+    def delete(self, uri):
+        raise NotImplementedError
+
+
+class GCSBlobStore(BlobStore):
+    """Google Cloud Storage bucket, used in production"""
+
+    def __init__(self, bucket_name=None):
+        from google.cloud import storage
+
+        self.bucket_name = bucket_name or Config.GCS_BUCKET_NAME
+        if not self.bucket_name:
+            raise Exception("GCS_BUCKET_NAME must be set to use the GCS blob store")
+        self.client = storage.Client()
+        self.bucket = self.client.bucket(self.bucket_name)
+        self.logger = logging.getLogger('services.blob_store')
+
+    def upload(self, name, content):
+        blob = self.bucket.blob(name)
+        blob.upload_from_string(bytes(content), content_type='application/octet-stream')
+        uri = f"gs://{self.bucket_name}/{name}"
+        self.logger.info(f"Uploaded {len(content)} bytes to {uri}")
+        return uri
+
+    def delete(self, uri):
+        prefix = f"gs://{self.bucket_name}/"
+        if not uri.startswith(prefix):
+            raise Exception(f"URI {uri} is not in bucket {self.bucket_name}")
+        self.bucket.blob(uri[len(prefix):]).delete()
+
+
+class LocalBlobStore(BlobStore):
+    """Filesystem stand-in for tests and offline development"""
+
+    def __init__(self, root=None):
+        self.root = os.path.abspath(root or Config.LOCAL_BLOB_DIR)
+        os.makedirs(self.root, exist_ok=True)
+        self.logger = logging.getLogger('services.blob_store')
+
+    def upload(self, name, content):
+        path = os.path.join(self.root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(content)
+        uri = f"file://{path}"
+        self.logger.info(f"Stored {len(content)} bytes at {uri}")
+        return uri
+
+    def delete(self, uri):
+        path = uri[len('file://'):]
+        if not os.path.abspath(path).startswith(self.root + os.sep):
+            raise Exception(f"URI {uri} is outside {self.root}")
+        if os.path.exists(path):
+            os.unlink(path)
+
+
+BLOB_STORES = {
+    'gcs': GCSBlobStore,
+    'local': LocalBlobStore,
+}
+
+
+def create_blob_store(kind=None):
+    kind = kind or Config.BLOB_STORE
+    if kind not in BLOB_STORES:
+        raise Exception(f"Unknown blob store '{kind}', expected one of {sorted(BLOB_STORES)}")
+    return BLOB_STORES[kind]()
@@ -0,0 +1,130 @@
+import itertools
+import os
+import threading
+import time
+import logging
+from config.config import Config
+
+def _speech_client():
+    from google.cloud import speech
+    return speech.SpeechClient()
+
+
+def _language_client():
+    from google.cloud import language_v1
+    return language_v1.LanguageServiceClient()
+
+
+def warm_grpc_client(client, timeout):
+    """Fetch an access token and open the gRPC channel without calling the API.
+
+    Both are what makes the first real call slow, and neither is billed.
+    """
+    import grpc
+    import google.auth.transport.requests
+
+    transport = client.transport
+    credentials = getattr(transport, '_credentials', None)
+    if credentials is not None and not credentials.valid:
+        credentials.refresh(google.auth.transport.requests.Request())
+    grpc.channel_ready_future(transport.grpc_channel).result(timeout=timeout)
+
+
+class ClientRegistry:
+    """Per-process pools of Google API clients, created on first use.
+
+    gRPC channels must not cross a fork, so nothing is created at import
+    time: services declare the kinds they need with require() and fetch a
+    client with get() when they make a call. A registry inherited through
+    fork (gunicorn --preload) drops the parent's clients and starts empty.
+    Each kind has pool_size clients, each with its own channel, handed out
+    round-robin so concurrent calls spread across connections.
+    """
+
+    def __init__(self, pool_size=None):
+        self.pool_size = pool_size or Config.GOOGLE_CLIENT_POOL_SIZE
+        self.factories = {}
+        self.required = set()
+        self.logger = logging.getLogger('services.client_registry')
+        self._reset()
+
+    def _reset(self):
+        self.pid = os.getpid()
+        self.lock = threading.Lock()
+        self.pools = {}
+        self.counters = {}
+        self.warmed = {}
+
+    def register(self, kind, factory):
+        self.factories[kind] = factory
+
+    def require(self, *kinds):
+        """Mark kinds to be created and warmed by warm_up()"""
+        for kind in kinds:
+            if kind not in self.factories:
+                raise Exception(f"Unknown client kind '{kind}', expected one of {sorted(self.factories)}")
+            self.required.add(kind)
+
+    def get(self, kind):
+        if self.pid != os.getpid():
+            self._reset()
+
+        pool = self.pools.get(kind)
+        if pool is None:
+            with self.lock:
+                pool = self.pools.get(kind)
+                if pool is None:
+                    pool = self._create(kind)
+        return pool[next(self.counters[kind]) % len(pool)]
+
+    def _create(self, kind):
+        if kind not in self.factories:
+            raise Exception(f"Unknown client kind '{kind}', expected one of {sorted(self.factories)}")
+
+        started = time.perf_counter()
+        pool = [self.factories[kind]() for _ in range(self.pool_size)]
+        self.counters[kind] = itertools.count()
+        self.pools[kind] = pool
+        self.logger.info(
+            f"Created {len(pool)} {kind} client(s) in pid {self.pid} "
+            f"in {(time.perf_counter() - started) * 1000:.0f}ms"
+        )
+        return pool
+
+    def warm_up(self, kinds=None, timeout=None):
+        """Create the clients for kinds (default: required ones) and open their channels"""
+        timeout = timeout or Config.GOOGLE_CLIENT_WARMUP_TIMEOUT
+        for kind in sorted(kinds or self.required):
+            started = time.perf_counter()
+            try:
+                self.get(kind)
+                for client in self.pools[kind]:
+                    warm_grpc_client(client, timeout)
+                self.warmed[kind] = round((time.perf_counter() - started) * 1000, 1)
+                self.logger.info(f"Warmed {kind} clients in {self.warmed[kind]:.0f}ms")
+            except Exception as e:
+                # The first request will pay the cost instead
+                self.logger.warning(f"Warm-up of {kind} clients failed: {str(e)}")
+
+    def warm_up_in_background(self, kinds=None):
+        thread = threading.Thread(target=self.warm_up, args=(kinds,), name='client-warmup', daemon=True)
+        thread.start()
+        return thread
+
+    def get_stats(self):
+        return {
+            'pid': self.pid,
+            'pool_size': self.pool_size,
+            'required': sorted(self.required),
+            'created': sorted(self.pools),
+            'warm_up_ms': dict(self.warmed),
+        }
+
+
+clients = ClientRegistry()
+clients.register('speech', _speech_client)
+clients.register('language', _language_client)
+
+if hasattr(os, 'register_at_fork'):
+    # Also covers a fork that happens while another thread holds the lock
+    os.register_at_fork(after_in_child=clients._reset)
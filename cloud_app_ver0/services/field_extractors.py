@@ -0,0 +1,190 @@
+from datetime import datetime
+import hashlib
+import re
+
+class Field:
+    """A structured-data field: its regex patterns and the handler that folds
+    their matches into the record.
+
+    Patterns are written in lower case and always match case-insensitively.
+    mode 'first' keeps the leftmost match of each pattern (re.search);
+    mode 'all' yields every non-overlapping match (re.finditer).
+    """
+
+    def __init__(self, name, patterns, handler, mode='first'):
+        self.name = name
+        self.patterns = patterns
+        self.handler = handler
+        self.mode = mode
+
+
+class ExtractionEngine:
+    """Compiled registry of extraction fields, applied to a transcript in one go.
+
+    Every pattern is compiled once, in two forms: a case-sensitive one run
+    against a lower-cased copy of an ASCII transcript, which is several
+    times faster than re.IGNORECASE, and an IGNORECASE one used for non-ASCII
+    text (where lower() may change offsets) and to re-read each hit from the
+    original text so captures keep their case.
+    """
+
+    def __init__(self, fields):
+        self.fields = fields
+        self.compiled = {
+            field.name: [(re.compile(pattern), re.compile(pattern, re.IGNORECASE)) for pattern in field.patterns]
+            for field in fields
+        }
+        # Changes whenever a field or pattern does, for caches of extraction results
+        self.version = hashlib.sha256(
+            repr([(field.name, field.mode, field.patterns) for field in fields]).encode('utf-8')
+        ).hexdigest()[:12]
+
+    def _matches(self, field, text, lowered):
+        results = []
+        for fast, exact in self.compiled[field.name]:
+            if lowered is None:
+                if field.mode == 'first':
+                    match = exact.search(text)
+                    results.append([match] if match else [])
+                else:
+                    results.append(exact.finditer(text))
+            elif field.mode == 'first':
+                match = fast.search(lowered)
+                results.append([exact.match(text, match.start())] if match else [])
+            else:
+                results.append(_rematch(exact, text, fast.finditer(lowered)))
+        return results
+
+    def first_match_rank(self, name, text):
+        """Index of the first of field name's patterns that matches text, or None"""
+        for rank, (_, exact) in enumerate(self.compiled[name]):
+            if exact.search(text):
+                return rank
+        return None
+
+    def extract(self, text, record):
+        """Run every field over text and let its handler update record"""
+        lowered = text.lower() if text.isascii() else None
+        for field in self.fields:
+            field.handler(record, self._matches(field, text, lowered))
+        return record
+
+
+def _rematch(exact, text, matches):
+    for match in matches:
+        yield exact.match(text, match.start())
+
+
+def _first(matches):
+    return matches[0] if matches else None
+
+
+def _age(record, found):
+    match = _first(found[0])
+    if match:
+        record['patient_details']['age'] = match.group(1)
+
+
+def _sex(record, found):
+    match = _first(found[0])
+    if match:
+        record['patient_details']['sex'] = match.group(1).upper()
+
+
+def _diagnosis(record, found):
+    # Later patterns override earlier ones unless their text is already
+    # contained in the current diagnosis
+    for matches in found:
+        for match in matches:
+            diagnosis = match.group(1)
+            if diagnosis and diagnosis not in record['admission_details']['diagnosis']:
+                record['admission_details']['diagnosis'] = diagnosis.strip()
+                break
+
+
+def _temperature(record, found):
+    match = _first(found[0])
+    if match:
+        unit = (match.group(2) or 'F').upper()
+        record['clinical_examination']['vitals']['temp'] = f"{match.group(1)}°{unit}"
+        record['clinical_examination']['general_condition'] = f"Febrile ({match.group(1)}°{unit})"
+
+
+def _heart_rate(record, found):
+    match = _first(found[0])
+    if match:
+        record['clinical_examination']['vitals']['hr'] = f"{match.group(1)}/min"
+
+
+def _blood_pressure(record, found):
+    match = _first(found[0])
+    if match:
+        record['clinical_examination']['vitals']['bp'] = f"{match.group(1)}mmhg"
+
+
+def _respiratory(record, found):
+    findings = []
+    if found[0]:
+        findings.append('Crepitations present')
+    if found[1]:
+        findings.append('No retractions')
+    if findings:
+        record['clinical_examination']['systems']['respiratory_system'] = '. '.join(findings)
+
+
+LAB_NAMES = ['hb', 'wbc', 'platelet']
+
+
+def _labs(record, found):
+    lab_result = {}
+    for lab_name, matches in zip(LAB_NAMES, found):
+        if matches:
+            lab_result[lab_name] = matches[0].group(1)
+    if lab_result:
+        lab_result['date'] = datetime.now().strftime('%d/%m/%Y')
+        record['investigations']['lab_results'].append(lab_result)
+
+
+def _attending(record, found):
+    match = _first(found[0])
+    if match and not record['patient_details']['attending_oncologist']:
+        record['patient_details']['attending_oncologist'] = f"Dr. {match.group(1).strip()}"
+
+
+def _chief_complaints(record, found):
+    # Patterns are in priority order; the first one with a match wins
+    for matches in found:
+        if matches:
+            match = matches[0]
+            complaint = match.group(1) if match.re.groups > 0 else match.group(0)
+            record['history']['chief_complaints'] = complaint.strip()
+            break
+
+
+FIELDS = [
+    Field('age', [r'(?:age|aged?)\s*:?\s*(\d+)'], _age),
+    Field('sex', [r'(?:sex|gender)\s*:?\s*(male|female|m|f)'], _sex),
+    Field('diagnosis', [
+        r'(b[\s-]?all[^\.]*)',
+        r'(leukemia[^\.]*)',
+        r'(diagnosed with ([^\.]+))',
+        r'(condition[:\s]+([^\.]+))',
+    ], _diagnosis, mode='all'),
+    Field('temp', [r'(?:temperature|temp|fever)[:\s]*(\d+\.?\d*)\s*(f|c|fahrenheit|celsius)?'], _temperature),
+    Field('hr', [r'(?:heart rate|hr|pulse)[:\s]*(\d+)(?:/min)?'], _heart_rate),
+    Field('bp', [r'(?:blood pressure|bp)[:\s]*(\d+/\d+)'], _blood_pressure),
+    Field('respiratory', [r'crepitations?', r'no retractions?'], _respiratory),
+    Field('labs', [
+        r'(?:hb|hemoglobin)[:\s]*(\d+\.?\d*)',
+        r'(?:wbc|white blood cell count?)[:\s]*(\d+\.?\d*)',
+        r'(?:platelet count?)[:\s]*(\d+\.?\d*)',
+    ], _labs),
+    Field('attending', [r'(?:dr\.?\s+|doctor\s+)([a-z][a-z]+(?:\s+[a-z][a-z]*\.?)*)'], _attending),
+    Field('chief_complaints', [
+        r'(?:chief complaint|complaints?|cc)[:\s]+([^\.]+)',
+        r'(?:presenting with|presents with|admitted with)[:\s]+([^\.]+)',
+        r'(?:fever[^\.]*cough[^\.]*|cough[^\.]*fever[^\.]*)',
+    ], _chief_complaints),
+]
+
+EXTRACTION_ENGINE = ExtractionEngine(FIELDS)
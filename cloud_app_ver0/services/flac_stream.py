@@ -0,0 +1,66 @@
+# Vendored from shared/audio/flac_stream.py by shared/sync_shared.py; edit it there.
+"""Streaming FLAC output for libsndfile"""
+
+
+class FlacStreamWriter:
+    """File-like sink that lets libsndfile encode FLAC while bytes are handed out.
+
+    libsndfile rewrites parts of STREAMINFO when it closes the file. Those
+    bytes have already been handed out by then, so the total sample count
+    (known up front) is patched in before the header leaves. The MD5 and
+    frame size fields stay zero, which FLAC defines as "unknown".
+    """
+
+    STREAMINFO_END = 42
+
+    def __init__(self, total_samples):
+        self.total_samples = total_samples
+        self.buffer = bytearray()
+        self.emitted = 0
+        self.position = 0
+
+    def write(self, data):
+        data = memoryview(data).cast('B')
+        size = len(data)
+        if self.position < self.emitted:
+            # Back-patch of bytes already handed out
+            skipped = min(size, self.emitted - self.position)
+            self.position += skipped
+            data = data[skipped:]
+        if len(data):
+            offset = self.position - self.emitted
+            end = offset + len(data)
+            if end > len(self.buffer):
+                self.buffer.extend(bytes(end - len(self.buffer)))
+            self.buffer[offset:end] = data
+            self.position += len(data)
+        return size
+
+    def seek(self, offset, whence=0):
+        if whence == 0:
+            self.position = offset
+        elif whence == 1:
+            self.position += offset
+        else:
+            self.position = self.emitted + len(self.buffer) + offset
+        return self.position
+
+    def tell(self):
+        return self.position
+
+    def read(self, size=-1):
+        return b''
+
+    def drain(self):
+        """Return the bytes written since the last drain"""
+        if self.emitted == 0:
+            if len(self.buffer) < self.STREAMINFO_END:
+                return b''
+            # 36-bit total sample count in the low bits of bytes 21-25
+            field = int.from_bytes(self.buffer[21:26], 'big')
+            field = (field & ~((1 << 36) - 1)) | self.total_samples
+            self.buffer[21:26] = field.to_bytes(5, 'big')
+        data = bytes(self.buffer)
+        self.emitted += len(data)
+        self.buffer.clear()
+        return data
@@ -1,61 +1,323 @@
 import google.generativeai as genai
+import asyncio
+import copy
+import hashlib
 import os
 import json
+import queue
 import re
+import threading
+import time
+import unicodedata
+import weakref
+import logging
 from dotenv import load_dotenv
+from config.config import Config
+from services.resilience import remaining_time
+from utils.incremental_json import IncrementalObjectParser
+from utils.lru_cache import LRUCache
+from utils.metrics import metrics
 
 load_dotenv()
 
+gemini_tokens = metrics.counter('gemini_tokens_total', 'Gemini tokens by request kind and direction', ['kind', 'direction'])
+gemini_cache_lookups = metrics.counter('gemini_cache_lookups_total', 'Gemini response cache lookups', ['result'])
+
+_STREAM_END = object()
+
+# Sent once as the model's system instruction; each request carries only the transcript
+ENTITY_INSTRUCTIONS = """
+Extract medical entities from pediatric oncology clinical text.
+Return ONLY a JSON object with these fields:
+
+{
+    "patient_details": {
+        "age": null,
+        "sex": null,
+        "name": null
+    },
+    "diagnoses": [],
+    "clinical_findings": [],
+    "lab_results": [],
+    "medications": [],
+    "medical_professionals": []
+}
+
+Instructions:
+- Extract age as number only
+- Extract sex as M/F
+- Put diagnoses like "B-ALL", "leukemia" in diagnoses array
+- Put vital signs, symptoms in clinical_findings
+- Put lab values like "Hb 9", "WBC 1000" in lab_results
+- Put drug names in medications array
+- Put doctor names in medical_professionals
+- Return valid JSON only, no explanation
+"""
+
+FIELD_INSTRUCTIONS = """
+Extract the requested fields from pediatric oncology clinical text.
+Return ONLY a JSON object with exactly the requested keys, using null for
+anything the text does not state. Return valid JSON only, no explanation.
+"""
+
+# What to ask for each structured field when only some are needed
+FIELD_PROMPTS = {
+    'age': 'patient age in years, as a number',
+    'sex': '"M" or "F"',
+    'diagnosis': 'primary diagnosis as a short phrase, e.g. "B-ALL"',
+    'temperature': 'body temperature with unit, e.g. "101°F"',
+    'lab_results': 'object with "hb", "wbc" and "platelet" values as strings; omit values not stated',
+    'medications': 'array of {"name", "dose", "frequency", "duration"} objects',
+}
+
+def normalize_transcript(text):
+    """Unicode-normalized, whitespace-collapsed transcript used for cache keys"""
+    return ' '.join(unicodedata.normalize('NFKC', text).split())
+
+def parse_json_response(response_text):
+    json_text = response_text.strip()
+    if json_text.startswith('```'):
+        json_text = json_text.replace('```json', '').replace('```', '').strip()
+    return json.loads(json_text)
+
 class GeminiNLPService:
-    def __init__(self):
+    """Gemini-backed entity extraction.
+
+    Successful responses are cached by normalized transcript (LRU with a
+    TTL), at most max_in_flight calls run at once per process (threads) or
+    per event loop (async), and the static instructions are configured once
+    as system instructions rather than sent in each prompt.
+    """
+
+    def __init__(self, model_name=None, max_in_flight=None):
         genai.configure(api_key=os.getenv('GEMINI_API_KEY'))
-        self.model = genai.GenerativeModel('gemini-pro')
-        
+        self.model_name = model_name or Config.GEMINI_MODEL
+        self.model = genai.GenerativeModel(self.model_name, system_instruction=ENTITY_INSTRUCTIONS)
+        self.field_model = genai.GenerativeModel(self.model_name, system_instruction=FIELD_INSTRUCTIONS)
+        self.logger = logging.getLogger('services.gemini_nlp_service')
+        self.cache = LRUCache(
+            max_entries=Config.GEMINI_CACHE_MAX_ENTRIES,
+            ttl=Config.GEMINI_CACHE_TTL,
+        )
+        self.max_in_flight = max_in_flight or Config.GEMINI_MAX_IN_FLIGHT
+        self.in_flight = threading.BoundedSemaphore(self.max_in_flight)
+        # asyncio semaphores belong to one event loop
+        self.async_in_flight = weakref.WeakKeyDictionary()
+
+    def _cache_key(self, kind, text):
+        digest = hashlib.sha256(normalize_transcript(text).encode('utf-8')).hexdigest()
+        return f"{self.model_name}:{kind}:{digest}"
+
+    def _cached(self, key):
+        value = self.cache.get(key)
+        gemini_cache_lookups.inc(result='hit' if value is not None else 'miss')
+        # Callers may modify the result (structure_data does)
+        return copy.deepcopy(value)
+
+    def _store(self, key, value):
+        self.cache.put(key, copy.deepcopy(value))
+
+    def _record_usage(self, kind, response):
+        usage = getattr(response, 'usage_metadata', None)
+        prompt_tokens = getattr(usage, 'prompt_token_count', 0) or 0
+        output_tokens = getattr(usage, 'candidates_token_count', 0) or 0
+        gemini_tokens.inc(prompt_tokens, kind=kind, direction='prompt')
+        gemini_tokens.inc(output_tokens, kind=kind, direction='output')
+        self.logger.info(
+            f"Gemini {kind}: {prompt_tokens} prompt tokens, {output_tokens} output tokens, "
+            f"cache hit rate {self.cache.get_stats()['hit_rate']:.0%}"
+        )
+
+    def _async_semaphore(self):
+        loop = asyncio.get_running_loop()
+        semaphore = self.async_in_flight.get(loop)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.max_in_flight)
+            self.async_in_flight[loop] = semaphore
+        return semaphore
+
+    def _acquire_slot(self, timeout=None):
+        """Take an in-flight slot, waiting at most timeout, the request deadline
+        and GEMINI_SLOT_TIMEOUT; raises when none frees up in time"""
+        wait = Config.GEMINI_SLOT_TIMEOUT
+        for limit in (timeout, remaining_time()):
+            if limit is not None:
+                wait = min(wait, limit)
+        if not self.in_flight.acquire(timeout=max(0.0, wait)):
+            raise Exception(f"No Gemini slot free within {wait:.1f}s ({self.max_in_flight} calls in flight)")
+
     def extract_entities(self, text):
-        prompt = f"""
-        Extract medical entities from this pediatric oncology clinical text. 
-        Return ONLY a JSON object with these fields:
-        
-        {{
-            "patient_details": {{
-                "age": null,
-                "sex": null,
-                "name": null
-            }},
-            "diagnoses": [],
-            "clinical_findings": [],
-            "lab_results": [],
-            "medications": [],
-            "medical_professionals": []
-        }}
-        
-        Clinical text: "{text}"
-        
-        Instructions:
-        - Extract age as number only
-        - Extract sex as M/F
-        - Put diagnoses like "B-ALL", "leukemia" in diagnoses array
-        - Put vital signs, symptoms in clinical_findings
-        - Put lab values like "Hb 9", "WBC 1000" in lab_results
-        - Put drug names in medications array
-        - Put doctor names in medical_professionals
-        - Return valid JSON only, no explanation
-        """
-        
+        key = self._cache_key('entities', text)
+        cached = self._cached(key)
+        if cached is not None:
+            return cached
+
         try:
-            response = self.model.generate_content(prompt)
-            
-            json_text = response.text.strip()
-            if json_text.startswith('```json'):
-                json_text = json_text.replace('```json', '').replace('```', '').strip()
-            
-            entities = json.loads(json_text)
+            self._acquire_slot()
+            try:
+                response = self.model.generate_content(f'Clinical text: "{text}"')
+            finally:
+                self.in_flight.release()
+            self._record_usage('entities', response)
+            entities = parse_json_response(response.text)
+            self._store(key, entities)
             return entities
-            
+
         except Exception as e:
-            print(f"Gemini extraction error: {e}")
+            self.logger.warning(f"Gemini extraction error: {e}")
             return self._fallback_extraction(text)
-    
+
+    async def extract_entities_async(self, text):
+        """extract_entities for asyncio callers, limited to max_in_flight calls per loop"""
+        key = self._cache_key('entities', text)
+        cached = self._cached(key)
+        if cached is not None:
+            return cached
+
+        try:
+            async with self._async_semaphore():
+                response = await self.model.generate_content_async(f'Clinical text: "{text}"')
+            self._record_usage('entities', response)
+            entities = parse_json_response(response.text)
+            self._store(key, entities)
+            return entities
+
+        except Exception as e:
+            self.logger.warning(f"Gemini extraction error: {e}")
+            return self._fallback_extraction(text)
+
+    def stream_entities(self, text):
+        """Yield (section, value) as each top-level section of the response completes.
+
+        The response is streamed and parsed incrementally, so sections such
+        as patient_details arrive before generation ends. If the output
+        turns out malformed or the stream fails, the sections not yet
+        parsed come from _fallback_extraction; the model is not called again.
+        """
+        key = self._cache_key('entities', text)
+        cached = self._cached(key)
+        if cached is not None:
+            yield from cached.items()
+            return
+
+        # A stalled stream must not hold the request past its deadline
+        timeout = Config.GEMINI_STREAM_TIMEOUT
+        remaining = remaining_time()
+        if remaining is not None:
+            timeout = max(0.0, min(timeout, remaining))
+        expires = time.monotonic() + timeout
+
+        # Gemini is read on its own thread, so the in-flight slot is held
+        # only while it generates, not while a slow client reads sections
+        chunks = queue.Queue()
+        stop = threading.Event()
+        threading.Thread(
+            target=self._read_stream, args=(f'Clinical text: "{text}"', chunks, stop, expires),
+            name='gemini-stream', daemon=True
+        ).start()
+
+        parser = IncrementalObjectParser()
+        published = set()
+        try:
+            while True:
+                try:
+                    chunk = chunks.get(timeout=max(0.0, expires - time.monotonic()))
+                except queue.Empty:
+                    raise Exception(f"Gemini stream did not finish within {timeout:.1f}s")
+                if chunk is _STREAM_END:
+                    break
+                if isinstance(chunk, Exception):
+                    raise chunk
+                for section, value in parser.feed(chunk):
+                    published.add(section)
+                    yield section, value
+            self._store(key, parser.close())
+            return
+
+        except Exception as e:
+            self.logger.warning(f"Gemini streaming extraction error after {len(published)} sections: {e}")
+
+        finally:
+            # Also on close() by a consumer that stopped early
+            stop.set()
+
+        # Members the parser validated before the error still count
+        for section, value in parser.result.items():
+            if section not in published:
+                published.add(section)
+                yield section, value
+        for section, value in self._fallback_extraction(text).items():
+            if section not in published:
+                yield section, value
+
+    def _read_stream(self, prompt, chunks, stop, expires):
+        """Put each streamed chunk's text on chunks, then _STREAM_END or the
+        error; gives up at the monotonic time expires"""
+        try:
+            if not self.in_flight.acquire(timeout=max(0.0, expires - time.monotonic())):
+                raise Exception(f"No Gemini slot free within the stream timeout ({self.max_in_flight} in flight)")
+            try:
+                response = self.model.generate_content(
+                    prompt, stream=True,
+                    request_options={'timeout': max(0.001, expires - time.monotonic())}
+                )
+                for chunk in response:
+                    if stop.is_set():
+                        return
+                    chunks.put(chunk.text)
+            finally:
+                self.in_flight.release()
+            self._record_usage('entities', response)
+            chunks.put(_STREAM_END)
+        except Exception as e:
+            chunks.put(e)
+
+    def extract_entities_streaming(self, text, on_section=None):
+        """extract_entities via stream_entities, calling on_section(section, value) as each completes"""
+        entities = {}
+        for section, value in self.stream_entities(text):
+            entities[section] = value
+            if on_section:
+                on_section(section, value)
+        return entities
+
+    def extract_fields(self, text, fields, timeout=None):
+        """Ask only for the given FIELD_PROMPTS fields; returns {field: value or None}.
+
+        Unlike extract_entities, API errors are raised so the caller can
+        keep its own result; an unparseable answer gives all None.
+        """
+        key = self._cache_key('fields:' + ','.join(fields), text)
+        cached = self._cached(key)
+        if cached is not None:
+            return cached
+
+        wanted = "\n".join(f'"{field}": {FIELD_PROMPTS[field]}' for field in fields)
+        request_options = {'timeout': timeout} if timeout else None
+        # Rather than queue without bound, fail and let the caller keep its result
+        self._acquire_slot(timeout)
+        try:
+            response = self.field_model.generate_content(
+                f'Fields:\n{wanted}\n\nClinical text: "{text}"', request_options=request_options
+            )
+        finally:
+            self.in_flight.release()
+        self._record_usage('fields', response)
+
+        try:
+            values = parse_json_response(response.text)
+        except ValueError:
+            # The API answered; the answer is just unusable
+            self.logger.warning(f"Gemini returned invalid JSON for fields {fields}")
+            return {field: None for field in fields}
+
+        values = {field: values.get(field) for field in fields}
+        self._store(key, values)
+        return values
+
+    def get_stats(self):
+        return {'model': self.model_name, 'max_in_flight': self.max_in_flight, 'cache': self.cache.get_stats()}
+
     def _fallback_extraction(self, text):
         structured_data = {
             'patient_details': {'age': None, 'sex': None, 'name': None},
@@ -65,21 +327,33 @@ class GeminiNLPService:
             'medications': [],
             'medical_professionals': []
         }
-        
+
         age_match = re.search(r'(?:age|aged?)\s*:?\s*(\d+)', text, re.IGNORECASE)
         if age_match:
             structured_data['patient_details']['age'] = age_match.group(1)
-            
+
         sex_match = re.search(r'(?:sex|gender)\s*:?\s*(male|female|m|f)', text, re.IGNORECASE)
         if sex_match:
             structured_data['patient_details']['sex'] = sex_match.group(1).upper()
-            
+
         if 'dr.' in text.lower() or 'doctor' in text.lower():
             dr_matches = re.findall(r'dr\.?\s*([a-z\s\.]+)', text, re.IGNORECASE)
             structured_data['medical_professionals'].extend(dr_matches)
-            
+
         return structured_data
-    
+
     def structure_data(self, entities, original_text):
         entities['original_transcript'] = original_text
-        return entities
\ No newline at end of file
+        return entities
+
+
+_service = None
+_service_lock = threading.Lock()
+
+def get_gemini_service():
+    """The process-wide GeminiNLPService, created on first use"""
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = GeminiNLPService()
+        return _service
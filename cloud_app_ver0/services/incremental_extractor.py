@@ -0,0 +1,273 @@
+import re
+import time
+import logging
+from datetime import datetime
+from services.field_extractors import EXTRACTION_ENGINE, LAB_NAMES
+from services.medication_lexicon import medication_lexicon
+from services.nlp_service import build_default_record, confidence_score, presenting_history
+
+# A sentence ends at . ! or ? followed by whitespace, or at a line break. A
+# period without whitespace after it (101.5) is not a boundary, and neither
+# is one closing a known abbreviation (Dr. Rao, Inj. Vincristine).
+SENTENCE_BOUNDARY = re.compile(r'[.!?]+\s+|\n\s*')
+ABBREVIATION = re.compile(r'\b(?:dr|inj|tab|syp|cap|mr|mrs|ms|no|vs)\.\s+$', re.IGNORECASE)
+
+# How each field is merged across sentences: 'first' keeps the earliest
+# sentence that states it (demographics, vitals), 'last' the latest (the
+# diagnosis is refined as dictation goes on), and 'priority' the sentence
+# matched by the field's highest-priority pattern, earliest on a tie, as
+# the field's handler does over a whole transcript. Paths move together from
+# the winning sentence; the first path decides whether a sentence states the field.
+MERGE_RULES = [
+    ('first', [('patient_details', 'age')]),
+    ('first', [('patient_details', 'sex')]),
+    ('first', [('patient_details', 'attending_oncologist')]),
+    ('last', [('admission_details', 'diagnosis')]),
+    ('priority', [('history', 'chief_complaints')]),
+    ('first', [('clinical_examination', 'vitals', 'temp'), ('clinical_examination', 'general_condition')]),
+    ('first', [('clinical_examination', 'vitals', 'hr')]),
+    ('first', [('clinical_examination', 'vitals', 'bp')]),
+]
+RESPIRATORY_FINDINGS = ['Crepitations present', 'No retractions']
+
+# The field_extractors field whose pattern order ranks a 'priority' path
+RANKED_FIELDS = {('history', 'chief_complaints'): 'chief_complaints'}
+
+
+def split_sentences(text, start=0):
+    """Raw sentences of text[start:], trailing whitespace included, so that
+    they tile the text exactly"""
+    sentences = []
+    sentence_start = start
+    for boundary in SENTENCE_BOUNDARY.finditer(text, start):
+        # Only the few characters before the boundary can form an abbreviation
+        if ABBREVIATION.search(text, max(sentence_start, boundary.start() - 3), boundary.end()):
+            continue
+        sentences.append(text[sentence_start:boundary.end()])
+        sentence_start = boundary.end()
+    if sentence_start < len(text):
+        sentences.append(text[sentence_start:])
+    return sentences
+
+
+def _read(record, path):
+    for key in path:
+        record = record[key]
+    return record
+
+
+def _write(record, path, value):
+    for key in path[:-1]:
+        record = record[key]
+    record[path[-1]] = value
+
+
+def extract_sentence(sentence):
+    """What one sentence says: {path: value} for the merged fields, plus its
+    lab values, respiratory findings and medications"""
+    record = build_default_record(sentence)
+    EXTRACTION_ENGINE.extract(sentence, record)
+
+    values = {}
+    ranks = {}
+    for rule, paths in MERGE_RULES:
+        if _read(record, paths[0]):
+            for path in paths:
+                values[path] = _read(record, path)
+            if rule == 'priority':
+                ranks[paths[0]] = EXTRACTION_ENGINE.first_match_rank(RANKED_FIELDS[paths[0]], sentence)
+
+    labs = {}
+    for lab_result in record['investigations']['lab_results']:
+        labs.update({name: lab_result[name] for name in LAB_NAMES if name in lab_result})
+
+    respiratory = record['clinical_examination']['systems']['respiratory_system']
+    return {
+        'values': values,
+        'ranks': ranks,
+        'labs': labs,
+        'respiratory': [finding for finding in RESPIRATORY_FINDINGS if finding in respiratory],
+        'medications': medication_lexicon.extract(sentence),
+    }
+
+
+class MergedExtractions:
+    """Per-sentence extractions folded together in transcript order with
+    MERGE_RULES; sentences can only be added at the end"""
+
+    def __init__(self):
+        self.values = {}  # rule index -> {path: value} from the winning sentence
+        self.ranks = {}  # rule index -> pattern rank of the winning sentence, for 'priority' rules
+        self.labs = {}
+        self.respiratory = set()
+        self.medications = {}  # name -> entry, in order of first mention
+
+    def fold(self, extraction):
+        values = extraction['values']
+        for index, (rule, paths) in enumerate(MERGE_RULES):
+            if paths[0] not in values:
+                continue
+            if rule == 'priority':
+                rank = extraction['ranks'][paths[0]]
+                if index in self.ranks and self.ranks[index] <= rank:
+                    continue
+                self.ranks[index] = rank
+            elif rule == 'first' and index in self.values:
+                continue
+            self.values[index] = {path: values[path] for path in paths if path in values}
+
+        for name, value in extraction['labs'].items():
+            self.labs.setdefault(name, value)
+        self.respiratory.update(extraction['respiratory'])
+
+        # As in the lexicon: one entry per medication, with details a later mention adds
+        for mention in extraction['medications']:
+            medication = self.medications.get(mention['name'])
+            if medication is None:
+                self.medications[mention['name']] = dict(mention)
+            else:
+                for key, value in mention.items():
+                    if not medication[key]:
+                        medication[key] = value
+
+    def copy(self):
+        merged = MergedExtractions()
+        merged.values = dict(self.values)
+        merged.ranks = dict(self.ranks)
+        merged.labs = dict(self.labs)
+        merged.respiratory = set(self.respiratory)
+        merged.medications = {name: dict(medication) for name, medication in self.medications.items()}
+        return merged
+
+    def apply(self, record):
+        for values in self.values.values():
+            for path, value in values.items():
+                _write(record, path, value)
+
+        if self.labs:
+            lab_result = {name: self.labs[name] for name in LAB_NAMES if name in self.labs}
+            lab_result['date'] = datetime.now().strftime('%d/%m/%Y')
+            record['investigations']['lab_results'].append(lab_result)
+
+        if self.respiratory:
+            record['clinical_examination']['systems']['respiratory_system'] = '. '.join(
+                finding for finding in RESPIRATORY_FINDINGS if finding in self.respiratory
+            )
+
+        record['treatment']['medications'] = list(self.medications.values())
+        return record
+
+
+class IncrementalExtractor:
+    """Structured record for a transcript that grows as it is dictated.
+
+    Extraction results are kept per sentence. update() compares the new
+    transcript with the previous one, re-extracts only sentences that are
+    new or edited (the open last sentence always is) and folds them into
+    a running merge of the sentences before it, so an update that appends
+    text costs in proportion to the new text rather than the transcript.
+    An edit further back re-merges from the start, still without
+    re-extracting unchanged sentences.
+
+    The merged record matches structure_data field by field (see
+    benchmark_incremental.py) except in two cases: a diagnosis stated in
+    several sentences is taken from the last one rather than by pattern
+    order, and an attending name is cut at the end of its sentence where
+    the whole-transcript pattern can run on past the period.
+    """
+
+    def __init__(self):
+        self.text = ''
+        self.sentences = []  # [(raw sentence, extraction)]
+        self.closed_length = 0  # characters before the last sentence
+        self.merged = MergedExtractions()  # the first merged_count sentences
+        self.merged_count = 0
+        self.versions = None
+        self.logger = logging.getLogger('services.incremental_extractor')
+        self.updates = 0
+        self.extracted = 0
+
+    def _unchanged_prefix(self, text):
+        """How many leading sentences text still starts with, and their length;
+        the last sentence never counts since it may still be growing"""
+        closed = len(self.sentences) - 1
+        if closed <= 0:
+            return 0, 0
+        # Appending only, the usual case: one comparison
+        if text.startswith(self.text[:self.closed_length]):
+            return closed, self.closed_length
+
+        kept, offset = 0, 0
+        for raw, _ in self.sentences[:closed]:
+            if not text.startswith(raw, offset):
+                break
+            kept += 1
+            offset += len(raw)
+        return kept, offset
+
+    def _merge(self, sentences, count):
+        """Make the running merge cover sentences[:count]"""
+        if count < self.merged_count:
+            # An earlier sentence was edited or removed; merge again from the start
+            self.merged = MergedExtractions()
+            self.merged_count = 0
+        for _, extraction in sentences[self.merged_count:count]:
+            self.merged.fold(extraction)
+        self.merged_count = count
+
+    def update(self, text):
+        """Bring the record up to date with text, the whole transcript so far"""
+        started = time.perf_counter()
+        versions = (EXTRACTION_ENGINE.version, medication_lexicon.version)
+        if versions != self.versions:
+            # Patterns or lexicon changed: nothing extracted so far can be reused
+            self.sentences = []
+            self.closed_length = 0
+            self._merge([], 0)
+            self.versions = versions
+
+        kept, offset = self._unchanged_prefix(text)
+        if kept < self.merged_count:
+            self._merge(self.sentences, kept)
+
+        # Edited sentences in the middle shift the ones after them; reuse those by text
+        reusable = {raw.strip(): extraction for raw, extraction in self.sentences[kept:]}
+        sentences = self.sentences[:kept]
+        extracted = 0
+        for raw in split_sentences(text, offset):
+            extraction = reusable.get(raw.strip())
+            if extraction is None:
+                extraction = extract_sentence(raw)
+                extracted += 1
+            sentences.append((raw, extraction))
+
+        # Everything but the new last sentence is in the running merge
+        self._merge(sentences, max(len(sentences) - 1, 0))
+        self.closed_length = len(text) - len(sentences[-1][0]) if sentences else 0
+
+        self.text = text
+        self.sentences = sentences
+        self.updates += 1
+        self.extracted += extracted
+        self.logger.debug(
+            f"Updated live record in {(time.perf_counter() - started) * 1000:.2f}ms: "
+            f"{extracted} of {len(sentences)} sentences extracted"
+        )
+        return self.record()
+
+    def record(self):
+        """The merged structured record for the current transcript"""
+        merged = self.merged
+        if self.sentences:
+            merged = merged.copy()
+            merged.fold(self.sentences[-1][1])
+
+        text = self.text
+        record = merged.apply(build_default_record(text))
+        record['history']['presenting_history'] = presenting_history(text)
+        record['metadata']['confidence_score'] = confidence_score(record)
+        record['metadata']['extraction_tier'] = 'incremental'
+        return record
+
+    def get_stats(self):
+        return {'sentences': len(self.sentences), 'updates': self.updates, 'sentences_extracted': self.extracted}
@@ -0,0 +1,200 @@
+import json
+import os
+import re
+import string
+import threading
+import time
+import logging
+from itertools import accumulate, compress
+from config.config import Config
+from utils.aho_corasick import AhoCorasick
+
+# Punctuation and whitespace both separate words
+SEPARATORS = str.maketrans({c: ' ' for c in string.punctuation + string.whitespace})
+# A mention may not span a clause break ("Pip, Taz" is two words, not Pip-Taz)
+CLAUSE_BREAK = re.compile(r'[,;\n]|\.\s')
+# Dose/frequency/duration are read up to the end of the sentence or the next mention
+SENTENCE_END = re.compile(r'[;\n]|\.(?!\d)')
+
+DOSE_PATTERN = re.compile(
+    r'(?<![\w.])(\d+(?:\.\d+)?\s*(?:mg|mcg|g|gm|ml|iu|units?)(?:/(?:kg|m2|dose))?)(?![a-z])',
+    re.IGNORECASE
+)
+FREQUENCY_PATTERN = re.compile(
+    r'\b(once daily|twice daily|thrice daily|once a day|twice a day|(?:three|four) times a day|'
+    r'every \d+\s*(?:hours?|hrs?)|q\d+h|od|bd|bid|tds|tid|qid|qds|hs|sos|prn|stat|daily|weekly|as needed)\b',
+    re.IGNORECASE
+)
+DURATION_PATTERN = re.compile(r'\b(?:for|x)\s*(\d+\s*(?:days?|weeks?|months?|doses?))\b', re.IGNORECASE)
+
+
+class Tokens:
+    """Lower-cased words of a text and their character spans.
+
+    Separators are mapped to spaces with str.translate, which keeps offsets,
+    so the text is split in C rather than walked with a regex.
+    """
+
+    def __init__(self, text):
+        lowered = text.lower()
+        if len(lowered) != len(text):
+            # Some non-ASCII characters change length when lower-cased
+            lowered = text
+        self.parts = lowered.translate(SEPARATORS).split(' ')
+        self.words = list(filter(None, self.parts))
+        if lowered is text:
+            self.words = [word.lower() for word in self.words]
+        self.part_index = list(compress(range(len(self.parts)), self.parts))
+        self.part_ends = list(accumulate(map(len, self.parts)))
+
+    def span(self, index):
+        """(start, end) of word index in the text"""
+        part = self.part_index[index]
+        end = self.part_ends[part] + part  # one separator before each part but the first
+        return end - len(self.parts[part]), end
+
+
+class CompiledLexicon:
+    """Immutable matcher built from one version of the lexicon file"""
+
+    def __init__(self, data, version):
+        self.version = version
+        self.automaton = AhoCorasick()
+        self.prefixes = {}
+        self.medications = 0
+
+        for display, words in data.get('prefixes', {}).items():
+            for word in words:
+                self.prefixes[word.lower()] = display
+
+        for medication in data.get('medications', []):
+            name = medication['name']
+            self.medications += 1
+            for alias in [name] + medication.get('aliases', []):
+                self.automaton.add(tuple(Tokens(alias).words), name)
+        self.automaton.build()
+
+    def find(self, text):
+        """Yield (name, prefix, start, end) for each medication mention"""
+        tokens = Tokens(text)
+
+        def within_clause(first, last):
+            # Ruled out before choosing, so a shorter name inside the clause still matches
+            return not CLAUSE_BREAK.search(text, tokens.span(first)[0], tokens.span(last - 1)[1])
+
+        for first, last, name in self.automaton.find_longest(tokens.words, within_clause):
+            start, end = tokens.span(first)[0], tokens.span(last - 1)[1]
+
+            prefix = ''
+            if first > 0 and tokens.words[first - 1] in self.prefixes:
+                word_start, word_end = tokens.span(first - 1)
+                if text[word_end:start].strip(' .') == '':
+                    prefix = self.prefixes[tokens.words[first - 1]]
+                    start = word_start
+            yield name, prefix, start, end
+
+
+class MedicationLexicon:
+    """Medication recognizer driven by a JSON lexicon of names and aliases.
+
+    Names, brand aliases and Inj/Syp/Tab-style prefixes are compiled into an
+    Aho-Corasick automaton over word tokens, so a transcript is matched in
+    one linear pass however many aliases there are. The file is re-read when
+    its mtime changes (checked at most every check_interval seconds) or when
+    reload() is called; version increases with every successful load.
+    """
+
+    def __init__(self, path=None, check_interval=None):
+        self.path = path or Config.MEDICATION_LEXICON_PATH
+        self.check_interval = Config.MEDICATION_LEXICON_CHECK_SECONDS if check_interval is None else check_interval
+        self.logger = logging.getLogger('services.medication_lexicon')
+        self.lock = threading.Lock()
+        self.mtime = None
+        self.failed_mtime = None
+        self.checked_at = 0.0
+        self.compiled = CompiledLexicon({}, 0)
+
+        try:
+            self.reload()
+        except Exception as e:
+            # Extraction carries on without medications rather than failing
+            self.logger.error(f"Could not load medication lexicon {self.path}: {str(e)}")
+
+    @property
+    def version(self):
+        return self.compiled.version
+
+    def reload(self):
+        """Re-read the lexicon file; the previous lexicon stays active on error"""
+        with self.lock:
+            mtime = os.path.getmtime(self.path)
+            with open(self.path, encoding='utf-8') as f:
+                data = json.load(f)
+
+            started = time.perf_counter()
+            compiled = CompiledLexicon(data, self.compiled.version + 1)
+            self.compiled = compiled
+            self.mtime = mtime
+            self.logger.info(
+                f"Loaded medication lexicon v{compiled.version}: {compiled.medications} medications, "
+                f"{compiled.automaton.keywords} names in {(time.perf_counter() - started) * 1000:.1f}ms"
+            )
+            return compiled
+
+    def maybe_reload(self):
+        now = time.monotonic()
+        if now - self.checked_at < self.check_interval:
+            return
+        self.checked_at = now
+
+        mtime = None
+        try:
+            mtime = os.path.getmtime(self.path)
+            if mtime in (self.mtime, self.failed_mtime):
+                return
+            self.reload()
+        except Exception as e:
+            # Not retried until the file changes again
+            self.failed_mtime = mtime
+            self.logger.error(f"Medication lexicon reload failed, keeping v{self.version}: {str(e)}")
+
+    def extract(self, text):
+        """Medication entries (name, dose, frequency, duration) in order of first mention"""
+        self.maybe_reload()
+        compiled = self.compiled
+
+        mentions = list(compiled.find(text))
+        medications = {}
+        for index, (name, prefix, start, end) in enumerate(mentions):
+            limit = mentions[index + 1][2] if index + 1 < len(mentions) else len(text)
+            sentence_end = SENTENCE_END.search(text, end, limit)
+            window = text[end:sentence_end.start() if sentence_end else limit]
+
+            display = f"{prefix} {name}" if prefix else name
+            medication = medications.setdefault(display, {
+                'name': display,
+                'dose': '',
+                'frequency': '',
+                'duration': ''
+            })
+            # A later mention can fill in details the first one lacked
+            for key, pattern in (('dose', DOSE_PATTERN), ('frequency', FREQUENCY_PATTERN),
+                                 ('duration', DURATION_PATTERN)):
+                if not medication[key]:
+                    match = pattern.search(window)
+                    if match:
+                        medication[key] = match.group(1)
+
+        return list(medications.values())
+
+    def get_stats(self):
+        compiled = self.compiled
+        return {
+            'path': self.path,
+            'version': compiled.version,
+            'medications': compiled.medications,
+            'names': compiled.automaton.keywords,
+        }
+
+
+medication_lexicon = MedicationLexicon()
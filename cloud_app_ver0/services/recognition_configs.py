@@ -0,0 +1,300 @@
+import threading
+
+# Candidate recognition configs, tried in this order when nothing is known
+# about the uploaded format
+RECOGNITION_CONFIGS = {
+    # Medical model with auto-detect (works for WAV/FLAC headers)
+    'medical_auto': {
+        'language_code': 'en-US',
+        'model': 'medical_dictation',
+        'use_enhanced': True,
+        'enable_automatic_punctuation': True,
+        'enable_spoken_punctuation': True,
+    },
+    # WEBM_OPUS with medical model (browser MediaRecorder uploads)
+    'webm_opus': {
+        'encoding': 'WEBM_OPUS',
+        'sample_rate_hertz': 48000,
+        'language_code': 'en-US',
+        'model': 'medical_dictation',
+        'use_enhanced': True,
+        'enable_automatic_punctuation': True,
+    },
+    # Latest short model
+    'latest_short': {
+        'language_code': 'en-US',
+        'model': 'latest_short',
+        'use_enhanced': True,
+        'enable_automatic_punctuation': True,
+    },
+}
+
+DEFAULT_ORDER = ['medical_auto', 'webm_opus', 'latest_short']
+
+# Config expected to work for a sniffed format before any stats exist
+FORMAT_HINTS = {
+    'wav': 'medical_auto',
+    'flac': 'medical_auto',
+    'webm': 'webm_opus',
+}
+
+
+def sniff_audio_format(content):
+    """Identify the audio container from its header bytes"""
+    header = bytes(content[:64])
+
+    if header[:4] == b'RIFF' and header[8:12] == b'WAVE':
+        return 'wav'
+    if header[:4] == b'\x1a\x45\xdf\xa3':
+        # EBML header - WebM declares its DocType near the start
+        return 'webm' if b'webm' in header else 'matroska'
+    if header[:4] == b'OggS':
+        return 'ogg_opus' if b'OpusHead' in header else 'ogg'
+    if header[:4] == b'fLaC':
+        return 'flac'
+    if header[:3] == b'ID3' or (len(header) > 1 and header[0] == 0xFF and header[1] & 0xE0 == 0xE0):
+        return 'mp3'
+    if header[4:8] == b'ftyp':
+        return 'mp4'
+    return 'unknown'
+
+
+WEBM_CLUSTER_ID = b'\x1f\x43\xb6\x75'
+
+
+def container_header_length(data, encoding):
+    """Length of the container header at the start of data: WebM up to the
+    first Cluster, Ogg the pages holding the OpusHead and OpusTags packets.
+    None while data does not yet hold the whole header."""
+    if encoding == 'WEBM_OPUS':
+        index = bytes(data).find(WEBM_CLUSTER_ID)
+        return index if index >= 0 else None
+
+    if encoding == 'OGG_OPUS':
+        position, packets = 0, 0
+        while position + 27 <= len(data):
+            if data[position:position + 4] != b'OggS':
+                return None
+            table_start = position + 27
+            table_end = table_start + data[position + 26]
+            if table_end > len(data):
+                return None
+            table = data[table_start:table_end]
+            position = table_end + sum(table)
+            if position > len(data):
+                return None
+            # A lacing value under 255 ends a packet
+            packets += sum(1 for lacing in table if lacing < 255)
+            if packets >= 2:
+                return position
+        return None
+
+    return None
+
+
+def _read_vint(data, position):
+    """(value, length) of the EBML variable-size integer at position, None
+    while data ends inside it, ValueError when it is not one"""
+    if position >= len(data):
+        return None
+    first = data[position]
+    if first == 0:
+        raise ValueError("invalid EBML size")
+    length = 9 - first.bit_length()
+    if position + length > len(data):
+        return None
+    value = first & ((1 << (8 - length)) - 1)
+    for byte in data[position + 1:position + length]:
+        value = (value << 8) | byte
+    return value, length
+
+
+class StreamCursor:
+    """Where a restarted recognition stream can pick up the audio.
+
+    Fed the audio bytes sent after the container header, it keeps tail, the
+    bytes since the last point a stream may start from (a WebM Cluster, an
+    Ogg page after one that ends a packet, a whole LINEAR16 sample), and
+    time, the seconds of audio before that point. A restarted stream sends
+    the header and then tail again, so it starts on a point a decoder can
+    parse. time is None for other encodings or once the container cannot be
+    followed; restarts then go on without a replay.
+    """
+
+    def __init__(self, encoding, sample_rate_hertz, max_tail=2 * 1024 * 1024):
+        self.encoding = encoding
+        self.sample_rate_hertz = sample_rate_hertz
+        self.max_tail = max_tail
+        self.tail = bytearray()
+        self.scanned = 0  # bytes of tail already searched for a restart point
+        self.time = 0.0 if encoding in ('WEBM_OPUS', 'OGG_OPUS', 'LINEAR16') else None
+        self.bytes_fed = 0
+        self.timecode_scale = 1000000  # WebM default, in nanoseconds
+        self.first_timecode = None
+
+    def set_header(self, header):
+        """Take the WebM TimecodeScale from the container header"""
+        index = bytes(header).find(b'\x2a\xd7\xb1')
+        if self.encoding != 'WEBM_OPUS' or index < 0:
+            return
+        try:
+            size = _read_vint(header, index + 3)
+        except ValueError:
+            return
+        if size is not None:
+            start = index + 3 + size[1]
+            self.timecode_scale = int.from_bytes(bytes(header[start:start + size[0]]), 'big') or self.timecode_scale
+
+    def lose_track(self):
+        self.time = None
+        self.tail = bytearray()
+
+    def feed(self, data):
+        """Account for audio bytes sent to the current stream"""
+        if self.time is None:
+            return
+        self.bytes_fed += len(data)
+        if self.encoding == 'LINEAR16':
+            # The odd byte of a split sample goes out again at the next restart
+            self.tail = bytearray(data[-1:]) if self.bytes_fed % 2 else bytearray()
+            self.time = (self.bytes_fed // 2) / self.sample_rate_hertz
+            return
+
+        self.tail.extend(data)
+        if self.encoding == 'WEBM_OPUS':
+            self._scan_webm()
+        else:
+            self._scan_ogg()
+        if self.time is not None and len(self.tail) > self.max_tail:
+            self.lose_track()
+
+    def _scan_webm(self):
+        while True:
+            index = self.tail.find(WEBM_CLUSTER_ID, self.scanned)
+            if index < 0:
+                self.scanned = max(self.scanned, len(self.tail) - 3)
+                return
+            # Opus data can hold the ID by chance; a Cluster opens with its Timecode
+            try:
+                size = _read_vint(self.tail, index + 4)
+                position = index + 4 + size[1] if size else None
+                if position is not None and position < len(self.tail) and self.tail[position] != 0xE7:
+                    raise ValueError("no Cluster Timecode")
+                timecode_size = _read_vint(self.tail, position + 1) if position is not None else None
+            except ValueError:
+                self.scanned = index + 1
+                continue
+            if timecode_size is None:
+                self.scanned = index
+                return
+            start = position + 1 + timecode_size[1]
+            if start + timecode_size[0] > len(self.tail):
+                self.scanned = index
+                return
+
+            timecode = int.from_bytes(bytes(self.tail[start:start + timecode_size[0]]), 'big')
+            if self.first_timecode is None:
+                self.first_timecode = timecode
+            self.time = max(0.0, (timecode - self.first_timecode) * self.timecode_scale / 1e9)
+            del self.tail[:index]
+            self.scanned = 1
+
+    def _scan_ogg(self):
+        position = self.scanned
+        while position + 27 <= len(self.tail):
+            if self.tail[position:position + 4] != b'OggS':
+                self.lose_track()
+                return
+            table_end = position + 27 + self.tail[position + 26]
+            if table_end > len(self.tail):
+                break
+            page_end = table_end + sum(self.tail[position + 27:table_end])
+            if page_end > len(self.tail):
+                break
+            granule = int.from_bytes(bytes(self.tail[position + 6:position + 14]), 'little')
+            last_lacing = self.tail[table_end - 1] if table_end > position + 27 else 255
+            position = page_end
+            # The next page starts a packet only if this one ended on a packet boundary
+            if last_lacing < 255 and granule != 0xFFFFFFFFFFFFFFFF:
+                self.time = granule / 48000.0  # Opus granules count 48kHz samples
+                del self.tail[:position]
+                position = 0
+        self.scanned = position
+
+
+class ConfigSelector:
+    """Per-format memory of which recognition config succeeds.
+
+    Success and attempt counts decay geometrically on every new outcome for
+    a format, so a config that stops working loses its place quickly.
+    """
+
+    def __init__(self, decay=0.9):
+        self.decay = decay
+        self.lock = threading.Lock()
+        self.stats = {}      # format -> config name -> {'successes', 'attempts'}
+        self.last_success = {}
+        self.hits = {}
+        self.misses = {}
+
+    def candidates(self, audio_format):
+        """Config names ordered by how likely they are to succeed for this format"""
+        with self.lock:
+            preferred = self.last_success.get(audio_format) or FORMAT_HINTS.get(audio_format)
+            format_stats = self.stats.get(audio_format, {})
+
+            def score(name):
+                entry = format_stats.get(name)
+                if not entry or entry['attempts'] == 0:
+                    return 0.5
+                return entry['successes'] / entry['attempts']
+
+            ordered = sorted(DEFAULT_ORDER, key=lambda name: (-score(name), DEFAULT_ORDER.index(name)))
+            if preferred in ordered:
+                ordered.remove(preferred)
+                ordered.insert(0, preferred)
+            return ordered
+
+    def has_preference(self, audio_format):
+        """True when there is a known-good config for this format"""
+        with self.lock:
+            return audio_format in self.last_success or audio_format in FORMAT_HINTS
+
+    def record_attempt(self, audio_format, name, success):
+        """Record the outcome of one recognize call"""
+        with self.lock:
+            format_stats = self.stats.setdefault(audio_format, {})
+            for entry in format_stats.values():
+                entry['successes'] *= self.decay
+                entry['attempts'] *= self.decay
+
+            entry = format_stats.setdefault(name, {'successes': 0.0, 'attempts': 0.0})
+            entry['attempts'] += 1
+            if success:
+                entry['successes'] += 1
+                self.last_success[audio_format] = name
+            elif self.last_success.get(audio_format) == name:
+                del self.last_success[audio_format]
+
+    def record_request(self, audio_format, first_choice_succeeded):
+        """Count a cache hit when the first candidate produced the transcript"""
+        with self.lock:
+            counter = self.hits if first_choice_succeeded else self.misses
+            counter[audio_format] = counter.get(audio_format, 0) + 1
+
+    def get_stats(self):
+        with self.lock:
+            formats = set(self.stats) | set(self.hits) | set(self.misses)
+            return {
+                audio_format: {
+                    'hits': self.hits.get(audio_format, 0),
+                    'misses': self.misses.get(audio_format, 0),
+                    'preferred_config': self.last_success.get(audio_format),
+                    'success_rates': {
+                        name: round(entry['successes'] / entry['attempts'], 3)
+                        for name, entry in self.stats.get(audio_format, {}).items()
+                        if entry['attempts'] > 0
+                    },
+                }
+                for audio_format in sorted(formats)
+            }
@@ -0,0 +1,253 @@
+import contextvars
+import copy
+import hashlib
+import json
+import re
+import threading
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from config.config import Config
+from services.field_extractors import EXTRACTION_ENGINE
+from services.medication_lexicon import medication_lexicon
+from services.nlp_service import presenting_history
+from services.tiered_extractor import TieredExtractor
+from utils.lru_cache import LRUCache
+from utils.metrics import metrics
+
+entity_extractions = metrics.counter(
+    'report_entity_extraction_total',
+    'Remote entity extraction per report (started, awaited, skipped, busy, failed)',
+    ['outcome']
+)
+report_cache_lookups = metrics.counter('report_cache_lookups_total', 'Report cache lookups', ['result'])
+
+HORIZONTAL_SPACE = re.compile(r'[ \t]+')
+
+
+def parse_flag(data, name, default=None):
+    """A boolean request option: JSON true or false, default when absent;
+    raises on anything else (a "false" string would otherwise count as true)"""
+    value = data.get(name)
+    if value is None:
+        return default
+    if not isinstance(value, bool):
+        raise Exception(f"{name} must be true or false")
+    return value
+
+
+def normalize_for_cache(text):
+    """Lower-cased transcript with runs of spaces and tabs collapsed; reports
+    for transcripts that differ only in case or spacing are served from one
+    cache entry. Line breaks are kept: medication extraction treats them as
+    clause and sentence breaks."""
+    return HORIZONTAL_SPACE.sub(' ', text.lower()).strip(' \t')
+
+
+def extracted_fields(structured_data):
+    """A copy of structured_data without what comes from the request's own
+    text and clock, which is all a cached record may share with another request"""
+    extracted = copy.deepcopy(structured_data)
+    extracted['original_transcript'] = ''
+    extracted['history']['presenting_history'] = ''
+    extracted['metadata']['generated_at'] = ''
+    for lab_result in extracted['investigations']['lab_results']:
+        lab_result['date'] = ''
+    return extracted
+
+
+def restore_request_fields(structured_data, transcription):
+    """Fill in what extracted_fields left out, from this request"""
+    structured_data['original_transcript'] = transcription
+    structured_data['history']['presenting_history'] = presenting_history(transcription)
+    structured_data['metadata']['generated_at'] = datetime.now().isoformat()
+    today = datetime.now().strftime('%d/%m/%Y')
+    for lab_result in structured_data['investigations']['lab_results']:
+        lab_result['date'] = today
+    return structured_data
+
+
+def _json_size(value):
+    return len(json.dumps(value, default=str))
+
+
+class LazyEntities:
+    """Entities from the remote NL API, fetched in the background.
+
+    Only a consumer that calls result() waits for the API; reports that
+    never look at entities are not held up by it.
+    """
+
+    def __init__(self, future=None):
+        self.future = future
+
+    @property
+    def enabled(self):
+        return self.future is not None
+
+    def done(self):
+        return self.future is None or self.future.done()
+
+    def result(self, timeout=None):
+        """The extracted entities; [] when extraction was disabled.
+
+        Errors from the API (including CircuitOpenError) are raised here,
+        to the consumer that asked.
+        """
+        if self.future is None:
+            return []
+        entity_extractions.inc(outcome='awaited')
+        return self.future.result(timeout=timeout)
+
+
+class ReportPipeline:
+    """Runs /api/generate-report: local structuring and report generation on
+    the request thread, remote entity extraction concurrently on a pool.
+
+    At most max_pending extractions may be queued or running; beyond that
+    they are skipped so a slow API cannot pile up background work.
+
+    Extracted fields are memoized (LRU, bounded by entries and bytes) by
+    normalized transcript, request options and the versions of the
+    extraction patterns and medication lexicon, so regenerating a report
+    skips the remote call and structuring; the transcript, timestamps and
+    rendered report always come from the current request. A lexicon reload
+    empties the cache.
+    """
+
+    def __init__(self, nlp_service, report_generator, max_workers=None, max_pending=None):
+        self.nlp_service = nlp_service
+        self.report_generator = report_generator
+        self.extractor = TieredExtractor(nlp_service)
+        self.logger = logging.getLogger('services.report_pipeline')
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers or Config.REPORT_ENTITY_WORKERS,
+            thread_name_prefix='report-entities'
+        )
+        self.pending = threading.BoundedSemaphore(max_pending or Config.REPORT_ENTITY_MAX_PENDING)
+        self.cache = None
+        if Config.REPORT_CACHE_MAX_ENTRIES:
+            self.cache = LRUCache(
+                max_entries=Config.REPORT_CACHE_MAX_ENTRIES,
+                max_bytes=Config.REPORT_CACHE_MAX_BYTES,
+                ttl=Config.REPORT_CACHE_TTL,
+                sizeof=_json_size,
+            )
+        self.cache_versions = None
+        self.cache_lock = threading.Lock()
+
+    def start_entities(self, transcription, enabled=None):
+        """Start remote entity extraction unless disabled; returns a LazyEntities"""
+        if enabled is None:
+            enabled = Config.REPORT_EXTRACT_ENTITIES
+        if not enabled:
+            entity_extractions.inc(outcome='skipped')
+            return LazyEntities()
+
+        if not self.pending.acquire(blocking=False):
+            entity_extractions.inc(outcome='busy')
+            self.logger.warning("Entity extraction backlog full, skipping it for this report")
+            return LazyEntities()
+
+        # Run in a copy of the request context so the request deadline applies
+        future = self.executor.submit(contextvars.copy_context().run, self.nlp_service.extract_entities, transcription)
+        future.add_done_callback(self._finished)
+        entity_extractions.inc(outcome='started')
+        return LazyEntities(future)
+
+    def _finished(self, future):
+        self.pending.release()
+        error = future.exception()
+        if error is not None:
+            # Also reported to whoever awaits the result; logged here for the rest
+            entity_extractions.inc(outcome='failed')
+            self.logger.warning(f"Background entity extraction failed: {str(error)}")
+
+    def _versions(self):
+        """What cached results depend on besides the transcript; the cache is
+        emptied when it changes"""
+        # Cache hits skip extraction, which is where lexicon edits are normally noticed
+        medication_lexicon.maybe_reload()
+        versions = (
+            EXTRACTION_ENGINE.version, medication_lexicon.version,
+            self.extractor.backend, self.extractor.threshold,
+        )
+        with self.cache_lock:
+            if versions != self.cache_versions:
+                if self.cache_versions is not None:
+                    self.cache.clear()
+                    self.logger.info(f"Extraction changed to {versions}, report cache cleared")
+                self.cache_versions = versions
+        return versions
+
+    def _cache_key(self, transcription, entities_enabled, include_entities, escalate):
+        # Entities quote the text verbatim, so results that include them are
+        # only shared by identical transcripts
+        text = transcription if include_entities else normalize_for_cache(transcription)
+        digest = hashlib.sha256(text.encode('utf-8')).hexdigest()
+        options = f"{entities_enabled:d}{include_entities:d}{escalate:d}"
+        return f"{digest}:{options}:{self._versions()}"
+
+    def run(self, transcription, extract_entities=None, include_entities=False, escalate=True):
+        """Structure transcription and generate the report.
+
+        include_entities adds the remote entities to the result, which makes
+        this call wait for them; extract_entities=False skips the API call.
+        escalate=False keeps the local extraction even at low confidence.
+        """
+        started = time.perf_counter()
+        enabled = True if include_entities else extract_entities
+        if enabled is None:
+            enabled = Config.REPORT_EXTRACT_ENTITIES
+
+        key = None
+        if self.cache is not None:
+            key = self._cache_key(transcription, bool(enabled), include_entities, escalate)
+            cached = self.cache.get(key)
+            report_cache_lookups.inc(result='hit' if cached is not None else 'miss')
+            if cached is not None:
+                result = self._from_cache(cached, transcription)
+                self.logger.info(f"Report served from cache in {(time.perf_counter() - started) * 1000:.1f}ms")
+                return result
+
+        entities = self.start_entities(transcription, enabled)
+
+        structured_data = self.extractor.extract(entities, transcription, escalate=escalate)
+        report = self.report_generator.generate_report(structured_data)
+        result = {'structured_data': structured_data, 'report': report}
+
+        if include_entities:
+            result['entities'] = entities.result()
+
+        # A failed escalation is worth retrying on the next click
+        if key is not None and not structured_data['metadata'].get('escalation_failed'):
+            cached = {'structured_data': extracted_fields(structured_data)}
+            if include_entities:
+                cached['entities'] = copy.deepcopy(result['entities'])
+            self.cache.put(key, cached)
+
+        self.logger.info(
+            f"Report generated in {(time.perf_counter() - started) * 1000:.1f}ms "
+            f"(entities {'awaited' if include_entities else 'not awaited' if entities.enabled else 'skipped'})"
+        )
+        return result
+
+    def _from_cache(self, cached, transcription):
+        """Result for transcription from a cached entry: the extracted fields
+        are reused, the request's own text and timestamps filled back in and
+        the report rendered from them"""
+        structured_data = restore_request_fields(copy.deepcopy(cached['structured_data']), transcription)
+        result = {
+            'structured_data': structured_data,
+            'report': self.report_generator.generate_report(structured_data),
+        }
+        if 'entities' in cached:
+            result['entities'] = copy.deepcopy(cached['entities'])
+        return result
+
+    def get_stats(self):
+        return {
+            'extraction': self.extractor.get_stats(),
+            'cache': self.cache.get_stats() if self.cache is not None else None,
+        }
@@ -0,0 +1,268 @@
+import contextvars
+import random
+import threading
+import time
+import logging
+from config.config import Config
+from utils.metrics import metrics
+
+logger = logging.getLogger('services.resilience')
+
+circuit_state = metrics.gauge(
+    'upstream_circuit_state', 'Circuit breaker state (0 closed, 1 half-open, 2 open)', ['upstream']
+)
+circuit_transitions = metrics.counter(
+    'upstream_circuit_transitions_total', 'Circuit breaker state transitions',
+    ['upstream', 'from_state', 'to_state']
+)
+upstream_calls = metrics.counter(
+    'upstream_calls_total', 'Upstream API call attempts by outcome', ['upstream', 'outcome']
+)
+upstream_retries = metrics.counter('upstream_retries_total', 'Upstream API retries', ['upstream'])
+retry_budget_exhausted = metrics.counter(
+    'retry_budget_exhausted_total', 'Retries refused because the retry budget was empty', ['upstream']
+)
+retry_budget_tokens = metrics.gauge('retry_budget_tokens', 'Retries currently available in the budget')
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream whose circuit is open"""
+
+    def __init__(self, upstream, retry_after):
+        super().__init__(f"{upstream} is unavailable, retry after {retry_after:.0f}s")
+        self.upstream = upstream
+        self.retry_after = retry_after
+
+
+class DeadlineExceededError(Exception):
+    """Raised when the request's deadline passes before an upstream call could be made"""
+
+
+# Absolute monotonic deadline of the request being served, if any
+_deadline = contextvars.ContextVar('request_deadline', default=None)
+
+
+def set_deadline(seconds):
+    """Start a deadline seconds from now for the current context, none when
+    seconds is None; returns a reset token. Zero or less has already passed."""
+    return _deadline.set(None if seconds is None else time.monotonic() + seconds)
+
+
+def reset_deadline(token):
+    _deadline.reset(token)
+
+
+def remaining_time():
+    """Seconds left before the current deadline, or None when there is none"""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def is_retryable(error):
+    """Transport failures, 5xx and 429 responses are retried and count
+    against the circuit; nothing else does"""
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    try:
+        from google.api_core import exceptions
+        from google.auth.exceptions import TransportError
+    except ImportError:
+        return False
+
+    if isinstance(error, TransportError):
+        return True
+    return isinstance(error, (exceptions.ServerError, exceptions.TooManyRequests, exceptions.ResourceExhausted))
+
+
+def is_api_error(error):
+    """The API answered, but rejected the request"""
+    try:
+        from google.api_core import exceptions
+    except ImportError:
+        return False
+    return isinstance(error, exceptions.GoogleAPICallError)
+
+
+class CircuitBreaker:
+    """Opens after failure_threshold consecutive failures and rejects calls
+    for reset_timeout seconds, then lets a single probe call through."""
+
+    STATE_VALUES = {'closed': 0, 'half_open': 1, 'open': 2}
+
+    def __init__(self, name, failure_threshold=None, reset_timeout=None):
+        self.name = name
+        self.failure_threshold = failure_threshold or Config.CIRCUIT_FAILURE_THRESHOLD
+        self.reset_timeout = reset_timeout or Config.CIRCUIT_RESET_SECONDS
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+        self.lock = threading.Lock()
+        circuit_state.set(0, upstream=name)
+
+    def before_call(self):
+        with self.lock:
+            if self.state == 'open':
+                wait = self.opened_at + self.reset_timeout - time.monotonic()
+                if wait > 0:
+                    raise CircuitOpenError(self.name, wait)
+                self._transition('half_open')
+
+            if self.state == 'half_open':
+                if self.probe_in_flight:
+                    raise CircuitOpenError(self.name, self.reset_timeout)
+                self.probe_in_flight = True
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.probe_in_flight = False
+            if self.state != 'closed':
+                self._transition('closed')
+
+    def release(self):
+        """The call ended without telling anything about the upstream's health"""
+        with self.lock:
+            self.probe_in_flight = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            self.probe_in_flight = False
+            if self.state == 'half_open' or (self.state == 'closed' and self.failures >= self.failure_threshold):
+                self.opened_at = time.monotonic()
+                self._transition('open')
+
+    def _transition(self, state):
+        logger.warning(f"Circuit {self.name}: {self.state} -> {state} ({self.failures} consecutive failures)")
+        circuit_transitions.inc(upstream=self.name, from_state=self.state, to_state=state)
+        circuit_state.set(self.STATE_VALUES[state], upstream=self.name)
+        self.state = state
+
+    def get_stats(self):
+        with self.lock:
+            return {'state': self.state, 'consecutive_failures': self.failures}
+
+
+class RetryBudget:
+    """Caps retries at ratio of recent first attempts plus min_per_second.
+
+    Shared by every upstream so a degraded API cannot multiply load on
+    itself (or on the others) by retrying.
+    """
+
+    def __init__(self, ratio=None, min_per_second=None, max_tokens=10.0):
+        self.ratio = Config.RETRY_BUDGET_RATIO if ratio is None else ratio
+        self.min_per_second = Config.RETRY_BUDGET_MIN_PER_SECOND if min_per_second is None else min_per_second
+        self.max_tokens = max_tokens
+        self.tokens = max_tokens
+        self.refilled_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self, amount):
+        self.tokens = min(self.max_tokens, self.tokens + amount)
+        retry_budget_tokens.set(round(self.tokens, 2))
+
+    def record_call(self):
+        with self.lock:
+            self._refill(self.ratio)
+
+    def try_spend(self):
+        with self.lock:
+            now = time.monotonic()
+            self._refill((now - self.refilled_at) * self.min_per_second)
+            self.refilled_at = now
+            if self.tokens < 1:
+                return False
+            self._refill(-1)
+            return True
+
+
+class Upstream:
+    """A remote API guarded by a circuit breaker, the shared retry budget and
+    the current request deadline."""
+
+    def __init__(self, name, budget, max_attempts=None, backoff_base=None, backoff_cap=None):
+        self.name = name
+        self.breaker = CircuitBreaker(name)
+        self.budget = budget
+        self.max_attempts = max_attempts or Config.RETRY_MAX_ATTEMPTS
+        self.backoff_base = (backoff_base or Config.RETRY_BACKOFF_BASE_MS) / 1000.0
+        self.backoff_cap = (backoff_cap or Config.RETRY_BACKOFF_CAP_MS) / 1000.0
+
+    def call(self, operation, timeout=None):
+        """Run operation(timeout) with retries and return its result.
+
+        timeout is the per-attempt limit; it is shortened to whatever is
+        left of the request deadline.
+        """
+        attempt = 0
+        while True:
+            remaining = remaining_time()
+            if remaining is not None and remaining <= 0:
+                raise DeadlineExceededError(f"Request deadline passed before calling {self.name}")
+
+            try:
+                self.breaker.before_call()
+            except CircuitOpenError:
+                upstream_calls.inc(upstream=self.name, outcome='rejected')
+                raise
+
+            call_timeout = timeout if remaining is None else min(timeout or remaining, remaining)
+
+            if attempt == 0:
+                self.budget.record_call()
+
+            try:
+                result = operation(call_timeout)
+            except Exception as e:
+                if not is_retryable(e):
+                    if is_api_error(e):
+                        # The API answered; the request itself was bad
+                        self.breaker.record_success()
+                        upstream_calls.inc(upstream=self.name, outcome='client_error')
+                    else:
+                        # Failed on this side (credentials, a bug): not the upstream's fault
+                        self.breaker.release()
+                        upstream_calls.inc(upstream=self.name, outcome='local_error')
+                    raise
+
+                self.breaker.record_failure()
+                upstream_calls.inc(upstream=self.name, outcome='failure')
+                attempt += 1
+                if attempt >= self.max_attempts:
+                    raise
+
+                # Full jitter keeps retries from many workers from synchronizing
+                delay = random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+                remaining = remaining_time()
+                if remaining is not None and delay >= remaining:
+                    raise
+                if not self.budget.try_spend():
+                    retry_budget_exhausted.inc(upstream=self.name)
+                    logger.warning(f"Retry budget exhausted, not retrying {self.name}: {str(e)}")
+                    raise
+
+                upstream_retries.inc(upstream=self.name)
+                logger.warning(f"{self.name} attempt {attempt} failed ({str(e)}), retrying in {delay:.2f}s")
+                time.sleep(delay)
+                continue
+
+            self.breaker.record_success()
+            upstream_calls.inc(upstream=self.name, outcome='success')
+            return result
+
+
+retry_budget = RetryBudget()
+_upstreams = {}
+_upstreams_lock = threading.Lock()
+
+
+def get_upstream(name):
+    """The process-wide Upstream for name, created on first use"""
+    with _upstreams_lock:
+        if name not in _upstreams:
+            _upstreams[name] = Upstream(name, retry_budget)
+        return _upstreams[name]
@@ -0,0 +1,136 @@
+import threading
+import time
+import logging
+from config.config import Config
+from services.audio_stream import AudioRingBuffer
+
+class StreamingSession:
+    def __init__(self, sid, max_bytes):
+        self.sid = sid
+        self.buffer = AudioRingBuffer(capacity=max_bytes)
+        self.thread = None
+        self.started_at = time.monotonic()
+        self.bytes_received = 0
+        self.frames_received = 0
+        self.chunks_dropped = 0
+        self.decode_seconds = 0.0
+
+    def get_stats(self):
+        elapsed = max(time.monotonic() - self.started_at, 1e-6)
+        return {
+            'duration_seconds': round(elapsed, 1),
+            'bytes_received': self.bytes_received,
+            'bytes_per_second': round(self.bytes_received / elapsed, 1),
+            'frames_received': self.frames_received,
+            'chunks_dropped': self.chunks_dropped,
+            'buffered_bytes': self.buffer.buffered_bytes,
+            'decode_ms_total': round(self.decode_seconds * 1000, 3),
+            'decode_ms_per_frame': round(self.decode_seconds * 1000 / self.frames_received, 4)
+                if self.frames_received else 0.0,
+        }
+
+
+class StreamingSessionManager:
+    """One recognition stream per socket, capped per worker process.
+
+    Each session owns a preallocated ring of max_session_bytes for audio the
+    recognizer has not consumed yet; frames arriving beyond that are dropped
+    rather than letting a stalled stream grow without bound.
+    """
+
+    def __init__(self, transcription_service, max_sessions=None, max_session_bytes=None):
+        self.transcription_service = transcription_service
+        self.max_sessions = max_sessions or Config.STREAMING_MAX_SESSIONS
+        self.max_session_bytes = max_session_bytes or Config.STREAMING_SESSION_MAX_BYTES
+        self.sessions = {}
+        self.lock = threading.Lock()
+        self.logger = logging.getLogger('services.streaming_sessions')
+        self.logger.info(
+            f"StreamingSessionManager initialized (max_sessions={self.max_sessions}, "
+            f"max_session_bytes={self.max_session_bytes})"
+        )
+
+    def start(self, sid, on_result, on_error=None):
+        """Open a recognition stream for sid. Returns None when at capacity."""
+        with self.lock:
+            if sid in self.sessions:
+                self.logger.warning(f"Session {sid} already streaming, restarting it")
+                self.sessions.pop(sid).buffer.close()
+
+            if len(self.sessions) >= self.max_sessions:
+                self.logger.warning(f"Rejecting session {sid}: {len(self.sessions)} sessions active")
+                return None
+
+            session = StreamingSession(sid, self.max_session_bytes)
+            self.sessions[sid] = session
+
+        session.thread = threading.Thread(
+            target=self._run, args=(session, on_result, on_error),
+            name=f'stream-{sid}', daemon=True
+        )
+        session.thread.start()
+        self.logger.info(f"Started streaming session {sid} ({len(self.sessions)} active)")
+        return session
+
+    def feed(self, sid, frame, decode_seconds=0.0):
+        """Copy an audio frame into sid's ring buffer. Returns False if it was not accepted.
+
+        decode_seconds is the time the caller spent unpacking the frame and is
+        accumulated into the session stats.
+        """
+        session = self.sessions.get(sid)
+        if session is None:
+            return False
+
+        accepted = session.buffer.put(frame, timeout=Config.STREAMING_FEED_TIMEOUT)
+        session.decode_seconds += decode_seconds
+        session.frames_received += 1
+        session.bytes_received += len(frame)
+
+        if not accepted:
+            session.chunks_dropped += 1
+            self.logger.warning(f"Session {sid} buffer full, dropped {len(frame)} byte frame")
+        return accepted
+
+    def stop(self, sid):
+        """Close sid's audio; its stream drains the remaining audio and ends"""
+        with self.lock:
+            session = self.sessions.pop(sid, None)
+        if session is None:
+            return False
+
+        session.buffer.close()
+        duration = time.monotonic() - session.started_at
+        self.logger.info(
+            f"Stopped streaming session {sid} after {duration:.1f}s, "
+            f"{session.bytes_received} bytes received, {session.chunks_dropped} chunks dropped"
+        )
+        return True
+
+    def _run(self, session, on_result, on_error):
+        try:
+            for result in self.transcription_service.stream_transcribe_audio(session.buffer):
+                on_result(result)
+        except Exception as e:
+            self.logger.error(f"Streaming session {session.sid} failed: {str(e)}")
+            if on_error:
+                on_error(e)
+        finally:
+            session.buffer.close()
+            with self.lock:
+                if self.sessions.get(session.sid) is session:
+                    del self.sessions[session.sid]
+
+    @property
+    def active_count(self):
+        with self.lock:
+            return len(self.sessions)
+
+    def get_stats(self):
+        with self.lock:
+            sessions = dict(self.sessions)
+        return {
+            'active_sessions': len(sessions),
+            'max_sessions': self.max_sessions,
+            'sessions': {sid: session.get_stats() for sid, session in sessions.items()},
+        }
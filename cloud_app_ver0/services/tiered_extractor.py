@@ -0,0 +1,171 @@
+import threading
+import time
+import logging
+from datetime import datetime
+from config.config import Config
+from services.nlp_service import confidence_score, missing_fields
+from services.resilience import get_upstream
+from utils.metrics import metrics
+
+extractions = metrics.counter(
+    'structured_extraction_total', 'Structured-data extractions by the tier that produced the result', ['tier']
+)
+escalations = metrics.counter(
+    'extraction_escalations_total', 'Escalations to a slower extractor by backend and outcome',
+    ['backend', 'outcome']
+)
+escalation_ratio = metrics.gauge(
+    'extraction_escalation_ratio', 'Share of extractions escalated since this worker started'
+)
+
+# Google NL entity types only say anything about medications
+NL_FIELDS = {'medications'}
+
+
+class TieredExtractor:
+    """Local compiled extraction first, a slower extractor only when needed.
+
+    The record from NLPService.structure_data is returned as-is when its
+    confidence score reaches the threshold. Below it, only the fields that
+    are still empty are requested from the escalation backend ('gemini', or
+    'nl' for the Google NL entities already being fetched for the report)
+    and merged in; fields the local tier found are never overwritten.
+    """
+
+    def __init__(self, nlp_service, backend=None, threshold=None):
+        self.nlp_service = nlp_service
+        self.backend = (backend or Config.EXTRACTION_ESCALATION_BACKEND).lower()
+        self.threshold = Config.EXTRACTION_ESCALATION_THRESHOLD if threshold is None else threshold
+        self.timeout = Config.EXTRACTION_ESCALATION_TIMEOUT
+        self.logger = logging.getLogger('services.tiered_extractor')
+        self.gemini = None  # shared GeminiNLPService, fetched on the first escalation
+        self.counts = {'total': 0, 'escalated': 0}
+        self.counts_lock = threading.Lock()
+
+        if self.backend not in ('gemini', 'nl', 'none'):
+            raise Exception(f"Unknown EXTRACTION_ESCALATION_BACKEND '{self.backend}', expected gemini, nl or none")
+
+    def extract(self, entities, text, escalate=True):
+        """Structured record for text; entities is the report's LazyEntities"""
+        record = self.nlp_service.structure_data(entities, text)
+        metadata = record['metadata']
+        metadata['extraction_tier'] = 'local'
+
+        fields = self._fields_to_escalate(record, entities) if escalate else []
+        if fields:
+            started = time.perf_counter()
+            filled = self._escalate(record, fields, entities, text)
+            metadata['extraction_tier'] = 'escalated'
+            metadata['escalation_backend'] = self.backend
+            metadata['escalated_fields'] = filled or []
+            if filled is None:
+                metadata['escalation_failed'] = True
+            metadata['confidence_score'] = confidence_score(record)
+            self.logger.info(
+                f"Escalated {fields} to {self.backend} in {(time.perf_counter() - started) * 1000:.0f}ms, "
+                f"filled {metadata['escalated_fields']}; confidence now {metadata['confidence_score']:.2f}"
+            )
+
+        self._count(metadata['extraction_tier'])
+        return record
+
+    def _fields_to_escalate(self, record, entities):
+        if self.backend == 'none' or record['metadata']['confidence_score'] >= self.threshold:
+            return []
+        fields = missing_fields(record)
+        if self.backend == 'nl':
+            if not entities.enabled:
+                return []
+            fields = [field for field in fields if field in NL_FIELDS]
+        return fields
+
+    def _escalate(self, record, fields, entities, text):
+        try:
+            if self.backend == 'gemini':
+                values = get_upstream('gemini').call(
+                    lambda timeout: self._gemini().extract_fields(text, fields, timeout=timeout),
+                    timeout=self.timeout,
+                )
+            else:
+                values = self._from_entities(entities.result(timeout=self.timeout))
+        except Exception as e:
+            # The local result stands on its own
+            escalations.inc(backend=self.backend, outcome='failed')
+            self.logger.warning(f"Extraction escalation to {self.backend} failed: {str(e)}")
+            return None
+
+        filled = [field for field in fields if values.get(field) and merge_field(record, field, values[field])]
+        escalations.inc(backend=self.backend, outcome='filled' if filled else 'empty')
+        return filled
+
+    def _gemini(self):
+        if self.gemini is None:
+            # Imported here: google-generativeai is only needed once something escalates
+            from services.gemini_nlp_service import get_gemini_service
+            self.gemini = get_gemini_service()
+        return self.gemini
+
+    def _from_entities(self, entities):
+        medications = [
+            {'name': entity['name'], 'dose': '', 'frequency': '', 'duration': ''}
+            for entity in entities if entity.get('type') == 'CONSUMER_GOOD'
+        ]
+        return {'medications': medications}
+
+    def _count(self, tier):
+        extractions.inc(tier=tier)
+        with self.counts_lock:
+            self.counts['total'] += 1
+            if tier == 'escalated':
+                self.counts['escalated'] += 1
+            escalation_ratio.set(round(self.counts['escalated'] / self.counts['total'], 4))
+
+    def get_stats(self):
+        with self.counts_lock:
+            counts = dict(self.counts)
+        return {
+            'backend': self.backend,
+            'threshold': self.threshold,
+            'extractions': counts['total'],
+            'escalated': counts['escalated'],
+            'escalation_rate': round(counts['escalated'] / counts['total'], 4) if counts['total'] else 0.0,
+        }
+
+
+def merge_field(record, field, value):
+    """Write an escalated value into an empty record field; returns True if it was used"""
+    if field == 'age':
+        digits = ''.join(ch for ch in str(value) if ch.isdigit())
+        if digits:
+            record['patient_details']['age'] = digits
+            return True
+    elif field == 'sex':
+        sex = str(value).strip().upper()[:1]
+        if sex in ('M', 'F'):
+            record['patient_details']['sex'] = sex
+            return True
+    elif field == 'diagnosis':
+        record['admission_details']['diagnosis'] = str(value).strip()
+        return True
+    elif field == 'temperature':
+        temp = str(value).strip()
+        record['clinical_examination']['vitals']['temp'] = temp
+        if not record['clinical_examination']['general_condition']:
+            record['clinical_examination']['general_condition'] = f"Febrile ({temp})"
+        return True
+    elif field == 'lab_results' and isinstance(value, dict):
+        lab_result = {name: str(value[name]) for name in ('hb', 'wbc', 'platelet') if value.get(name)}
+        if lab_result:
+            lab_result['date'] = datetime.now().strftime('%d/%m/%Y')
+            record['investigations']['lab_results'].append(lab_result)
+            return True
+    elif field == 'medications' and isinstance(value, list):
+        for medication in value:
+            if isinstance(medication, str):
+                medication = {'name': medication}
+            if isinstance(medication, dict) and medication.get('name'):
+                record['treatment']['medications'].append({
+                    key: str(medication.get(key) or '') for key in ('name', 'dose', 'frequency', 'duration')
+                })
+        return bool(record['treatment']['medications'])
+    return False
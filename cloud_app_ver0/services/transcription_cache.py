@@ -0,0 +1,126 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import logging
+from config.config import Config
+from services.recognition_configs import RECOGNITION_CONFIGS
+from utils.lru_cache import LRUCache
+
+class TranscriptionCache:
+    """Content-addressed transcript cache.
+
+    Keys are the SHA-256 of the audio bytes combined with a fingerprint of
+    the recognition configs, so changing a config never serves stale text.
+    An in-memory LRU tier sits in front of an optional on-disk tier that
+    survives restarts.
+    """
+
+    def __init__(self, max_entries=None, disk_dir=None, disk_max_bytes=None, disk_max_age=None):
+        self.logger = logging.getLogger('services.transcription_cache')
+        self.memory = LRUCache(max_entries=max_entries or Config.TRANSCRIPTION_CACHE_MAX_ENTRIES)
+
+        self.disk_dir = disk_dir if disk_dir is not None else Config.TRANSCRIPTION_CACHE_DIR
+        self.disk_max_bytes = disk_max_bytes or Config.TRANSCRIPTION_CACHE_DISK_MAX_BYTES
+        self.disk_max_age = disk_max_age or Config.TRANSCRIPTION_CACHE_DISK_MAX_AGE
+        self.disk_lock = threading.Lock()
+        self.disk_hits = 0
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+
+        self.config_fingerprint = hashlib.sha256(
+            json.dumps(RECOGNITION_CONFIGS, sort_keys=True).encode('utf-8')
+        ).hexdigest()[:16]
+        self.logger.info(f"TranscriptionCache initialized (disk tier: {self.disk_dir or 'disabled'})")
+
+    def key(self, content):
+        return f"{hashlib.sha256(content).hexdigest()}-{self.config_fingerprint}"
+
+    def get(self, key):
+        transcription = self.memory.get(key)
+        if transcription is not None:
+            return transcription
+
+        transcription = self._disk_get(key)
+        if transcription is not None:
+            self.disk_hits += 1
+            self.memory.put(key, transcription)
+        return transcription
+
+    def put(self, key, transcription):
+        self.memory.put(key, transcription)
+        self._disk_put(key, transcription)
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.json")
+
+    def _disk_get(self, key):
+        if not self.disk_dir:
+            return None
+
+        path = self._disk_path(key)
+        try:
+            if time.time() - os.path.getmtime(path) > self.disk_max_age:
+                os.unlink(path)
+                return None
+            with open(path, 'r') as f:
+                return json.load(f)['transcription']
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            self.logger.warning(f"Failed to read cached transcription {key}: {str(e)}")
+            return None
+
+    def _disk_put(self, key, transcription):
+        if not self.disk_dir:
+            return
+
+        path = self._disk_path(key)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(temp_path, 'w') as f:
+                json.dump({'transcription': transcription, 'created_at': time.time()}, f)
+            os.replace(temp_path, path)
+            self._disk_evict()
+        except Exception as e:
+            self.logger.warning(f"Failed to write cached transcription {key}: {str(e)}")
+
+    def _disk_evict(self):
+        """Drop expired files, then the oldest files until under the size cap"""
+        with self.disk_lock:
+            entries = []
+            for entry in os.scandir(self.disk_dir):
+                if entry.name.endswith('.json'):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+            now = time.time()
+            total = 0
+            kept = []
+            for mtime, size, path in entries:
+                if now - mtime > self.disk_max_age:
+                    self._unlink(path)
+                else:
+                    kept.append((mtime, size, path))
+                    total += size
+
+            for mtime, size, path in sorted(kept):
+                if total <= self.disk_max_bytes:
+                    break
+                self._unlink(path)
+                total -= size
+
+    def _unlink(self, path):
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+    def get_stats(self):
+        stats = self.memory.get_stats()
+        stats['disk_enabled'] = bool(self.disk_dir)
+        stats['disk_hits'] = self.disk_hits
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round((stats['hits'] + self.disk_hits) / lookups, 3) if lookups else 0.0
+        return stats
@@ -0,0 +1,84 @@
+from datetime import datetime
+import threading
+import uuid
+import logging
+
+class TranscriptionJob:
+    def __init__(self):
+        self.id = uuid.uuid4().hex
+        self.status = 'queued'
+        self.progress_percent = 0
+        self.transcription = None
+        self.error = None
+        self.created_at = datetime.now()
+        self.updated_at = self.created_at
+        self.finished = threading.Event()
+
+    def update(self, **fields):
+        for name, value in fields.items():
+            setattr(self, name, value)
+        self.updated_at = datetime.now()
+        if self.status in ('completed', 'failed'):
+            self.finished.set()
+
+    def to_dict(self):
+        job = {
+            'job_id': self.id,
+            'status': self.status,
+            'progress_percent': self.progress_percent,
+            'created_at': self.created_at.isoformat(),
+            'updated_at': self.updated_at.isoformat(),
+        }
+        if self.transcription is not None:
+            job['transcription'] = self.transcription
+        if self.error is not None:
+            job['error'] = self.error
+        return job
+
+
+class TranscriptionJobManager:
+    """Runs long transcriptions on background threads and tracks their status.
+
+    Jobs live in the memory of the worker that accepted them, so status
+    polling must reach the same worker (sticky sessions or a single worker
+    for the long-running path).
+    """
+
+    def __init__(self, retention_seconds=3600):
+        self.jobs = {}
+        self.lock = threading.Lock()
+        self.retention_seconds = retention_seconds
+        self.logger = logging.getLogger('services.transcription_jobs')
+
+    def submit(self, runner, *args):
+        """Start runner(job, *args) in the background and return the job"""
+        self._prune()
+
+        job = TranscriptionJob()
+        with self.lock:
+            self.jobs[job.id] = job
+
+        def run():
+            try:
+                runner(job, *args)
+            except Exception as e:
+                self.logger.error(f"Transcription job {job.id} failed: {str(e)}")
+                job.update(status='failed', error=str(e))
+
+        threading.Thread(target=run, name=f'transcription-job-{job.id[:8]}', daemon=True).start()
+        self.logger.info(f"Submitted transcription job {job.id}")
+        return job
+
+    def get(self, job_id):
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def _prune(self):
+        now = datetime.now()
+        with self.lock:
+            expired = [
+                job_id for job_id, job in self.jobs.items()
+                if job.finished.is_set() and (now - job.updated_at).total_seconds() > self.retention_seconds
+            ]
+            for job_id in expired:
+                del self.jobs[job_id]
@@ -1,164 +1,503 @@
-from google.cloud import speech
-import os
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, as_completed, wait
+from config.config import Config
+from services.audio_stream import AudioChunkQueue, AudioRingBuffer
+from services.audio_segmenter import AudioSegmenter, merge_transcripts
+from services.voice_activity import VoiceActivityDetector
+from services.transcription_cache import TranscriptionCache
+from services.transcription_jobs import TranscriptionJobManager
+from services.blob_store import create_blob_store
+from services.asr_backends import create_asr_backend
+from services.resilience import CircuitOpenError, DeadlineExceededError, get_upstream
+from utils.audio_buffer import AudioBuffer
+from services.recognition_configs import (
+    RECOGNITION_CONFIGS, ConfigSelector, StreamCursor, container_header_length, sniff_audio_format
+)
+import contextvars
+import time
+import threading
 import logging
 import traceback
 
+# Give up looking for the end of a WebM/Ogg header after this much audio
+MAX_CONTAINER_HEADER_BYTES = 256 * 1024
+
+# Lossy uploads (browser WebM/Opus, MP3) are smaller than lossless FLAC of the
+# same audio even after silence trimming, so they are sent as they are
+COMPRESSED_FORMATS = ('webm', 'matroska', 'ogg_opus', 'ogg', 'mp3', 'mp4')
+
 class TranscriptionService:
-    def __init__(self):
-        self.client = speech.SpeechClient()
+    # Inline recognition payloads are capped at 10MB by the API
+    LONG_RUNNING_THRESHOLD = 10000000
+    
+    def __init__(self, backend=None, max_workers=None, hedge_enabled=None):
         self.logger = logging.getLogger('services.transcription_service')
-        self.logger.info("TranscriptionService initialized")
+        self.backend = backend or create_asr_backend()
+        self.upstream = get_upstream('speech')
+        
+        # Bounded pool shared by all requests so concurrent uploads cannot
+        # open more than max_workers recognize calls at once
+        self.max_workers = max_workers or Config.TRANSCRIPTION_MAX_WORKERS
+        self.executor = ThreadPoolExecutor(
+            max_workers=self.max_workers,
+            thread_name_prefix='transcribe-chunk'
+        )
         
-    def transcribe_audio(self, audio_file_path):
-        self.logger.info(f"Starting transcription for file: {audio_file_path}")
+        # Hedged requests race candidate configs when the format is unknown.
+        # They get their own pool so chunk workers never wait on themselves.
+        self.hedge_enabled = Config.TRANSCRIPTION_HEDGE_ENABLED if hedge_enabled is None else hedge_enabled
+        self.hedge_delay = Config.TRANSCRIPTION_HEDGE_DELAY_MS / 1000.0
+        self.recognize_timeout = Config.TRANSCRIPTION_RECOGNIZE_TIMEOUT
+        self.hedge_executor = ThreadPoolExecutor(
+            max_workers=self.max_workers * 3,
+            thread_name_prefix='transcribe-hedge'
+        )
+        self.segmenter = AudioSegmenter()
+        self.vad = VoiceActivityDetector(
+            min_silence_ms=Config.VAD_MIN_SILENCE_MS,
+            keep_silence_ms=Config.VAD_KEEP_SILENCE_MS,
+            threshold_db=Config.VAD_THRESHOLD_DB,
+        ) if Config.VAD_ENABLED else None
+        self.vad_stats = {'requests': 0, 'original_seconds': 0.0, 'removed_seconds': 0.0}
+        self.encode_stats = {'requests': 0, 'input_bytes': 0, 'output_bytes': 0, 'encode_seconds': 0.0}
+        self.stats_lock = threading.Lock()
+        self.config_selector = ConfigSelector()
+        self.cache = TranscriptionCache()
+        self.jobs = TranscriptionJobManager()
+        self.blob_store = None  # created on first long-running job
+        self.logger.info(
+            f"TranscriptionService initialized (backend={self.backend.name}, max_workers={self.max_workers})"
+        )
+        
+    def transcribe_audio(self, audio_source):
+        """Transcribe a file path, upload stream or bytes-like buffer.
+
+        The audio is viewed in place (memory-mapped when file-backed), so the
+        service never holds more than one copy of the recording. Audio still
+        over LONG_RUNNING_THRESHOLD once prepared is rejected; see
+        start_transcription.
+        """
+        transcription, _ = self._transcribe(audio_source, allow_long_running=False)
+        return transcription
+    
+    def start_transcription(self, audio_source):
+        """Like transcribe_audio, but audio still over LONG_RUNNING_THRESHOLD
+        after silence trimming and re-encoding is recognized in the background.
+
+        Returns (transcription, None), or (None, job) for a long running job.
+        """
+        return self._transcribe(audio_source, allow_long_running=True)
+    
+    def _transcribe(self, audio_source, allow_long_running):
+        self.logger.info(f"Starting transcription for: {getattr(audio_source, 'name', type(audio_source).__name__)}")
         
         try:
-            with open(audio_file_path, 'rb') as audio_file:
-                content = audio_file.read()
-                
-            file_size = len(content)
-            self.logger.info(f"Audio file size: {file_size} bytes")
-            
-            if file_size == 0:
-                raise Exception("Audio file is empty")
-            
-            # Use appropriate method based on file size
-            if file_size > 10000000:  # 10MB limit for long running
-                self.logger.info("Very large file detected, using long running recognition")
-                return self._transcribe_long_running(audio_file_path)
-            elif file_size > 500000:  # 500KB - 10MB use chunked processing
-                self.logger.info("Large file detected, using chunked processing")
-                return self._transcribe_chunked(content)
-            else:
-                self.logger.info("Small file, using synchronous recognition")
-                return self._transcribe_sync(content)
+            with AudioBuffer(audio_source) as content:
+                return self._transcribe_content(content, allow_long_running)
             
         except Exception as e:
             self.logger.error(f"Transcription failed: {str(e)}")
             self.logger.error(f"Full traceback: {traceback.format_exc()}")
             raise
     
+    def _transcribe_content(self, content, allow_long_running):
+        file_size = len(content)
+        self.logger.info(f"Audio size: {file_size} bytes")
+        
+        if file_size == 0:
+            raise Exception("Audio file is empty")
+        
+        # Re-submitted recordings are served without calling Google again
+        cache_key = self.cache.key(content)
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            self.logger.info(f"Transcription cache hit: {cache_key[:12]}")
+            return cached, None
+        
+        # Dead air is cut and PCM compressed before the size checks so
+        # neither pushes a recording onto a slower path
+        content, decoded = self._prepare_audio(content)
+        file_size = len(content)
+        
+        # Use appropriate method based on file size
+        if file_size > self.LONG_RUNNING_THRESHOLD:
+            # Recognition can take as long as the recording; nothing should wait on it inline
+            if not allow_long_running:
+                raise Exception(
+                    f"Audio of {file_size} bytes exceeds {self.LONG_RUNNING_THRESHOLD} bytes, "
+                    f"use start_transcription instead"
+                )
+            # The job outlives the request, so it gets its own copy of the prepared audio
+            self.logger.info(f"Very large file detected, submitting long running job for {file_size} bytes")
+            return None, self.jobs.submit(self._run_long_running_job, bytes(content), cache_key)
+        elif file_size > 500000:  # 500KB - 10MB use chunked processing
+            self.logger.info("Large file detected, using chunked processing")
+            transcription = self._transcribe_chunked(content, decoded)
+        else:
+            self.logger.info("Small file, using synchronous recognition")
+            transcription = self._transcribe_sync(content)
+        
+        self.cache.put(cache_key, transcription)
+        return transcription, None
+    
+    def _prepare_audio(self, content):
+        """Trim silence and re-encode PCM losslessly before recognition.
+
+        Long pauses are compressed and leading/trailing silence cut (VAD),
+        then the samples are encoded as FLAC (or WAV without soundfile).
+        Returns (content, decoded): the original content, without decoding
+        it, for lossy containers, and otherwise when it cannot be decoded,
+        nothing would change, or the re-encoded audio is not smaller.
+        decoded is (samples, sample_rate) of the returned audio when it was
+        decoded here, so segmentation need not decode it again, else None.
+        """
+        if sniff_audio_format(content) in COMPRESSED_FORMATS:
+            return content, None
+        
+        is_pcm = content[:4] == b'RIFF'
+        if self.vad is None and not (is_pcm and self.segmenter.flac):
+            return content, None
+        
+        decoded = self.segmenter.decode(content)
+        if decoded is None:
+            return content, None
+        
+        samples, sample_rate = decoded
+        offsets = None
+        if self.vad is not None:
+            samples, offsets = self.vad.trim(samples, sample_rate)
+            if offsets.removed_samples == 0 and not is_pcm:
+                return content, decoded
+        
+        started = time.perf_counter()
+        encoded = self.segmenter.encode(samples, sample_rate)
+        elapsed = time.perf_counter() - started
+        
+        if len(encoded) >= len(content):
+            self.logger.info(
+                f"Keeping original audio, re-encoded audio ({len(encoded)} bytes) "
+                f"is not smaller than the upload ({len(content)} bytes)"
+            )
+            return content, decoded
+        
+        # Only silence that is actually left out of the request counts as removed
+        if offsets is not None:
+            self._record_vad(offsets, sample_rate)
+        with self.stats_lock:
+            self.encode_stats['requests'] += 1
+            self.encode_stats['input_bytes'] += len(content)
+            self.encode_stats['output_bytes'] += len(encoded)
+            self.encode_stats['encode_seconds'] += elapsed
+        self.logger.info(
+            f"Re-encoded audio as {'FLAC' if self.segmenter.flac else 'WAV'}: "
+            f"{len(content)} -> {len(encoded)} bytes in {elapsed * 1000:.1f}ms"
+        )
+        return encoded, (samples, sample_rate)
+    
+    def _record_vad(self, offsets, sample_rate):
+        original_seconds = offsets.original_samples / sample_rate
+        removed_seconds = offsets.removed_samples / sample_rate
+        with self.stats_lock:
+            self.vad_stats['requests'] += 1
+            self.vad_stats['original_seconds'] += original_seconds
+            self.vad_stats['removed_seconds'] += removed_seconds
+        self.logger.info(
+            f"VAD removed {offsets.removed_percent:.1f}% of audio "
+            f"({removed_seconds:.1f}s of {original_seconds:.1f}s)"
+        )
+    
     def _transcribe_sync(self, content):
         """Handle short audio with synchronous recognition"""
-        configs_to_try = [
-            # Configuration 1: Medical model with auto-detect
-            speech.RecognitionConfig(
-                language_code="en-US",
-                model="medical_dictation",
-                use_enhanced=True,
-                enable_automatic_punctuation=True,
-                enable_spoken_punctuation=True,
-            ),
-            # Configuration 2: WEBM_OPUS with medical model
-            speech.RecognitionConfig(
-                encoding=speech.RecognitionConfig.AudioEncoding.WEBM_OPUS,
-                sample_rate_hertz=48000,
-                language_code="en-US",
-                model="medical_dictation",
-                use_enhanced=True,
-                enable_automatic_punctuation=True,
-            ),
-            # Configuration 3: Latest short model
-            speech.RecognitionConfig(
-                language_code="en-US",
-                model="latest_short", 
-                use_enhanced=True,
-                enable_automatic_punctuation=True,
-            ),
-        ]
-        
-        audio = speech.RecognitionAudio(content=content)
-        
-        for i, config in enumerate(configs_to_try):
+        # Start with the config that last worked for this container format
+        audio_format = sniff_audio_format(content)
+        configs_to_try = self.config_selector.candidates(audio_format)
+        
+        if self.hedge_enabled and not self.config_selector.has_preference(audio_format):
+            return self._transcribe_hedged(content, audio_format, configs_to_try)
+        
+        for i, name in enumerate(configs_to_try):
             try:
-                self.logger.info(f"Trying sync config {i+1}: {getattr(config, 'model', 'default')}")
+                self.logger.info(f"Trying sync config {i+1} for {audio_format}: {name}")
                 
-                response = self.client.recognize(config=config, audio=audio)
+                transcription = self._recognize(name, content)
                 
-                transcription = ""
-                for result in response.results:
-                    transcription += result.alternatives[0].transcript + " "
+                if transcription:
+                    self.config_selector.record_attempt(audio_format, name, True)
+                    self.config_selector.record_request(audio_format, i == 0)
+                    self.logger.info(f"Sync transcription successful with config {i+1} ({name})")
+                    return transcription
                 
-                if transcription.strip():
-                    self.logger.info(f"Sync transcription successful with config {i+1}")
-                    return transcription.strip()
+                self.config_selector.record_attempt(audio_format, name, False)
                     
+            except (CircuitOpenError, DeadlineExceededError):
+                # Other configs would hit the same unavailable API
+                raise
             except Exception as e:
-                self.logger.warning(f"Sync config {i+1} failed: {str(e)}")
+                self.config_selector.record_attempt(audio_format, name, False)
+                self.logger.warning(f"Sync config {i+1} ({name}) failed: {str(e)}")
                 continue
         
+        self.config_selector.record_request(audio_format, False)
+        raise Exception("All synchronous transcription configurations failed")
+    
+    def _transcribe_hedged(self, content, audio_format, configs_to_try):
+        """Race candidate configs, returning the first non-empty transcript.
+
+        The first candidate runs alone for hedge_delay seconds; only if it
+        has not produced a transcript by then are the others started.
+        """
+        self.logger.info(f"Unknown format {audio_format}, hedging across {len(configs_to_try)} configs")
+        
+        pending = {self._submit(self.hedge_executor, self._recognize, configs_to_try[0], content): configs_to_try[0]}
+        hedged = False
+        
+        while pending:
+            timeout = None if hedged else self.hedge_delay
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            
+            for future in done:
+                name = pending.pop(future)
+                try:
+                    transcription = future.result()
+                except (CircuitOpenError, DeadlineExceededError):
+                    for other in pending:
+                        other.cancel()
+                    raise
+                except Exception as e:
+                    self.logger.warning(f"Hedged config {name} failed: {str(e)}")
+                    transcription = ""
+                
+                self.config_selector.record_attempt(audio_format, name, bool(transcription))
+                if transcription:
+                    # Calls already in flight cannot be aborted; they finish in
+                    # the background within recognize_timeout and are ignored
+                    for other in pending:
+                        other.cancel()
+                    self.config_selector.record_request(audio_format, name == configs_to_try[0])
+                    self.logger.info(f"Hedged transcription won by config {name}")
+                    return transcription
+            
+            if not hedged and (not done or not pending):
+                hedged = True
+                for name in configs_to_try[1:]:
+                    pending[self._submit(self.hedge_executor, self._recognize, name, content)] = name
+                self.logger.info(f"Hedge started after {self.hedge_delay:.2f}s")
+        
+        self.config_selector.record_request(audio_format, False)
         raise Exception("All synchronous transcription configurations failed")
     
-    def _transcribe_chunked(self, content):
-        """Handle medium-sized audio by chunking"""
+    def _recognize(self, name, content):
+        """Run one recognize call with a named config and return the transcript"""
+        return self.upstream.call(
+            lambda timeout: self.backend.recognize(RECOGNITION_CONFIGS[name], content, timeout=timeout),
+            timeout=self.recognize_timeout,
+        )
+    
+    def _submit(self, executor, fn, *args):
+        """Submit fn to executor in a copy of the caller's context (request deadline)"""
+        return executor.submit(contextvars.copy_context().run, fn, *args)
+    
+    def get_stats(self):
+        """Recognition config selection, transcript cache, VAD and re-encoding statistics"""
+        with self.stats_lock:
+            vad = dict(self.vad_stats)
+            encoding = dict(self.encode_stats)
+        vad['enabled'] = self.vad is not None
+        vad['removed_percent'] = round(
+            100.0 * vad['removed_seconds'] / vad['original_seconds'], 1
+        ) if vad['original_seconds'] else 0.0
+        vad['original_seconds'] = round(vad['original_seconds'], 1)
+        vad['removed_seconds'] = round(vad['removed_seconds'], 1)
+        encoding['format'] = 'flac' if self.segmenter.flac else 'wav'
+        encoding['compression_ratio'] = round(
+            encoding['output_bytes'] / encoding['input_bytes'], 3
+        ) if encoding['input_bytes'] else None
+        encoding['encode_seconds'] = round(encoding['encode_seconds'], 3)
+        return {
+            'config_selection': self.config_selector.get_stats(),
+            'cache': self.cache.get_stats(),
+            'vad': vad,
+            'encoding': encoding,
+        }
+    
+    def _transcribe_chunked(self, content, decoded=None):
+        """Handle medium-sized audio by transcribing segments concurrently.
+        decoded is content's (samples, sample_rate) if already decoded."""
         self.logger.info("Processing audio in chunks")
         
-        # Simple chunking - split audio into ~500KB chunks
-        chunk_size = 400000  # 400KB chunks
-        chunks = [content[i:i+chunk_size] for i in range(0, len(content), chunk_size)]
+        # Cut decoded audio at quiet points so each chunk is a valid stream
+        chunks = self.segmenter.segment(content, decoded)
+        if chunks is None:
+            # Undecodable container - fall back to raw ~400KB byte slices,
+            # which are memoryview slices and share the upload's memory
+            self.logger.warning("Audio could not be decoded, falling back to byte chunking")
+            chunk_size = 400000
+            chunks = [content[i:i+chunk_size] for i in range(0, len(content), chunk_size)]
         
-        self.logger.info(f"Split audio into {len(chunks)} chunks")
+        self.logger.info(f"Split audio into {len(chunks)} chunks (max_workers={self.max_workers})")
         
-        full_transcription = ""
+        started = time.perf_counter()
+        futures = {
+            self._submit(self.executor, self._transcribe_chunk, i, len(chunks), chunk): i
+            for i, chunk in enumerate(chunks)
+        }
         
-        for i, chunk in enumerate(chunks):
+        # Collect results as they finish, then reassemble in original order
+        results = [None] * len(chunks)
+        for future in as_completed(futures):
+            i = futures[future]
             try:
-                self.logger.info(f"Processing chunk {i+1}/{len(chunks)} ({len(chunk)} bytes)")
-                
-                chunk_transcription = self._transcribe_sync(chunk)
-                if chunk_transcription:
-                    full_transcription += chunk_transcription + " "
-                    
+                results[i] = future.result()
+            except (CircuitOpenError, DeadlineExceededError):
+                for other in futures:
+                    other.cancel()
+                raise
             except Exception as e:
                 self.logger.warning(f"Chunk {i+1} failed: {str(e)}")
-                continue
+        
+        # Segments overlap slightly, so drop words repeated at the seams
+        full_transcription = merge_transcripts(results)
         
         if not full_transcription.strip():
             raise Exception("All audio chunks failed to transcribe")
             
-        self.logger.info(f"Chunked transcription completed: {len(full_transcription)} characters")
+        elapsed = time.perf_counter() - started
+        self.logger.info(f"Chunked transcription completed: {len(full_transcription)} characters in {elapsed:.2f}s")
         return full_transcription.strip()
     
-    def _transcribe_long_running(self, audio_file_path):
-        """Handle very large files with long running recognition"""
-        self.logger.info("Using long running recognition for very large file")
-        
-        # For production, upload to Google Cloud Storage
-        # For now, return helpful error
-        raise Exception("Very large audio files (>10MB) require Google Cloud Storage integration. Please break into smaller segments or contact support.")
-    
-    def _transcribe_long_audio(self, audio_file_path):
-        """Handle long audio files using LongRunningRecognize"""
-        self.logger.info("Using long running recognition for large audio file")
-        
-        # Upload to Google Cloud Storage would be ideal, but for now we'll try chunking
-        # For production, implement GCS upload and use uri parameter
-        raise Exception("Audio file too long (>1 minute). Please record shorter segments or implement GCS upload for long files.")
-    
-    def stream_transcribe_audio(self, audio_generator):
-        config = speech.RecognitionConfig(
-            encoding=speech.RecognitionConfig.AudioEncoding.WEBM_OPUS,
-            sample_rate_hertz=48000,
-            language_code="en-US",
-            model="medical_dictation",
-            use_enhanced=True,
-            enable_automatic_punctuation=True,
-        )
+    def _transcribe_chunk(self, index, total, chunk):
+        """Transcribe a single chunk and log how long it took"""
+        self.logger.info(f"Processing chunk {index+1}/{total} ({len(chunk)} bytes)")
         
-        streaming_config = speech.StreamingRecognitionConfig(
-            config=config,
-            interim_results=True,
-        )
+        started = time.perf_counter()
+        try:
+            return self._transcribe_sync(chunk)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.logger.info(f"Chunk {index+1}/{total} finished in {elapsed:.2f}s")
+    
+    def get_job(self, job_id):
+        return self.jobs.get(job_id)
+    
+    def _run_long_running_job(self, job, content, cache_key):
+        """Upload audio to the blob store, recognize it by URI and poll until done"""
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            job.update(status='completed', progress_percent=100, transcription=cached)
+            return
         
-        audio_generator = (speech.StreamingRecognizeRequest(audio_content=chunk)
-                          for chunk in audio_generator)
+        if self.blob_store is None:
+            self.blob_store = create_blob_store()
         
-        requests = iter([speech.StreamingRecognizeRequest(
-            streaming_config=streaming_config)] + list(audio_generator))
+        job.update(status='uploading')
+        uri = self.blob_store.upload(f"long-running/{job.id}", content)
         
-        responses = self.client.streaming_recognize(requests)
+        try:
+            audio_format = sniff_audio_format(content)
+            name = self.config_selector.candidates(audio_format)[0]
+            
+            self.logger.info(f"Job {job.id}: long running recognition of {uri} with config {name}")
+            operation = self.upstream.call(
+                lambda timeout: self.backend.long_running_recognize(RECOGNITION_CONFIGS[name], uri, timeout=timeout),
+                timeout=self.recognize_timeout,
+            )
+            job.update(status='running')
+            
+            deadline = time.monotonic() + Config.LONG_RUNNING_TIMEOUT
+            while not operation.done():
+                if time.monotonic() > deadline:
+                    raise Exception(f"Long running recognition did not finish within {Config.LONG_RUNNING_TIMEOUT}s")
+                job.update(progress_percent=operation.progress_percent())
+                time.sleep(Config.LONG_RUNNING_POLL_SECONDS)
+            
+            transcription = operation.result()
+            
+            if not transcription:
+                raise Exception("Long running recognition returned no transcript")
+            
+            self.cache.put(cache_key, transcription)
+            job.update(status='completed', progress_percent=100, transcription=transcription)
+            self.logger.info(f"Job {job.id} completed: {len(transcription)} characters")
+            
+        finally:
+            try:
+                self.blob_store.delete(uri)
+            except Exception as e:
+                self.logger.warning(f"Failed to delete staged audio {uri}: {str(e)}")
+    
+    def stream_transcribe_audio(self, audio_source, encoding='WEBM_OPUS', sample_rate_hertz=48000):
+        """Stream audio to the recognizer as it arrives.
+
+        audio_source is an AudioChunkQueue, an AudioRingBuffer or any iterable
+        of byte chunks; the latter is pumped into a bounded queue by a
+        background thread. Yields a dict per interim or final result. Streams
+        are restarted transparently before the API's ~5 minute limit.
+
+        A restarted stream begins with the container header and then the
+        audio from the last point a decoder can start at (see StreamCursor),
+        so up to one WebM cluster is recognized twice. Result times are
+        offset by the audio before that point.
+        """
+        if isinstance(audio_source, (AudioChunkQueue, AudioRingBuffer)):
+            queue = audio_source
+        else:
+            queue = AudioChunkQueue.from_iterable(audio_source, max_bytes=Config.STREAMING_QUEUE_MAX_BYTES)
+        
+        params = {
+            'encoding': encoding,
+            'sample_rate_hertz': sample_rate_hertz,
+            'language_code': 'en-US',
+            'model': 'medical_dictation',
+            'use_enhanced': True,
+            'enable_automatic_punctuation': True,
+        }
         
-        for response in responses:
-            for result in response.results:
-                if result.is_final:
-                    yield result.alternatives[0].transcript
\ No newline at end of file
+        # Container formats only carry their header at the start, so its
+        # bytes are replayed at the start of every restarted stream
+        header = None if encoding in ('WEBM_OPUS', 'OGG_OPUS') else b''
+        pending = bytearray()  # start of the audio until the header is complete
+        cursor = StreamCursor(encoding, sample_rate_hertz)
+        stream_index = 0
+        offset = 0.0
+        
+        while not queue.exhausted:
+            deadline = time.monotonic() + Config.STREAMING_LIMIT_SECONDS
+            
+            def audio_chunks():
+                nonlocal header
+                if header:
+                    yield header
+                if cursor.tail:
+                    yield bytes(cursor.tail)
+                for chunk in queue.iter_chunks(deadline=deadline):
+                    if header is None:
+                        pending.extend(chunk)
+                        length = container_header_length(pending, encoding)
+                        if length is not None:
+                            header = bytes(pending[:length])
+                            cursor.set_header(header)
+                            cursor.feed(pending[length:])
+                            pending.clear()
+                        elif len(pending) > MAX_CONTAINER_HEADER_BYTES:
+                            self.logger.warning(f"No {encoding} header end found, restarted streams will lack it")
+                            header = b''
+                            cursor.lose_track()
+                            pending.clear()
+                    else:
+                        cursor.feed(chunk)
+                    yield chunk
+            
+            self.logger.info(f"Opening recognition stream {stream_index}")
+            
+            stream_end = 0.0
+            for result in self.backend.streaming_recognize(params, audio_chunks()):
+                stream_end = max(stream_end, result['result_end_time'])
+                result['result_end_time'] += offset
+                result['stream_index'] = stream_index
+                yield result
+            
+            if cursor.time is not None:
+                offset = cursor.time
+            else:
+                # No restart point to go by; the last result is the best estimate
+                offset += stream_end
+            stream_index += 1
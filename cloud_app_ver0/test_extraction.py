@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Tests for local structured-data extraction: the compiled ExtractionEngine
+against the legacy per-field regexes, IncrementalExtractor against
+NLPService.structure_data, and the medication lexicon
+
+    python -m pytest test_extraction.py  (or python test_extraction.py)
+"""
+
+import json
+import os
+import random
+import tempfile
+import logging
+from benchmark_extraction import SENTENCES, legacy_structure_data, build_transcript
+from benchmark_extraction import comparable as comparable_to_legacy
+from benchmark_incremental import build_dictation, feed_word_by_word
+from benchmark_incremental import comparable as comparable_to_whole
+from services.incremental_extractor import IncrementalExtractor
+from services.medication_lexicon import MedicationLexicon
+from services.nlp_service import NLPService
+
+logging.disable(logging.INFO)
+service = NLPService()
+
+def test_engine_matches_legacy_per_sentence():
+    for sentence in SENTENCES:
+        expected = comparable_to_legacy(legacy_structure_data(sentence))
+        assert comparable_to_legacy(service.structure_data([], sentence)) == expected, sentence
+
+def test_engine_matches_legacy_on_transcripts():
+    for size_kb in (1, 5, 20):
+        for seed in range(3):
+            text = build_transcript(size_kb, seed)
+            expected = comparable_to_legacy(legacy_structure_data(text))
+            assert comparable_to_legacy(service.structure_data([], text)) == expected, (size_kb, seed)
+
+def test_engine_matches_legacy_on_random_sentence_subsets():
+    rng = random.Random(1)
+    for _ in range(100):
+        text = " ".join(rng.sample(SENTENCES, rng.randint(1, len(SENTENCES))))
+        expected = comparable_to_legacy(legacy_structure_data(text))
+        assert comparable_to_legacy(service.structure_data([], text)) == expected, text
+
+def test_incremental_matches_structure_data():
+    rng = random.Random(0)
+    for _ in range(100):
+        text = build_dictation(rng)
+        expected = comparable_to_whole(service.structure_data([], text))
+        assert comparable_to_whole(feed_word_by_word(text)) == expected, text
+
+def test_incremental_matches_structure_data_after_edits():
+    rng = random.Random(2)
+    extractor = IncrementalExtractor()
+    for _ in range(50):
+        # Each update rewrites an arbitrary part of the previous transcript
+        text = build_dictation(rng)
+        record = extractor.update(text)
+        assert comparable_to_whole(record) == comparable_to_whole(service.structure_data([], text)), text
+
+def test_incremental_chief_complaint_follows_pattern_priority():
+    extractor = IncrementalExtractor()
+    extractor.update("Presents with abdominal pain.")
+    record = extractor.update("Presents with abdominal pain. Chief complaint: vomiting.")
+    expected = service.structure_data([], "Presents with abdominal pain. Chief complaint: vomiting.")
+    assert record['history']['chief_complaints'] == expected['history']['chief_complaints']
+
+def test_incremental_keeps_transcript_and_medications():
+    text = "Age: 7 years. Started Inj. Vincristine 1.5mg weekly for 4 weeks."
+    record = feed_word_by_word(text)
+    assert record['original_transcript'] == text
+    assert record['treatment']['medications'] == service.structure_data([], text)['treatment']['medications']
+
+def medication_names(lexicon, text):
+    return [medication['name'] for medication in lexicon.extract(text)]
+
+def test_lexicon_resolves_brand_aliases_and_prefixes():
+    lexicon = MedicationLexicon(check_interval=3600)
+    assert lexicon.extract("Started Inj. Magnex 1g IV twice daily for 5 days.") == [{
+        'name': 'Inj. Cefoperazone Sulbactam', 'dose': '1g', 'frequency': 'twice daily', 'duration': '5 days'
+    }]
+    assert medication_names(lexicon, "Syp PCM 5ml and Pip-Taz 4.5g") == ['Syp. Paracetamol', 'Piperacillin Tazobactam']
+
+def test_lexicon_prefers_the_longest_name():
+    lexicon = MedicationLexicon(check_interval=3600)
+    assert medication_names(lexicon, "Cefoperazone Sulbactam 1g") == ['Cefoperazone Sulbactam']
+    assert medication_names(lexicon, "Cefoperazone 1g") == ['Cefoperazone']
+
+def test_lexicon_names_do_not_span_clause_breaks():
+    lexicon = MedicationLexicon(check_interval=3600)
+    assert medication_names(lexicon, "Pip, Taz") == []
+    assert medication_names(lexicon, "Cefoperazone, Sulbactam given") == ['Cefoperazone']
+    assert medication_names(lexicon, "Cefoperazone\nSulbactam 1g") == ['Cefoperazone']
+
+def test_lexicon_lists_each_medication_once():
+    lexicon = MedicationLexicon(check_interval=3600)
+    medications = lexicon.extract("Tab Dolo 250mg. Tab Paracetamol thrice daily for 3 days. Tab Crocin.")
+    assert medications == [{
+        'name': 'Tab. Paracetamol', 'dose': '250mg', 'frequency': 'thrice daily', 'duration': '3 days'
+    }]
+
+def test_lexicon_details_stop_at_the_next_mention():
+    lexicon = MedicationLexicon(check_interval=3600)
+    medications = lexicon.extract("Tab Ondansetron and Syp PCM 5ml thrice daily")
+    assert medications[0] == {'name': 'Tab. Ondansetron', 'dose': '', 'frequency': '', 'duration': ''}
+    assert medications[1]['dose'] == '5ml'
+
+def test_lexicon_reload_keeps_previous_version_on_error():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'medications.json')
+        with open(path, 'w') as f:
+            json.dump({'medications': [{'name': 'Meropenem', 'aliases': ['Meronem']}]}, f)
+        lexicon = MedicationLexicon(path, check_interval=0)
+        assert lexicon.version == 1
+        assert medication_names(lexicon, "Meronem 1g") == ['Meropenem']
+
+        with open(path, 'w') as f:
+            f.write('{not json')
+        os.utime(path, (0, 1))
+        assert medication_names(lexicon, "Meronem 1g") == ['Meropenem']
+        assert lexicon.version == 1
+
+        with open(path, 'w') as f:
+            json.dump({'medications': [{'name': 'Vancomycin'}]}, f)
+        os.utime(path, (0, 2))
+        assert medication_names(lexicon, "Meronem 1g, Vancomycin") == ['Vancomycin']
+        assert lexicon.version == 2
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print(f"✅ {name}")
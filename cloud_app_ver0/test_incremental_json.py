@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Tests for IncrementalObjectParser, which reads streamed model output
+
+    python -m pytest test_incremental_json.py  (or python test_incremental_json.py)
+"""
+
+import json
+from utils.incremental_json import IncrementalObjectParser
+
+RESPONSE = {
+    'diagnosis': 'B-ALL, on {maintenance}',
+    'medications': [{'name': 'Vincristine', 'dose': '1.5mg'}, {'name': 'Ondansetron', 'dose': '4mg'}],
+    'quote': 'said "no [pain]", then left\\',
+    'age': 7,
+    'ventilated': False,
+    'notes': None,
+}
+
+def feed_in_chunks(text, size):
+    parser = IncrementalObjectParser()
+    members = []
+    for start in range(0, len(text), size):
+        members.extend(parser.feed(text[start:start + size]))
+    return parser, members
+
+def test_members_complete_in_order_for_any_chunking():
+    text = "```json\n" + json.dumps(RESPONSE, indent=2) + "\n```"
+    for size in (1, 2, 7, 64, len(text)):
+        parser, members = feed_in_chunks(text, size)
+        assert members == list(RESPONSE.items()), size
+        assert parser.close() == RESPONSE
+
+def test_member_is_returned_when_its_value_completes():
+    parser = IncrementalObjectParser()
+    assert parser.feed('Here you go: {"age": 7, "diagnosis": "B-') == [('age', 7)]
+    assert parser.feed('ALL", "medications": [') == [('diagnosis', 'B-ALL')]
+    assert parser.feed('"Vincristine"]}') == [('medications', ['Vincristine'])]
+    assert parser.feed(' trailing text {"ignored": 1}') == []
+    assert parser.close() == {'age': 7, 'diagnosis': 'B-ALL', 'medications': ['Vincristine']}
+
+def test_empty_object():
+    parser = IncrementalObjectParser()
+    assert parser.feed('{ }') == []
+    assert parser.close() == {}
+
+def test_malformed_member_raises_when_it_completes():
+    parser = IncrementalObjectParser()
+    assert parser.feed('{"age": 7, ') == [('age', 7)]
+    try:
+        parser.feed('"diagnosis": B-ALL, "sex": "male"}')
+    except ValueError as e:
+        assert 'diagnosis' in str(e)
+    else:
+        raise AssertionError("malformed member was accepted")
+
+def test_close_raises_until_the_object_completes():
+    parser = IncrementalObjectParser()
+    for text, message in (('no json here', 'No JSON object found'), ('{"age": 7', 'Incomplete JSON object')):
+        parser.feed(text)
+        try:
+            parser.close()
+        except ValueError as e:
+            assert str(e) == message
+        else:
+            raise AssertionError(f"close() accepted {text!r}")
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print(f"✅ {name}")
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Tests for the report cache in ReportPipeline: hits, misses and invalidation
+
+    python -m pytest test_report_cache.py  (or python test_report_cache.py)
+"""
+
+import logging
+from services.medication_lexicon import medication_lexicon
+from services.nlp_service import NLPService
+from services.report_generator import ReportGenerator
+from services.report_pipeline import ReportPipeline, normalize_for_cache
+
+logging.disable(logging.INFO)
+
+TRANSCRIPT = (
+    "Age: 7 years. Sex: male. Known case of B-ALL on maintenance chemotherapy. "
+    "Presents with fever and cough. Hb 9.2, WBC 3400.\nStarted Inj. Vincristine 1.5mg weekly."
+)
+
+def make_pipeline():
+    return ReportPipeline(NLPService(), ReportGenerator())
+
+def run(pipeline, transcription, **options):
+    options.setdefault('extract_entities', False)
+    options.setdefault('escalate', False)
+    return pipeline.run(transcription, **options)
+
+def cache_counts(pipeline):
+    stats = pipeline.get_stats()['cache']
+    return stats['hits'], stats['misses']
+
+def test_repeat_is_served_from_cache():
+    pipeline = make_pipeline()
+    first = run(pipeline, TRANSCRIPT)
+    second = run(pipeline, TRANSCRIPT)
+    assert cache_counts(pipeline) == (1, 1)
+    assert second['report'].keys() == first['report'].keys()
+    for record in (first, second):
+        del record['structured_data']['metadata']['generated_at']
+    assert second['structured_data'] == first['structured_data']
+
+def test_case_and_spacing_share_an_entry_with_the_requests_own_text():
+    pipeline = make_pipeline()
+    run(pipeline, TRANSCRIPT)
+    variant = "  " + TRANSCRIPT.upper().replace(" ", " \t ")
+    result = run(pipeline, variant)
+    assert cache_counts(pipeline) == (1, 1)
+    assert result['structured_data']['original_transcript'] == variant
+    assert variant[:50] in result['structured_data']['history']['presenting_history']
+
+def test_line_breaks_are_part_of_the_key():
+    assert normalize_for_cache("Tab Dolo\nTab Pantocid") != normalize_for_cache("Tab Dolo Tab Pantocid")
+    pipeline = make_pipeline()
+    joined = run(pipeline, "Inj Cefoperazone Sulbactam 1g")
+    split = run(pipeline, "Inj Cefoperazone\nSulbactam 1g")
+    assert cache_counts(pipeline) == (0, 2)
+    assert joined['structured_data']['treatment']['medications'][0]['name'] == 'Inj. Cefoperazone Sulbactam'
+    assert split['structured_data']['treatment']['medications'][0]['name'] == 'Inj. Cefoperazone'
+
+def test_options_are_part_of_the_key():
+    pipeline = make_pipeline()
+    run(pipeline, TRANSCRIPT)
+    run(pipeline, TRANSCRIPT, escalate=True)
+    assert cache_counts(pipeline) == (0, 2)
+
+def test_lexicon_reload_empties_the_cache():
+    pipeline = make_pipeline()
+    run(pipeline, TRANSCRIPT)
+    assert pipeline.get_stats()['cache']['entries'] == 1
+    medication_lexicon.reload()
+    run(pipeline, TRANSCRIPT)
+    assert cache_counts(pipeline) == (0, 2)
+    assert pipeline.get_stats()['cache']['entries'] == 1
+
+def test_failed_escalation_is_not_cached():
+    pipeline = make_pipeline()
+    pipeline.extractor.backend = 'gemini'
+    pipeline.extractor.threshold = 1.1
+    pipeline.extractor._escalate = lambda record, fields, entities, text: None
+    run(pipeline, TRANSCRIPT, escalate=True)
+    assert pipeline.get_stats()['cache']['entries'] == 0
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print(f"✅ {name}")
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Tests for the upstream guards: circuit breaker, retry budget and request deadline
+
+    python -m pytest test_resilience.py  (or python test_resilience.py)
+"""
+
+import time
+import logging
+from google.api_core import exceptions
+from services.resilience import (
+    CircuitBreaker, CircuitOpenError, DeadlineExceededError, RetryBudget, Upstream,
+    remaining_time, reset_deadline, set_deadline
+)
+
+logging.disable(logging.WARNING)
+
+def make_upstream(max_attempts=3, failure_threshold=2, reset_timeout=0.2, budget=None):
+    upstream = Upstream('test', budget or RetryBudget(ratio=1.0, min_per_second=0),
+                        max_attempts=max_attempts, backoff_base=1, backoff_cap=1)
+    upstream.breaker = CircuitBreaker('test', failure_threshold=failure_threshold, reset_timeout=reset_timeout)
+    return upstream
+
+def failing(error, calls):
+    def operation(timeout):
+        calls.append(timeout)
+        raise error
+    return operation
+
+def expect(error_type, fn, *args):
+    try:
+        fn(*args)
+    except error_type as e:
+        return e
+    raise AssertionError(f"{error_type.__name__} not raised")
+
+def test_transport_and_server_errors_are_retried():
+    for error in (ConnectionError(), TimeoutError(), exceptions.ServiceUnavailable('down'),
+                  exceptions.TooManyRequests('slow down')):
+        upstream = make_upstream(failure_threshold=10)
+        calls = []
+        expect(type(error), upstream.call, failing(error, calls))
+        assert len(calls) == 3, error
+
+def test_client_errors_are_not_retried_and_keep_the_circuit_closed():
+    upstream = make_upstream()
+    for _ in range(5):
+        calls = []
+        expect(exceptions.InvalidArgument, upstream.call, failing(exceptions.InvalidArgument('bad'), calls))
+        assert len(calls) == 1
+    assert upstream.breaker.state == 'closed'
+    assert upstream.breaker.failures == 0
+
+def test_local_errors_are_not_retried_and_keep_the_circuit_closed():
+    upstream = make_upstream()
+    for _ in range(5):
+        calls = []
+        expect(ValueError, upstream.call, failing(ValueError('bug'), calls))
+        assert len(calls) == 1
+    assert upstream.breaker.state == 'closed'
+
+def test_success_after_retry():
+    upstream = make_upstream()
+    results = iter([ConnectionError(), 'ok'])
+
+    def operation(timeout):
+        result = next(results)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    assert upstream.call(operation) == 'ok'
+    assert upstream.breaker.failures == 0
+
+def test_circuit_opens_rejects_and_lets_one_probe_through():
+    upstream = make_upstream(max_attempts=1)
+    for _ in range(2):
+        expect(ConnectionError, upstream.call, failing(ConnectionError(), []))
+    assert upstream.breaker.state == 'open'
+
+    calls = []
+    error = expect(CircuitOpenError, upstream.call, failing(ConnectionError(), calls))
+    assert calls == []
+    assert 0 < error.retry_after <= 0.2
+
+    time.sleep(0.25)
+    upstream.breaker.before_call()
+    assert upstream.breaker.state == 'half_open'
+    expect(CircuitOpenError, upstream.breaker.before_call)
+    upstream.breaker.record_success()
+    assert upstream.breaker.state == 'closed'
+
+def test_failed_probe_reopens_the_circuit():
+    breaker = CircuitBreaker('test', failure_threshold=1, reset_timeout=0.05)
+    breaker.record_failure()
+    time.sleep(0.1)
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == 'open'
+    expect(CircuitOpenError, breaker.before_call)
+
+def test_local_error_during_probe_frees_the_probe():
+    upstream = make_upstream(max_attempts=1, failure_threshold=1, reset_timeout=0.05)
+    expect(ConnectionError, upstream.call, failing(ConnectionError(), []))
+    time.sleep(0.1)
+    expect(ValueError, upstream.call, failing(ValueError('bug'), []))
+    assert upstream.call(lambda timeout: 'ok') == 'ok'
+    assert upstream.breaker.state == 'closed'
+
+def test_retry_budget_limits_retries():
+    budget = RetryBudget(ratio=0, min_per_second=0, max_tokens=1)
+    upstream = make_upstream(max_attempts=5, failure_threshold=100, budget=budget)
+    calls = []
+    expect(ConnectionError, upstream.call, failing(ConnectionError(), calls))
+    assert len(calls) == 2
+    calls = []
+    expect(ConnectionError, upstream.call, failing(ConnectionError(), calls))
+    assert len(calls) == 1
+
+def test_zero_deadline_has_already_passed():
+    upstream = make_upstream()
+    token = set_deadline(0)
+    try:
+        assert remaining_time() <= 0
+        calls = []
+        expect(DeadlineExceededError, upstream.call, failing(ConnectionError(), calls))
+        assert calls == []
+    finally:
+        reset_deadline(token)
+    assert remaining_time() is None
+
+def test_attempt_timeout_is_capped_by_the_deadline():
+    upstream = make_upstream()
+    token = set_deadline(2)
+    try:
+        timeouts = []
+        upstream.call(lambda timeout: timeouts.append(timeout), timeout=30)
+        upstream.call(lambda timeout: timeouts.append(timeout))
+    finally:
+        reset_deadline(token)
+    assert all(0 < timeout <= 2 for timeout in timeouts)
+
+    timeouts = []
+    upstream.call(lambda timeout: timeouts.append(timeout), timeout=30)
+    assert timeouts == [30]
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print(f"✅ {name}")
@@ -0,0 +1,82 @@
+from collections import deque
+
+class AhoCorasick:
+    """Aho-Corasick automaton over sequences of hashable symbols.
+
+    Keywords are sequences (strings for character matching, tuples of words
+    for token matching). find() reports every occurrence in one pass over
+    the input, in time linear in its length plus the number of matches.
+    """
+
+    def __init__(self):
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [[]]  # node -> [(keyword length, value), ...]
+        self.keywords = 0
+        self.built = False
+
+    def add(self, keyword, value):
+        if self.built:
+            raise Exception("Cannot add keywords after the automaton is built")
+        if not keyword:
+            return
+
+        node = 0
+        for symbol in keyword:
+            next_node = self.goto[node].get(symbol)
+            if next_node is None:
+                next_node = len(self.goto)
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append([])
+                self.goto[node][symbol] = next_node
+            node = next_node
+        self.output[node].append((len(keyword), value))
+        self.keywords += 1
+
+    def build(self):
+        """Compute failure links breadth-first"""
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for symbol, child in self.goto[node].items():
+                queue.append(child)
+                state = self.fail[node]
+                while state and symbol not in self.goto[state]:
+                    state = self.fail[state]
+                self.fail[child] = self.goto[state].get(symbol, 0)
+                if self.fail[child] == child:
+                    self.fail[child] = 0
+                # Inherit the matches that end here through the failure link
+                self.output[child] = self.output[child] + self.output[self.fail[child]]
+        self.built = True
+        return self
+
+    def find(self, sequence):
+        """Yield (start, end, value) for every keyword occurrence"""
+        if not self.built:
+            self.build()
+
+        goto, fail, output = self.goto, self.fail, self.output
+        root = goto[0]
+        node = 0
+        for index, symbol in enumerate(sequence):
+            if not node and symbol not in root:
+                continue
+            while node and symbol not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(symbol, 0)
+            for length, value in output[node]:
+                yield index + 1 - length, index + 1, value
+
+    def find_longest(self, sequence, accept=None):
+        """Non-overlapping matches, preferring the leftmost and then the longest;
+        accept(start, end), if given, rules out matches before they are chosen"""
+        matches = sorted(self.find(sequence), key=lambda match: (match[0], -match[1]))
+        selected = []
+        position = 0
+        for start, end, value in matches:
+            if start >= position and (accept is None or accept(start, end)):
+                selected.append((start, end, value))
+                position = end
+        return selected
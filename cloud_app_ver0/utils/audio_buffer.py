@@ -0,0 +1,98 @@
+import mmap
+import os
+import shutil
+import tempfile
+import logging
+from flask import Request
+from config.config import Config
+
+logger = logging.getLogger('services.transcription_service')
+
+
+class SpooledUploadRequest(Request):
+    """Flask request that keeps uploads in memory up to UPLOAD_SPOOL_MAX_BYTES.
+
+    Larger uploads spill to an anonymous temp file, which AudioBuffer maps
+    instead of reading back into the heap.
+    """
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return tempfile.SpooledTemporaryFile(max_size=Config.UPLOAD_SPOOL_MAX_BYTES, mode='rb+')
+
+
+class AudioBuffer:
+    """Context manager exposing audio as a read-only memoryview without copying.
+
+    Accepts bytes-like objects, file paths, in-memory streams (BytesIO or an
+    unrolled SpooledTemporaryFile) and file-backed streams. File-backed data
+    is memory-mapped; anything else is first spooled into a
+    SpooledTemporaryFile.
+    """
+
+    def __init__(self, source):
+        self.source = source
+        self.view = None
+        self.mapping = None
+        self.owned_file = None
+
+    def __enter__(self):
+        source = self.source
+
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            self.view = memoryview(source).cast('B')
+            return self.view
+
+        if isinstance(source, (str, os.PathLike)):
+            self.owned_file = open(source, 'rb')
+            self.view = self._map(self.owned_file)
+            return self.view
+
+        # SpooledTemporaryFile wraps either a BytesIO or a real file
+        inner = getattr(source, '_file', source)
+        if hasattr(inner, 'getbuffer'):
+            self.view = inner.getbuffer()
+            return self.view
+
+        try:
+            inner.fileno()
+            self.view = self._map(inner)
+            return self.view
+        except (AttributeError, OSError, ValueError):
+            pass
+
+        # Unknown stream type - spool it once, then map or view the spool
+        self.owned_file = tempfile.SpooledTemporaryFile(max_size=Config.UPLOAD_SPOOL_MAX_BYTES)
+        shutil.copyfileobj(source, self.owned_file)
+        self.owned_file.seek(0)
+        self.source = self.owned_file
+        return self.__enter__()
+
+    def _map(self, file_obj):
+        if file_obj.writable():
+            file_obj.flush()
+        size = os.fstat(file_obj.fileno()).st_size
+        if size == 0:
+            return memoryview(b'')
+        self.mapping = mmap.mmap(file_obj.fileno(), size, access=mmap.ACCESS_READ)
+        return memoryview(self.mapping)
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def close(self):
+        try:
+            if self.view is not None:
+                self.view.release()
+            if self.mapping is not None:
+                self.mapping.close()
+        except BufferError:
+            # Something still references the audio (e.g. a numpy view); the
+            # mapping is released when that reference is garbage collected
+            logger.debug("Audio buffer still referenced, deferring release")
+        finally:
+            self.view = None
+            self.mapping = None
+            if self.owned_file is not None:
+                self.owned_file.close()
+                self.owned_file = None
@@ -0,0 +1,84 @@
+import json
+
+class IncrementalObjectParser:
+    """Parses a JSON object that arrives in chunks, such as a streamed model
+    response, and hands back each top-level member as soon as its value is
+    complete.
+
+    Text before the opening brace (a ```json fence, a preamble) and after
+    the closing one is ignored. Members are validated as they complete, so
+    malformed output raises ValueError as early as possible.
+    """
+
+    def __init__(self):
+        self.text = ''
+        self.position = 0
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+        self.member_start = None
+        self.closed = False
+        self.result = {}
+
+    def feed(self, chunk):
+        """Add text; returns [(key, value), ...] for members completed by it"""
+        self.text += chunk
+        completed = []
+        text = self.text
+
+        for index in range(self.position, len(text)):
+            char = text[index]
+            if self.closed:
+                break
+
+            if self.depth == 0:
+                if char == '{':
+                    self.depth = 1
+                    self.member_start = index + 1
+                continue
+
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == '\\':
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+                continue
+
+            if char == '"':
+                self.in_string = True
+            elif char in '{[':
+                self.depth += 1
+            elif char in '}]':
+                self.depth -= 1
+                if self.depth == 0:
+                    completed.extend(self._complete_member(index))
+                    self.closed = True
+            elif char == ',' and self.depth == 1:
+                completed.extend(self._complete_member(index))
+
+        self.position = len(text)
+        return completed
+
+    def _complete_member(self, end):
+        member = self.text[self.member_start:end].strip()
+        self.member_start = end + 1
+        if not member:
+            return []
+
+        try:
+            parsed = json.loads('{' + member + '}')
+        except ValueError as e:
+            raise ValueError(f"Malformed JSON member {member[:60]!r}: {str(e)}")
+        if len(parsed) != 1:
+            raise ValueError(f"Malformed JSON member {member[:60]!r}")
+
+        self.result.update(parsed)
+        return list(parsed.items())
+
+    def close(self):
+        """The whole object; raises ValueError if it never completed"""
+        if not self.closed:
+            raise ValueError("Incomplete JSON object" if self.depth else "No JSON object found")
+        return self.result
@@ -0,0 +1,85 @@
+import threading
+
+class Metric:
+    """A counter or gauge with optional labels, rendered in Prometheus text format"""
+
+    def __init__(self, name, kind, help_text, labels=()):
+        self.name = name
+        self.kind = kind
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labels):
+            raise Exception(f"Metric {self.name} expects labels {self.labels}, got {sorted(labels)}")
+        return tuple(str(labels[name]) for name in self.labels)
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = value
+
+    def get(self, **labels):
+        with self.lock:
+            return self.values.get(self._key(labels), 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        with self.lock:
+            values = sorted(self.values.items())
+        for key, value in values:
+            if key:
+                label_text = ",".join(
+                    f'{name}="{_escape(label)}"' for name, label in zip(self.labels, key)
+                )
+                lines.append(f"{self.name}{{{label_text}}} {value}")
+            else:
+                lines.append(f"{self.name} {value}")
+        return "\n".join(lines)
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class MetricsRegistry:
+    """Process-wide metrics, exposed by the /metrics endpoint.
+
+    Each worker process keeps its own values; scrape every worker (or
+    aggregate in Prometheus) to see the whole deployment.
+    """
+
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+
+    def _get_or_create(self, name, kind, help_text, labels):
+        with self.lock:
+            metric = self.metrics.get(name)
+            if metric is None:
+                metric = Metric(name, kind, help_text, labels)
+                self.metrics[name] = metric
+            elif metric.kind != kind:
+                raise Exception(f"Metric {name} already registered as a {metric.kind}")
+            return metric
+
+    def counter(self, name, help_text, labels=()):
+        return self._get_or_create(name, 'counter', help_text, labels)
+
+    def gauge(self, name, help_text, labels=()):
+        return self._get_or_create(name, 'gauge', help_text, labels)
+
+    def render(self):
+        with self.lock:
+            metrics = [self.metrics[name] for name in sorted(self.metrics)]
+        return "\n".join(metric.render() for metric in metrics) + "\n"
+
+
+metrics = MetricsRegistry()
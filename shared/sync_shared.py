@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Vendor the shared audio modules into each app that uses them
+
+cloud_app_ver0 and the speech-service are deployed separately (the
+speech-service image is built from its own directory), so each carries a
+copy of the modules in shared/audio. This script is the only thing that
+should write those copies; with --check it changes nothing and exits 1 when
+a copy differs from its source, for use before committing or in CI.
+
+    python shared/sync_shared.py [--check]
+"""
+
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Source under shared/audio -> copies, relative to the repository root
+SHARED_MODULES = {
+    'flac_stream.py': [
+        'cloud_app_ver0/services/flac_stream.py',
+        'cloud_app/services/speech-service/flac_stream.py',
+    ],
+    'voice_activity.py': [
+        'cloud_app_ver0/services/voice_activity.py',
+        'cloud_app/services/speech-service/voice_activity.py',
+    ],
+}
+
+def vendored(name):
+    with open(os.path.join(ROOT, 'shared', 'audio', name)) as f:
+        source = f.read()
+    return f"# Vendored from shared/audio/{name} by shared/sync_shared.py; edit it there.\n{source}"
+
+def read(path):
+    try:
+        with open(path) as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+def sync(check=False):
+    stale = []
+    for name, copies in SHARED_MODULES.items():
+        expected = vendored(name)
+        for copy in copies:
+            path = os.path.join(ROOT, copy)
+            if read(path) == expected:
+                continue
+            stale.append(copy)
+            if not check:
+                with open(path, 'w') as f:
+                    f.write(expected)
+    return stale
+
+if __name__ == "__main__":
+    check = '--check' in sys.argv[1:]
+    stale = sync(check=check)
+    for copy in stale:
+        print(f"{'out of date' if check else 'updated'}: {copy}")
+    if check and stale:
+        raise SystemExit(1)